@@ -1,10 +1,15 @@
 # api/aircraft.py
 from typing import Optional, Dict
 
+# score_weights: LZ skor ağırlıkları (scripts/lz_candidates.SCORE_WEIGHTS üzerine yazılır).
+# Hafif tip yakınlığa, ağır tipler temiz çap / engel mesafesine daha çok önem verir.
 PRESETS: Dict[str, dict] = {
-    "EC135": { "rotor_diameter_m": 10.20, "safety_margin_m": 6.0, "k": 1.5, "slope_max_deg": 8.0 },
-    "UH-1H": { "rotor_diameter_m": 14.63, "safety_margin_m": 8.0, "k": 1.6, "slope_max_deg": 7.0 },
-    "S70":   { "rotor_diameter_m": 16.36, "safety_margin_m": 10.0, "k": 1.7, "slope_max_deg": 6.0 },
+    "EC135": { "rotor_diameter_m": 10.20, "safety_margin_m": 6.0, "k": 1.5, "slope_max_deg": 8.0,
+               "score_weights": { "clear_diameter": 0.25, "slope_mean": 0.20, "slope_max": 0.10, "distance": 0.25, "obstacle": 0.10, "roughness": 0.10 } },
+    "UH-1H": { "rotor_diameter_m": 14.63, "safety_margin_m": 8.0, "k": 1.6, "slope_max_deg": 7.0,
+               "score_weights": { "clear_diameter": 0.30, "slope_mean": 0.20, "slope_max": 0.10, "distance": 0.15, "obstacle": 0.15, "roughness": 0.10 } },
+    "S70":   { "rotor_diameter_m": 16.36, "safety_margin_m": 10.0, "k": 1.7, "slope_max_deg": 6.0,
+               "score_weights": { "clear_diameter": 0.30, "slope_mean": 0.20, "slope_max": 0.15, "distance": 0.10, "obstacle": 0.15, "roughness": 0.10 } },
 }
 
 def resolve_aircraft_params(
@@ -40,4 +45,38 @@ def resolve_aircraft_params(
         "k":                float(base["k"]),
         "slope_max_deg":    float(base["slope_max_deg"]),
         "min_clear_diameter_m": float(min_clear_diameter_m),
+        "score_weights": base.get("score_weights"),
     }
+
+
+def resolve_request_aircraft(
+    aircraft_code: Optional[str],
+    slope_max_deg: Optional[float],
+    min_diameter_m: float,
+    rotor_diameter_m: Optional[float] = None,
+    safety_margin_m: Optional[float] = None,
+    k: Optional[float] = None,
+    slope_override_deg: Optional[float] = None,
+    preset_slope: bool = False,
+):
+    """
+    API uçları için ortak eğim önceliği (/candidates, /candidates/batch, /tiles):
+    slope_override_deg > istek slope_max_deg > 12°.
+    preset_slope=True (çoklu uçak): slope_max_deg verilmemişse PRESETS'teki kod kendi eğim limitini alır.
+    """
+    if slope_override_deg is not None:
+        slope = slope_override_deg
+    elif slope_max_deg is not None:
+        slope = slope_max_deg
+    elif preset_slope and aircraft_code in PRESETS:
+        slope = None  # preset limiti
+    else:
+        slope = 12.0
+    return resolve_aircraft_params(
+        aircraft_code=aircraft_code,
+        rotor_diameter_m=rotor_diameter_m,
+        safety_margin_m=safety_margin_m,
+        k=k,
+        slope_max_deg=slope,
+        user_min_diameter_m=min_diameter_m,
+    )
@@ -0,0 +1,177 @@
+# api/cache.py
+"""
+Normalize edilmiş sorgu parametrelerine göre sonuç önbelleği.
+
+- Anahtar: uç adı + piksel grid'ine oturtulmuş merkez + pencere/eşikler + raster kimlikleri
+  (yol + mtime + boyut). Raster değişince anahtar da değişir; ayrıca geçersiz kılmak gerekmez.
+- Bellekte sınırlı LRU; TENGRILZ_CACHE_DIR verilirse JSON olarak diske de yazılır (yeniden
+  başlatmalardan sonra da isabet).
+- Yanıtın meta.cache alanı "hit" | "miss".
+- Önbellekte ham dict tutulur; yanıt kodlaması (JSON / kuantize GeoJSON, bkz. api/encoding.py) her istekte
+  respond ile, event loop dışında yapılır.
+
+Ayarlar: TENGRILZ_CACHE=0 (kapat), TENGRILZ_CACHE_ENTRIES (varsayılan 256), TENGRILZ_CACHE_DIR
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from core.profiling import span
+from .encoding import FastJSONResponse
+
+
+def file_identity(path: Optional[str]):
+    """(mutlak yol, mtime_ns, boyut); dosya yoksa None."""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(str(path)), st.st_mtime_ns, st.st_size)
+
+
+def make_key(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 256, persist_dir: Optional[str] = None, enabled: bool = True):
+        self.max_entries = max_entries
+        self.persist_dir = persist_dir
+        self.enabled = enabled
+        self._mem: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(
+            max_entries=int(os.environ.get("TENGRILZ_CACHE_ENTRIES", 256)),
+            persist_dir=os.environ.get("TENGRILZ_CACHE_DIR") or None,
+            enabled=os.environ.get("TENGRILZ_CACHE", "1") != "0",
+        )
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            body = self._mem.get(key)
+            if body is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return body
+        if self.persist_dir and os.path.exists(self._disk_path(key)):
+            try:
+                with open(self._disk_path(key)) as f:
+                    body = json.load(f)
+            except (OSError, ValueError):
+                body = None
+            if body is not None:
+                self._remember(key, body)
+                with self._lock:
+                    self.hits += 1
+                return body
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, body: dict):
+        with self._lock:
+            self._mem[key] = body
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def put(self, key: str, body: dict):
+        self._remember(key, body)
+        if self.persist_dir:
+            tmp = self._disk_path(key) + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(body, f)
+            os.replace(tmp, self._disk_path(key))
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "persist_dir": self.persist_dir,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+CACHE = ResultCache.from_env()
+
+
+def _with_cache_meta(body: dict, state: str) -> dict:
+    out = dict(body)
+    out["meta"] = {**body.get("meta", {}), "cache": state}
+    return out
+
+
+async def _run_inline(f, *args):
+    return f(*args)
+
+
+def _respond_json(body: dict, **_):
+    return FastJSONResponse(body)
+
+
+async def _encode(respond, body: dict, kwargs: dict):
+    # Büyük FeatureCollection'ların serileştirilmesi event loop'u bloklamasın
+    def _run():
+        with span("response.encode"):
+            return respond(body, **kwargs)
+    return await asyncio.to_thread(_run)
+
+
+def cached(key_fn: Callable[..., Optional[str]], respond: Callable[..., object] = _respond_json):
+    """
+    Async handler'ı önbellekle sarar. key_fn handler ile aynı keyword argümanları alır ve
+    anahtar döndürür (None → önbellek atlanır; hata durumları handler'a bırakılır).
+    Handler dict döndürmelidir; önbellekte bu dict tutulur, yanıtı respond(body, **kwargs) üretir
+    (varsayılan: FastJSONResponse; ör. içerik müzakeresi için değiştirilebilir).
+    """
+    def deco(fn: Callable):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = None
+            if CACHE.enabled:
+                # key_fn raster açar / dosya stat'lar (REGISTRY.open, file_identity): event loop dışında
+                try:
+                    key = await asyncio.to_thread(key_fn, *args, **kwargs)
+                except Exception:
+                    key = None
+            # disk kalıcılığı varsa dosya G/Ç'si event loop dışında
+            io = (lambda f, *a: asyncio.to_thread(f, *a)) if CACHE.persist_dir else _run_inline
+            if key is not None:
+                with span("cache.get"):
+                    body = await io(CACHE.get, key)
+                if body is not None:
+                    return await _encode(respond, _with_cache_meta(body, "hit"), kwargs)
+            body = await fn(*args, **kwargs)
+            if not isinstance(body, dict):
+                return body
+            if key is None:
+                return await _encode(respond, body, kwargs)
+            with span("cache.put"):
+                await io(CACHE.put, key, body)
+            return await _encode(respond, _with_cache_meta(body, "miss"), kwargs)
+        return wrapper
+    return deco
@@ -0,0 +1,121 @@
+# api/datasets.py
+"""
+Uygulama ömrü boyunca açık tutulan raster handle'ları ve pyproj Transformer önbelleği.
+
+- rasterio dataset'leri thread-safe değildir: her thread kendi handle'ını alır (threading.local).
+- Dosyanın mtime'ı değişirse handle kapatılıp yeniden açılır (veri güncellemesi).
+- Transformer'lar (src_crs, dst_crs) çiftine göre bir kez kurulur.
+- Eğim karo deposu (scripts/slope_tiles) index/DEM değişene kadar paylaşılır.
+- Engel indeksi (scripts/obstacle_index) dosya değişene kadar paylaşılır.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+import rasterio
+from pyproj import Transformer
+
+# scripts/slope_tiles.py çıktısı (opsiyonel); /candidates, /candidates/batch ve /tiles aynı depoyu okur
+SLOPE_TILES_DIR = Path(__file__).resolve().parent.parent / "data" / "slope_tiles"
+
+
+class DatasetRegistry:
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = []  # kapatma için tüm thread'lerin handle'ları
+        self._transformers: Dict[Tuple[str, str], Transformer] = {}
+        self._slope_stores: Dict[str, tuple] = {}
+        self._obstacle_indexes: Dict[str, tuple] = {}
+
+    def _handles(self) -> dict:
+        h = getattr(self._local, "handles", None)
+        if h is None:
+            h = self._local.handles = {}
+        return h
+
+    def open(self, path: str):
+        """Bu thread için açık handle (mtime değiştiyse yenilenir). Kapatmayın; registry yönetir."""
+        key = os.path.abspath(str(path))
+        mtime = os.stat(key).st_mtime_ns
+        handles = self._handles()
+        cached = handles.get(key)
+        if cached is not None:
+            cached_mtime, ds = cached
+            if cached_mtime == mtime and not ds.closed:
+                return ds
+            ds.close()
+        ds = rasterio.open(key)
+        handles[key] = (mtime, ds)
+        with self._lock:
+            self._opened = [d for d in self._opened if not d.closed]
+            self._opened.append(ds)
+        return ds
+
+    def transformer(self, src_crs, dst_crs) -> Transformer:
+        key = (str(src_crs), str(dst_crs))
+        t = self._transformers.get(key)
+        if t is None:
+            with self._lock:
+                t = self._transformers.get(key)
+                if t is None:
+                    t = Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+                    self._transformers[key] = t
+        return t
+
+    def slope_store(self, tiles_dir: str, dem_path: str):
+        """
+        scripts/slope_tiles deposu (thread'ler arası paylaşılır, karo LRU'su içeride).
+        Depo yoksa ya da DEM'den eski kaldıysa None: çağıran canlı hesaplamaya düşer.
+        """
+        from scripts.slope_tiles import INDEX_NAME, load_store
+
+        index_path = os.path.join(str(tiles_dir), INDEX_NAME)
+        if not os.path.exists(index_path) or not os.path.exists(dem_path):
+            return None
+        stamp = (os.stat(index_path).st_mtime_ns, os.stat(dem_path).st_mtime_ns)
+        key = os.path.abspath(str(tiles_dir))
+        with self._lock:
+            cached = self._slope_stores.get(key)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            store = load_store(str(tiles_dir), str(dem_path))
+            self._slope_stores[key] = (stamp, store)
+            return store
+
+    def obstacle_index(self, index_path: str):
+        """scripts/obstacle_index indeksi (bağlantılar thread başına); dosya yoksa None."""
+        from scripts.obstacle_index import load_index
+
+        key = os.path.abspath(str(index_path))
+        if not os.path.exists(key):
+            return None
+        stamp = os.stat(key).st_mtime_ns
+        with self._lock:
+            cached = self._obstacle_indexes.get(key)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            idx = load_index(key)
+            self._obstacle_indexes[key] = (stamp, idx)
+            return idx
+
+    def warm(self, paths: Iterable[str]):
+        """Var olan dosyaları önceden aç (lifespan başlangıcı)."""
+        for p in paths:
+            if p and os.path.exists(p):
+                self.open(p)
+
+    def close_all(self):
+        with self._lock:
+            for ds in self._opened:
+                if not ds.closed:
+                    ds.close()
+            self._opened = []
+            self._transformers.clear()
+            self._slope_stores.clear()
+            self._obstacle_indexes.clear()
+        self._local = threading.local()
+
+
+REGISTRY = DatasetRegistry()
@@ -0,0 +1,255 @@
+# api/encoding.py
+"""
+Yanıt kodlama: hızlı JSON + büyük FeatureCollection'lar için içerik müzakeresi.
+
+- FastJSONResponse: orjson kuruluysa onunla (opsiyonel bağımlılık), değilse stdlib json (kompakt ayraçlar).
+- Koordinatlar raster hassasiyetine yuvarlanır: adım = piksel / 1000 (UTM 10 m → 0.01 m, WGS84 → ~1e-8°).
+  Yuvarlama tüm koordinatlar tek numpy dizisinde yapılır; önbellekteki gövde değiştirilmez.
+- Accept: application/vnd.tengrilz.qgeojson+json (ya da ?format=qgeojson) → kuantize + delta kodlu FC:
+    {"type": "QuantizedFeatureCollection",
+     "transform": {"scale": [s, s], "translate": [x0, y0]},
+     "geometry_types": ["Polygon", ...],
+     "geometries": [...],            # Point: [dx, dy] | LineString/halka: [dx, dy, dx, dy, ...]
+     "properties": {"height_m": [...], ...}}   # sütunsal; eksik değer None
+  Tamsayılar tüm koleksiyon boyunca bir önceki köşeye göre farktır (ilki translate'e göre);
+  koordinat = translate + scale × kümülatif toplam. decode_quantized ile GeoJSON'a geri açılır.
+"""
+import itertools
+import json
+import math
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # opsiyonel: yoksa stdlib json
+    orjson = None
+
+QGEOJSON_MEDIA_TYPE = "application/vnd.tengrilz.qgeojson+json"
+
+
+def _np_default(o):
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON bayt dizisi; numpy dizileri (koordinat görünümleri) doğrudan serileştirilir."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_np_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def coord_digits(pixel_size: float, geographic: bool = False) -> int:
+    """Raster hassasiyeti için ondalık basamak: adım = piksel/1000 (coğrafi CRS'de dereceye çevrilir)."""
+    step = abs(float(pixel_size)) * 1e-3
+    if geographic:
+        step /= 111_320.0
+    return max(0, int(math.ceil(-math.log10(step)))) if step > 0 else 6
+
+
+def wants_quantized(format: Optional[str], accept: Optional[str]) -> bool:
+    if format:
+        return format == "qgeojson"
+    return bool(accept) and QGEOJSON_MEDIA_TYPE in accept
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Koordinat düzleştirme (Point / LineString / Polygon / Multi*)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _parts(gtype: str, coords) -> List[list]:
+    """Geometriyi koordinat dizilerine (parça) ayırır; sıra _nest ile geri kurulur."""
+    if gtype == "Point":
+        return [[coords]]
+    if gtype in ("LineString", "MultiPoint"):
+        return [coords]
+    if gtype in ("Polygon", "MultiLineString"):
+        return list(coords)
+    if gtype == "MultiPolygon":
+        return [ring for poly in coords for ring in poly]
+    raise ValueError(f"Unsupported geometry type: {gtype}")
+
+
+def _shape_of(gtype: str, coords):
+    if gtype in ("Polygon", "MultiLineString"):
+        return len(coords)
+    if gtype == "MultiPolygon":
+        return [len(poly) for poly in coords]
+    return None
+
+
+def _nest(gtype: str, shape_info, parts: List[list]):
+    if gtype == "Point":
+        return parts[0][0]
+    if gtype in ("LineString", "MultiPoint"):
+        return parts[0]
+    if gtype in ("Polygon", "MultiLineString"):
+        return parts
+    out, k = [], 0
+    for n in shape_info:
+        out.append(parts[k:k + n])
+        k += n
+    return out
+
+
+def _flatten(features: List[dict]) -> Tuple[np.ndarray, list]:
+    """Tüm köşeler (N×2) + feature başına (tip, yapı, parça uzunlukları)."""
+    all_parts, layout = [], []
+    for f in features:
+        g = f.get("geometry") or {}
+        gtype, coords = g.get("type"), g.get("coordinates")
+        if gtype is None:
+            layout.append(None)
+            continue
+        parts = _parts(gtype, coords)
+        layout.append((gtype, _shape_of(gtype, coords), [len(p) for p in parts]))
+        all_parts.extend(parts)
+    pts = list(itertools.chain.from_iterable(all_parts))
+    flat = np.fromiter(itertools.chain.from_iterable(pts), dtype=np.float64)
+    if flat.size != 2 * len(pts):  # 3B ya da karışık boyutlu koordinatlar: yalnızca x, y
+        flat = np.fromiter((v for c in pts for v in c[:2]), dtype=np.float64)
+    return flat.reshape(-1, 2), layout
+
+
+def _split(flat: list, lens: List[int], width: int) -> List[list]:
+    out, k = [], 0
+    for n in lens:
+        out.append(flat[k:k + n * width])
+        k += n * width
+    return out
+
+
+def round_features(features: List[dict], digits: int) -> List[dict]:
+    """
+    Koordinatları digits basamağa yuvarlanmış yeni feature listesi (girdi değiştirilmez).
+    Koordinatlar tek dizinin numpy görünümleridir (liste kurulmaz); dumps bunları doğrudan yazar.
+    """
+    arr, layout = _flatten(features)
+    vals = np.round(arr, digits)
+    out, k = [], 0
+    for f, lay in zip(features, layout):
+        if lay is None:
+            out.append(f)
+            continue
+        gtype, shape_info, lens = lay
+        parts = []
+        for n in lens:
+            parts.append(vals[k:k + n])
+            k += n
+        out.append({**f, "geometry": {"type": gtype, "coordinates": _nest(gtype, shape_info, parts)}})
+    return out
+
+
+def round_fc(fc: dict, digits: int) -> dict:
+    return {**fc, "features": round_features(fc.get("features", []), digits)}
+
+
+def quantize_fc(fc: dict, digits: int) -> dict:
+    """FeatureCollection → QuantizedFeatureCollection (bkz. modül açıklaması)."""
+    features = fc.get("features", [])
+    arr, layout = _flatten(features)
+    scale = 10.0 ** -digits
+    qa = np.rint(arr / scale).astype(np.int64)
+    origin = qa.min(axis=0) if len(qa) else np.zeros(2, dtype=np.int64)
+    d = np.diff(qa - origin, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+
+    types, geoms, k = [], [], 0
+    for lay in layout:
+        if lay is None:
+            types.append(None)
+            geoms.append(None)
+            continue
+        gtype, shape_info, lens = lay
+        n_pts = sum(lens)
+        parts = _split(d[2 * k:2 * (k + n_pts)], lens, 2)
+        k += n_pts
+        types.append(gtype)
+        geoms.append(_nest_flat(gtype, shape_info, parts))
+
+    columns: dict = {}
+    for f in features:
+        for name in (f.get("properties") or {}):
+            columns.setdefault(name, None)
+    props = {name: [(f.get("properties") or {}).get(name) for f in features] for name in columns}
+
+    out = {
+        "type": "QuantizedFeatureCollection",
+        "transform": {"scale": [scale, scale], "translate": [round(float(origin[0]) * scale, digits), round(float(origin[1]) * scale, digits)]},
+        "geometry_types": types,
+        "geometries": geoms,
+        "properties": props,
+    }
+    if "meta" in fc:
+        out["meta"] = fc["meta"]
+    return out
+
+
+def _nest_flat(gtype: str, shape_info, parts: List[list]):
+    # Point düz [dx, dy]; diğerleri parça listeleri _nest ile aynı yapıda
+    if gtype == "Point":
+        return parts[0]
+    return _nest(gtype, shape_info, parts)
+
+
+def decode_quantized(qfc: dict) -> dict:
+    """QuantizedFeatureCollection → GeoJSON FeatureCollection (istemci/test tarafı referans çözücü)."""
+    (sx, sy), (tx, ty) = qfc["transform"]["scale"], qfc["transform"]["translate"]
+    types, geoms, props = qfc["geometry_types"], qfc["geometries"], qfc.get("properties", {})
+    digits = max(0, int(round(-math.log10(sx))))
+
+    flat_parts, layout = [], []
+    for gtype, g in zip(types, geoms):
+        if gtype is None:
+            layout.append(None)
+            continue
+        if gtype in ("Point", "LineString", "MultiPoint"):
+            parts, shape_info = [g], None
+        elif gtype in ("Polygon", "MultiLineString"):
+            parts, shape_info = g, len(g)
+        else:
+            parts, shape_info = [r for poly in g for r in poly], [len(poly) for poly in g]
+        layout.append((gtype, shape_info, [len(p) // 2 for p in parts]))
+        flat_parts.extend(parts)
+
+    ints = np.fromiter((v for p in flat_parts for v in p), dtype=np.int64).reshape(-1, 2)
+    xy = np.cumsum(ints, axis=0) * np.array([sx, sy]) + np.array([tx, ty])
+    vals = np.round(xy, digits).tolist()
+
+    names = list(props)
+    features, k = [], 0
+    for i, lay in enumerate(layout):
+        p = {name: props[name][i] for name in names}
+        if lay is None:
+            features.append({"type": "Feature", "geometry": None, "properties": p})
+            continue
+        gtype, shape_info, lens = lay
+        parts = []
+        for n in lens:
+            parts.append(vals[k:k + n])
+            k += n
+        features.append({"type": "Feature", "geometry": {"type": gtype, "coordinates": _nest(gtype, shape_info, parts)},
+                         "properties": p})
+    out = {"type": "FeatureCollection", "features": features}
+    if "meta" in qfc:
+        out["meta"] = qfc["meta"]
+    return out
+
+
+def geo_response(body: dict, digits: Optional[int], quantized: bool = False) -> Response:
+    """FeatureCollection gövdesini raster hassasiyetinde (ve istenirse kuantize) kodlar."""
+    if quantized:
+        return Response(dumps(quantize_fc(body, 6 if digits is None else digits)), media_type=QGEOJSON_MEDIA_TYPE)
+    if digits is not None:
+        body = round_fc(body, digits)
+    return FastJSONResponse(body)
@@ -0,0 +1,244 @@
+# api/executor.py
+"""
+Ağır raster işleri için ayrılmış, sınırlı eşzamanlılıklı yürütücü.
+
+- İşler event loop dışında, ayrı bir thread havuzunda koşar (FastAPI'nin varsayılan
+  threadpool'u ve /m2/ping gibi hafif uçlar meşgul edilmez).
+- Kabul kuyruğu: bekleyen + koşan iş sayısı max_queue'ya ulaşınca 503 + Retry-After.
+- Uç başına eşzamanlılık limiti (asyncio.Semaphore).
+- Akış uçları (iş yanıt gövdesinde, kendi süreç havuzunda koşar) admit() ile aynı kabul sayacına girer;
+  uç limiti doluysa beklemeden 503 döner.
+- Kuyruk derinliği ve bekleme süreleri stats() ile okunur; bekleme ayrıca "executor.wait" span'i
+  olarak kaydedilir. İş, çağıranın contextvars bağlamında koşar (istek profili thread'e taşınır).
+
+Ayarlar (ortam değişkenleri):
+    TENGRILZ_COMPUTE_WORKERS   havuz boyutu (varsayılan: çekirdek sayısı)
+    TENGRILZ_COMPUTE_QUEUE     kabul edilen en fazla iş (varsayılan: 64)
+    TENGRILZ_ENDPOINT_LIMITS   "candidates=4,obstacles=2,clearance=2,batch=2"
+"""
+import asyncio
+import contextvars
+import functools
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from core import profiling
+
+DEFAULT_LIMITS = {"candidates": 4, "obstacles": 2, "clearance": 2, "tiles": 4, "batch": 2, "obstacles_full": 1}
+
+
+def _parse_limits(spec: Optional[str]) -> Dict[str, int]:
+    limits = dict(DEFAULT_LIMITS)
+    for part in (spec or "").split(","):
+        if "=" in part:
+            name, val = part.split("=", 1)
+            limits[name.strip()] = max(1, int(val))
+    return limits
+
+
+class _EndpointStats:
+    __slots__ = ("queued", "running", "completed", "failed", "rejected", "wait_s_total", "wait_s_max", "run_s_total")
+
+    def __init__(self):
+        self.queued = self.running = self.completed = self.failed = self.rejected = 0
+        self.wait_s_total = self.wait_s_max = self.run_s_total = 0.0
+
+    def as_dict(self) -> dict:
+        done = max(1, self.completed + self.failed)
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms_avg": round(self.wait_s_total / done * 1000.0, 3),
+            "wait_ms_max": round(self.wait_s_max * 1000.0, 3),
+            "run_ms_avg": round(self.run_s_total / done * 1000.0, 3),
+        }
+
+
+class ComputeExecutor:
+    def __init__(self, max_workers: Optional[int] = None, max_queue: int = 64,
+                 limits: Optional[Dict[str, int]] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.limits = dict(limits or DEFAULT_LIMITS)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, _EndpointStats] = {}
+        self._lock = threading.Lock()
+        self._admitted = 0
+
+    @classmethod
+    def from_env(cls) -> "ComputeExecutor":
+        return cls(
+            max_workers=int(os.environ.get("TENGRILZ_COMPUTE_WORKERS", 0)) or None,
+            max_queue=int(os.environ.get("TENGRILZ_COMPUTE_QUEUE", 64)),
+            limits=_parse_limits(os.environ.get("TENGRILZ_ENDPOINT_LIMITS")),
+        )
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="tengrilz-compute")
+            return self._pool
+
+    def _stat(self, endpoint: str) -> _EndpointStats:
+        st = self._stats.get(endpoint)
+        if st is None:
+            st = self._stats[endpoint] = _EndpointStats()
+        return st
+
+    def _retry_after_s(self) -> int:
+        runs = [s.run_s_total / max(1, s.completed + s.failed) for s in self._stats.values()]
+        avg = max(runs) if runs else 1.0
+        return max(1, math.ceil(avg * self._admitted / self.max_workers))
+
+    def _reject(self, st: _EndpointStats):
+        # self._lock altında çağrılır
+        st.rejected += 1
+        raise HTTPException(
+            503, "Compute queue full, retry later",
+            headers={"Retry-After": str(self._retry_after_s())},
+        )
+
+    def admit(self, endpoint: str) -> Callable[..., None]:
+        """
+        Havuz dışında koşan iş (akış yanıtı) için kabul: kuyruk ya da uç limiti doluysa 503 (Retry-After).
+        Dönen release(ok=True) iş bitince çağrılır; birden çok çağrı tek bırakma sayılır.
+        """
+        with self._lock:
+            st = self._stat(endpoint)
+            if self._admitted >= self.max_queue or st.running >= self.limits.get(endpoint, self.max_workers):
+                self._reject(st)
+            self._admitted += 1
+            st.running += 1
+        t_start = time.perf_counter()
+        released = []
+
+        def release(ok: bool = True):
+            with self._lock:
+                if released:
+                    return
+                released.append(True)
+                self._admitted -= 1
+                st.running -= 1
+                st.run_s_total += time.perf_counter() - t_start
+                if ok:
+                    st.completed += 1
+                else:
+                    st.failed += 1
+        return release
+
+    async def run(self, endpoint: str, fn: Callable, *args, **kwargs):
+        """fn'i havuzda koşturur; kuyruk doluysa 503 (Retry-After) fırlatır."""
+        with self._lock:
+            st = self._stat(endpoint)
+            if self._admitted >= self.max_queue:
+                self._reject(st)
+            self._admitted += 1
+            st.queued += 1
+        sem = self._sems.get(endpoint)
+        if sem is None:
+            sem = self._sems.setdefault(endpoint, asyncio.Semaphore(self.limits.get(endpoint, self.max_workers)))
+
+        loop = asyncio.get_running_loop()
+        t_submit = time.perf_counter()
+        state = {"started": False, "cancelled": False}
+
+        def _finish(ok: bool, t_start: Optional[float]):
+            # self._lock altında çağrılır
+            self._admitted -= 1
+            if t_start is not None:
+                st.running -= 1
+                st.run_s_total += time.perf_counter() - t_start
+            else:
+                st.queued -= 1  # havuza ulaşmadan iptal
+            if ok:
+                st.completed += 1
+            else:
+                st.failed += 1
+
+        def _release_sem():
+            try:
+                loop.call_soon_threadsafe(sem.release)
+            except RuntimeError:  # loop kapanmış (shutdown)
+                pass
+
+        def _call():
+            with self._lock:
+                if state["cancelled"]:
+                    return None  # istemci iş başlamadan ayrıldı; sayaçları coroutine bıraktı
+                state["started"] = True
+                t_start = time.perf_counter()
+                st.queued -= 1
+                st.running += 1
+                wait = t_start - t_submit
+                st.wait_s_total += wait
+                st.wait_s_max = max(st.wait_s_max, wait)
+            profiling.record("executor.wait", wait, start=t_submit, endpoint=endpoint)
+            # Başlamış iş, istemci ayrılsa da thread'de sürer: kabul yeri, koşan sayısı ve uç semaforu
+            # iş gerçekten bitince burada bırakılır (yoksa limitler eksik sayar)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    _finish(ok, t_start)
+                _release_sem()
+
+        ctx = contextvars.copy_context()
+        acquired = False
+        try:
+            await sem.acquire()
+            acquired = True
+            return await loop.run_in_executor(self._get_pool(), ctx.run, _call)
+        finally:
+            with self._lock:
+                never_started = not state["started"]
+                if never_started:
+                    state["cancelled"] = True
+                    _finish(False, None)
+            if never_started and acquired:
+                sem.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "admitted": self._admitted,
+                "queue_depth": sum(s.queued for s in self._stats.values()),
+                "limits": dict(self.limits),
+                "endpoints": {k: v.as_dict() for k, v in self._stats.items()},
+            }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+EXECUTOR = ComputeExecutor.from_env()
+
+
+def offload(endpoint: str):
+    """
+    Senkron handler'ı EXECUTOR üzerinden koşan async handler'a çevirir.
+    functools.wraps sayesinde FastAPI parametreleri orijinal imzadan okur.
+    """
+    def deco(fn: Callable):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await EXECUTOR.run(endpoint, fn, *args, **kwargs)
+        return wrapper
+    return deco
@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Header, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Literal, Optional, Tuple
 from pathlib import Path
-import tempfile, os
+import itertools
+import os
+import weakref
 import rasterio
+from rasterio.crs import CRS
 from rasterio.windows import from_bounds
 from rasterio.errors import RasterioIOError
-from shapely.geometry import LineString
+from shapely.geometry import LineString, MultiLineString
 from pyproj import Transformer
-from core.raster import compute_obstacles
-from core.clearance import clearance_along_route
+from core.raster import RasterArray, compute_obstacles_arrays, iter_obstacles_chunked
+from core.clearance import batch_clearance, clearance_profile, min_safe_altitude, route_tops
+from core.profiling import span
+from .datasets import REGISTRY
+from .executor import EXECUTOR, offload
+from .cache import cached, file_identity, make_key
+from .encoding import FastJSONResponse, coord_digits, dumps, geo_response, wants_quantized
 import shapely 
 from shapely.geometry import shape
 from shapely.geometry import mapping
@@ -45,6 +53,14 @@ except Exception:
 
 router = APIRouter(tags=["M2 Obstacles & Clearance"])
 
+# scripts/obstacle_index.py çıktısı; yoksa ya da DSM/DTM/min_h ile eşleşmiyorsa engeller canlı hesaplanır
+OBSTACLE_INDEX_PATH = "data/obstacles.sqlite"
+OBSTACLE_INDEX_HELP = "Engel indeksi (.sqlite); boş bırakılırsa engeller DSM/DTM'den hesaplanır"
+TOP_SOURCE_HELP = "Segment tepesi: obstacles (engel poligonları, varsayılan) | dsm (koridor şeridinde DSM maksimumu, engel çıkarımı yok)"
+GEO_FORMAT_HELP = ("geojson (koordinatlar raster hassasiyetinde) | qgeojson (kuantize + delta kodlu, "
+                   "application/vnd.tengrilz.qgeojson+json); boşsa Accept başlığına bakılır")
+FORMAT_HELP = "geojson: segment FeatureCollection | columnar: sütunsal 'profile' dizileri (uzun rotalar için, segment GeoJSON'ı boş)"
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Models
@@ -82,6 +98,24 @@ class ClearanceRequest(BaseModel):
         }
     }
 
+class BatchClearanceRequest(BaseModel):
+    """Toplu clearance: birden çok rota (UTM) × irtifa listesi."""
+    routes: List[LineStringGeoJSON] = Field(..., min_length=1)
+    altitude: dict  # { mode: "AGL"|"MSL", values_m: [number, ...] }
+    corridor_width_m: float = Field(150, ge=1)
+    min_clearance_m: float = Field(30, ge=0)
+    step_m: float = Field(25, ge=1)
+
+class MinAltitudeRequest(BaseModel):
+    """En düşük güvenli irtifa: rota (UTM) + mod; irtifa değeri yerine tırmanış/iniş eğimi sınırı."""
+    route: LineStringGeoJSON
+    altitude_mode: Literal["AGL", "MSL"] = "AGL"
+    corridor_width_m: float = Field(150, ge=1)
+    min_clearance_m: float = Field(30, ge=0)
+    step_m: float = Field(25, ge=1)
+    max_climb_gradient: float = Field(0.1, gt=0, description="m/m (0.1 = %10)")
+    max_descent_gradient: Optional[float] = Field(None, gt=0, description="Boşsa tırmanışla aynı")
+
 class ClearanceParams(BaseModel):
     """AOI endpoint: rota WGS84 query ile gelir; body’de rota gerekmez."""
     altitude: dict  # { mode: "AGL"|"MSL", value_m: number }
@@ -105,52 +139,49 @@ def _transform_fc(fc: dict, src_epsg: int, out_crs: Optional[str]):
     if oc in ("", f"EPSG:{src_epsg}"):
         return fc
 
-    t = Transformer.from_crs(f"EPSG:{src_epsg}", oc, always_xy=True)
+    t = REGISTRY.transformer(f"EPSG:{src_epsg}", oc)
 
     def _xy(x, y, z=None):
         X, Y = t.transform(x, y)
         return (X, Y) if z is None else (X, Y, z)
 
     out_feats = []
-    for f in fc.get("features", []):
-        geom = shape(f["geometry"])
-        geom_t = shp_ops.transform(lambda x, y, z=None: _xy(x, y, z), geom)
-        nf = dict(f)
-        nf["geometry"] = mapping(geom_t)
-        out_feats.append(nf)
+    with span("m2.transform_fc", features=len(fc.get("features", []))):
+        for f in fc.get("features", []):
+            geom = shape(f["geometry"])
+            geom_t = shp_ops.transform(lambda x, y, z=None: _xy(x, y, z), geom)
+            nf = dict(f)
+            nf["geometry"] = mapping(geom_t)
+            out_feats.append(nf)
     return {"type": "FeatureCollection", "features": out_feats}
 
 
 
-def _subset_raster(src_path: str, bounds, dst_path: str):
+def _subset_raster(src_path: str, bounds) -> RasterArray:
+    """AOI'yi bellekte okur (veri + affine + CRS + nodata); diske ara GeoTIFF yazılmaz."""
     if not Path(src_path).exists():
         raise HTTPException(404, f"Raster not found: {src_path}")
 
     req_minx, req_miny, req_maxx, req_maxy = bounds
-    with rasterio.open(src_path) as src:
-        ds_minx, ds_miny, ds_maxx, ds_maxy = src.bounds
-        minx = max(req_minx, ds_minx)
-        miny = max(req_miny, ds_miny)
-        maxx = min(req_maxx, ds_maxx)
-        maxy = min(req_maxy, ds_maxy)
-        if not (minx < maxx and miny < maxy):
-            raise HTTPException(400, f"AOI outside raster bounds: req={bounds}, ds={tuple(src.bounds)}")
+    src = REGISTRY.open(src_path)
+    ds_minx, ds_miny, ds_maxx, ds_maxy = src.bounds
+    minx = max(req_minx, ds_minx)
+    miny = max(req_miny, ds_miny)
+    maxx = min(req_maxx, ds_maxx)
+    maxy = min(req_maxy, ds_maxy)
+    if not (minx < maxx and miny < maxy):
+        raise HTTPException(400, f"AOI outside raster bounds: req={bounds}, ds={tuple(src.bounds)}")
 
-        win = from_bounds(minx, miny, maxx, maxy, transform=src.transform)
-        win = round_window(win, pixel_precision=3)
+    win = from_bounds(minx, miny, maxx, maxy, transform=src.transform)
+    win = round_window(win, pixel_precision=3)
 
-        if win.width <= 0 or win.height <= 0:
-            raise HTTPException(400, f"AOI window collapsed after rounding: win={win}")
+    if win.width <= 0 or win.height <= 0:
+        raise HTTPException(400, f"AOI window collapsed after rounding: win={win}")
 
-        data = src.read(1, window=win)
-        if data.size == 0:
-            raise HTTPException(400, f"AOI window empty for {src_path} (win={win})")
-
-        transform = rasterio.windows.transform(win, src.transform)
-        meta = src.meta.copy()
-        meta.update(height=int(data.shape[0]), width=int(data.shape[1]), transform=transform)
-        with rasterio.open(dst_path, "w", **meta) as dst:
-            dst.write(data, 1)
+    sub = RasterArray.from_dataset(src, window=win)
+    if sub.data.size == 0:
+        raise HTTPException(400, f"AOI window empty for {src_path} (win={win})")
+    return sub
 
 
 
@@ -158,19 +189,135 @@ def _wgs84_to_raster_xy(lon: float, lat: float, raster_path: str):
     """WGS84 (lon,lat) -> raster'ın CRS'inde (x,y). Zon otomatiğini değil dosya CRS'ini kullanır."""
     if not Path(raster_path).exists():
         raise HTTPException(404, f"Raster not found: {raster_path}")
-    with rasterio.open(raster_path) as src:
-        dst_crs = src.crs
-        if dst_crs is None:
-            raise HTTPException(400, f"Raster has no CRS: {raster_path}")
-        t = Transformer.from_crs("EPSG:4326", dst_crs, always_xy=True)
-        x, y = t.transform(lon, lat)
-        return x, y, dst_crs.to_string()
+    src = REGISTRY.open(raster_path)
+    dst_crs = src.crs
+    if dst_crs is None:
+        raise HTTPException(400, f"Raster has no CRS: {raster_path}")
+    t = REGISTRY.transformer("EPSG:4326", dst_crs.to_string())
+    x, y = t.transform(lon, lat)
+    return x, y, dst_crs.to_string()
+
+def _snap_rc(raster_path: str, x: float, y: float):
+    """(x, y) → raster piksel (satır, sütun); önbellek anahtarlarında merkezleri grid'e oturtmak için."""
+    r, c = REGISTRY.open(raster_path).index(x, y)
+    return int(r), int(c)
+
+
+def _obstacles_aoi_key(lat, lon, window_m, pad_m, dsm_path, dtm_path, min_h, smooth_sigma, out_crs, **_):
+    cx, cy, _ = _wgs84_to_raster_xy(lon, lat, dsm_path)
+    return make_key(
+        "m2/obstacles/aoi", _snap_rc(dsm_path, cx, cy), window_m, pad_m, min_h, smooth_sigma, out_crs,
+        file_identity(dsm_path), file_identity(dtm_path),
+    )
+
+
+def _coord_digits(raster_path: str, out_crs: Optional[str]) -> Optional[int]:
+    """Çıktı koordinatları için raster hassasiyeti (piksel/1000); CRS okunamazsa None (yuvarlama yok)."""
+    try:
+        src = REGISTRY.open(raster_path)
+        crs = CRS.from_user_input(out_crs) if out_crs else src.crs
+        return coord_digits(max(abs(src.res[0]), abs(src.res[1])), geographic=bool(crs and crs.is_geographic))
+    except Exception:
+        return None
+
+
+def _obstacles_aoi_respond(body: dict, dsm_path: str, out_crs: Optional[str] = None, format: Optional[str] = None,
+                           accept: Optional[str] = None, **_):
+    """GeoJSON (raster hassasiyetinde) ya da Accept/format ile kuantize + delta kodlu FC."""
+    return geo_response(body, _coord_digits(dsm_path, out_crs), quantized=wants_quantized(format, accept))
+
+
+def _clearance_aoi_key(params, lat0, lon0, lat1, lon1, window_m, pad_m, dsm_path, dtm_path, min_h, out_crs,
+                       obstacle_index=None, top_source="obstacles", format="geojson", **_):
+    x0, y0, _ = _wgs84_to_raster_xy(lon0, lat0, dsm_path)
+    x1, y1, _ = _wgs84_to_raster_xy(lon1, lat1, dsm_path)
+    return make_key(
+        "m2/clearance/aoi", _snap_rc(dsm_path, x0, y0), _snap_rc(dsm_path, x1, y1), params.model_dump(),
+        window_m, pad_m, min_h, out_crs, file_identity(dsm_path), file_identity(dtm_path),
+        file_identity(obstacle_index), top_source, format,
+    )
+
+def _indexed_obstacles(index_path: Optional[str], dsm_path: str, dtm_path: Optional[str], min_h: float,
+                       route: LineString, corridor_width_m: float):
+    """Engel indeksi bu DSM/DTM ve min_h için geçerliyse koridordaki engeller (geometri, yükseklik); değilse None."""
+    idx = REGISTRY.obstacle_index(index_path) if index_path else None
+    if idx is None or not idx.matches(dsm_path, dtm_path, min_h):
+        return None
+    with span("m2.obstacle_index") as rec:
+        obs = idx.query_corridor(route, corridor_width_m / 2.0)
+        rec["obstacles"] = int(len(obs[0]))
+    return obs
+
+
+def _clearance_inputs(route, corridor_width_m: float, bounds, dsm_path: str, dtm_path: Optional[str], min_h: float,
+                      obstacle_index: Optional[str], top_source: str = "obstacles"):
+    """
+    Clearance girdileri (route: LineString ya da çoklu rota için MultiLineString).
+    top_source="dsm": engel çıkarılmaz; yalnızca koridor kutusundaki DSM (+DTM) okunur, tepe = şerit maksimumu.
+    İndeks kullanılabiliyorsa engeller oradan gelir ve yalnızca koridor + engellerin kapsadığı zemin okunur;
+    aksi halde AOI (bounds) okunup engeller canlı çıkarılır.
+    Dönüş: (dsm_sub, dtm_sub, engel feature'ları, indeks engelleri | None).
+    """
+    indexed = None
+    if top_source != "dsm":
+        indexed = _indexed_obstacles(obstacle_index, dsm_path, dtm_path, min_h, route, corridor_width_m)
+    obstacles = []
+    if top_source == "dsm":
+        corridor_bounds = route.buffer(corridor_width_m / 2.0).bounds
+        dsm_sub = _subset_raster(dsm_path, corridor_bounds)
+        dtm_sub = _subset_raster(dtm_path, corridor_bounds) if dtm_path else None
+    elif indexed is not None:
+        minx, miny, maxx, maxy = route.buffer(corridor_width_m / 2.0).bounds
+        if len(indexed[0]):
+            ominx, ominy, omaxx, omaxy = shapely.total_bounds(indexed[0])
+            minx, miny, maxx, maxy = min(minx, ominx), min(miny, ominy), max(maxx, omaxx), max(maxy, omaxy)
+        # DTM varken DSM yalnızca zemin yedeğidir; indeks yolunda okunmaz
+        dtm_sub = _subset_raster(dtm_path, (minx, miny, maxx, maxy)) if dtm_path else None
+        dsm_sub = None if dtm_sub is not None else _subset_raster(dsm_path, (minx, miny, maxx, maxy))
+    else:
+        dsm_sub = _subset_raster(dsm_path, bounds)
+        dtm_sub = _subset_raster(dtm_path, bounds) if dtm_path else None
+        obstacles = compute_obstacles_arrays(dsm_sub, dtm_sub, min_h=min_h)
+    return dsm_sub, dtm_sub, obstacles, indexed
+
+
+def _obstacle_source(indexed, top_source: str) -> str:
+    return "index" if indexed is not None else ("none" if top_source == "dsm" else "dsm")
+
+
+def _route_clearance(route_ls: LineString, p, bounds, dsm_path: str, dtm_path: Optional[str], min_h: float,
+                     obstacle_index: Optional[str], top_source: str = "obstacles", format: str = "geojson"):
+    """
+    Ortak clearance gövdesi (p: ClearanceRequest | ClearanceParams); girdiler için bkz. _clearance_inputs.
+    format="columnar": segment GeoJSON'ı yerine sütunsal "profile". Dönüş: (sonuç dict'i, crs).
+    """
+    dsm_sub, dtm_sub, obstacles, indexed = _clearance_inputs(
+        route_ls, p.corridor_width_m, bounds, dsm_path, dtm_path, min_h, obstacle_index, top_source,
+    )
+    out = clearance_profile(
+        route=route_ls,
+        obstacles_fc={"type": "FeatureCollection", "features": obstacles},
+        altitude_mode=str(p.altitude.get("mode", "AGL")),
+        altitude_value_m=float(p.altitude.get("value_m", 60)),
+        corridor_width_m=p.corridor_width_m,
+        min_clearance_m=p.min_clearance_m,
+        step_m=p.step_m,
+        dtm=dtm_sub,
+        dsm=dsm_sub,
+        obstacles=indexed,
+        top_source=top_source,
+        geojson=(format != "columnar"),
+        columnar=(format == "columnar"),
+    )
+    out["summary"]["obstacle_source"] = _obstacle_source(indexed, top_source)
+    crs = (dtm_sub if dtm_sub is not None else dsm_sub).crs
+    return out, crs
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Health / Tools
 # ─────────────────────────────────────────────────────────────────────────────
 @router.get("/m2/ping")
-def ping():
+async def ping():
     return {"ok": True}
 
 @router.get("/m2/aoi/debug")
@@ -180,18 +327,18 @@ def aoi_debug(lat: float, lon: float, window_m: float = 3000, raster_path: str =
     req_bounds = (x - half, y - half, x + half, y + half)
 
     # 2) Raster bilgisi + window hesapları
-    with rasterio.open(raster_path) as src:
-        ds_bounds = tuple(src.bounds)
-        # clip
-        minx = max(req_bounds[0], ds_bounds[0])
-        miny = max(req_bounds[1], ds_bounds[1])
-        maxx = min(req_bounds[2], ds_bounds[2])
-        maxy = min(req_bounds[3], ds_bounds[3])
-        clipped = (minx, miny, maxx, maxy)
-
-        win = from_bounds(minx, miny, maxx, maxy, transform=src.transform)
-        from rasterio.windows import round_window
-        win_r = round_window(win, pixel_precision=3)
+    src = REGISTRY.open(raster_path)
+    ds_bounds = tuple(src.bounds)
+    # clip
+    minx = max(req_bounds[0], ds_bounds[0])
+    miny = max(req_bounds[1], ds_bounds[1])
+    maxx = min(req_bounds[2], ds_bounds[2])
+    maxy = min(req_bounds[3], ds_bounds[3])
+    clipped = (minx, miny, maxx, maxy)
+
+    win = from_bounds(minx, miny, maxx, maxy, transform=src.transform)
+    from rasterio.windows import round_window
+    win_r = round_window(win, pixel_precision=3)
 
     return {
       "crs": crs_str,
@@ -226,7 +373,17 @@ def get_obstacles(
     min_h: float = Query(2.0),
     smooth_sigma: float = Query(1.0),
     allow_full: int = Query(0, description="Set 1 to allow full raster scan (NOT RECOMMENDED)"),
+    block_px: int = Query(1024, ge=16, description="Blok kenarı (piksel); bellek ~ blok² × işçi"),
+    workers: Optional[int] = Query(None, ge=1, le=os.cpu_count() or 1,
+                                   description="Blok işçi süreç sayısı (varsayılan: çekirdek sayısı)"),
 ):
+    """
+    Tam raster taraması, bloklar halinde: engeller bulundukça FeatureCollection olarak akar
+    (application/geo+json). Bellek raster boyutuyla değil blok boyutuyla sınırlıdır.
+    Akış başladıktan sonraki hata yanıtı yarıda keser (geçersiz JSON).
+    Tarama başına bir süreç havuzu açıldığından kabul EXECUTOR ile ortak, uç "obstacles_full" (varsayılan
+    1 eşzamanlı tarama): doluysa 503 + Retry-After; yer akış bitince (ya da istemci ayrılınca) bırakılır.
+    """
     if allow_full != 1:
         raise HTTPException(
             400,
@@ -239,20 +396,53 @@ def get_obstacles(
     if dtm_path and not Path(dtm_path).exists():
         raise HTTPException(404, f"DTM not found: {dtm_path}")
 
+    release = EXECUTOR.admit("obstacles_full")
     try:
-        features = compute_obstacles(dsm_path=dsm_path, dtm_path=dtm_path, min_h=min_h, smooth_sigma=smooth_sigma)
-        return JSONResponse({"type": "FeatureCollection", "features": features})
+        features = iter_obstacles_chunked(
+            dsm_path=dsm_path, dtm_path=dtm_path, min_h=min_h, smooth_sigma=smooth_sigma,
+            block_px=block_px, max_workers=workers,
+        )
+        first = next(features, None)  # okuma hataları akış başlamadan 400/500 olarak dönsün
     except RasterioIOError as e:
+        release(False)
         raise HTTPException(400, f"Raster read error: {e}")
     except Exception as e:
+        release(False)
         raise HTTPException(500, str(e))
 
+    def _body():
+        ok = False
+        try:
+            buf = ['{"type":"FeatureCollection","features":[']
+            size = 0
+            sep = ""
+            for f in itertools.chain([first] if first is not None else [], features):
+                s = sep + dumps(f).decode()
+                sep = ","
+                buf.append(s)
+                size += len(s)
+                if size >= 65536:
+                    yield "".join(buf)
+                    buf, size = [], 0
+            buf.append("]}")
+            yield "".join(buf)
+            ok = True
+        finally:
+            features.close()  # erken kapanışta blok havuzu kapanır
+            release(ok)
+
+    body = _body()
+    weakref.finalize(body, release, False)  # gövde hiç başlamadan bırakılırsa
+    return StreamingResponse(body, media_type="application/geo+json")
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Obstacles (AOI: WGS84 merkez + pencere — HIZLI)
 # ─────────────────────────────────────────────────────────────────────────────
 
 @router.get("/m2/obstacles/aoi")
+@cached(_obstacles_aoi_key, respond=_obstacles_aoi_respond)
+@offload("obstacles")
 def get_obstacles_aoi(
     lat: float,
     lon: float,
@@ -263,30 +453,24 @@ def get_obstacles_aoi(
     min_h: float = 2.0,
     smooth_sigma: float = 1.0,
     out_crs: Optional[str] = Query(None),   # +++ EKLENDİ +++
+    format: Optional[Literal["geojson", "qgeojson"]] = Query(None, description=GEO_FORMAT_HELP),
+    accept: Optional[str] = Header(None),
 ):
     try:
         cx, cy, _ = _wgs84_to_raster_xy(lon, lat, dsm_path)
         half = window_m / 2.0 + pad_m
         bounds = (cx - half, cy - half, cx + half, cy + half)
 
-        with tempfile.TemporaryDirectory() as td:
-            dsm_sub = os.path.join(td, "DSM_sub.tif")
-            _subset_raster(dsm_path, bounds, dsm_sub)
+        dsm_sub = _subset_raster(dsm_path, bounds)
+        dtm_sub = _subset_raster(dtm_path, bounds) if dtm_path else None
 
-            dtm_sub = None
-            if dtm_path:
-                dtm_sub = os.path.join(td, "DTM_sub.tif")
-                _subset_raster(dtm_path, bounds, dtm_sub)
+        feats = compute_obstacles_arrays(dsm_sub, dtm_sub, min_h=min_h, smooth_sigma=smooth_sigma)
+        fc = {"type": "FeatureCollection", "features": feats}
 
-            feats = compute_obstacles(dsm_sub, dtm_sub, min_h=min_h, smooth_sigma=smooth_sigma)
-            fc = {"type": "FeatureCollection", "features": feats}
+        if out_crs:
+            fc = _transform_fc(fc, dsm_sub.crs.to_epsg(), out_crs)
 
-            if out_crs:
-                with rasterio.open(dsm_sub) as ds:
-                    src_epsg = ds.crs.to_epsg()
-                fc = _transform_fc(fc, src_epsg, out_crs)
-
-            return JSONResponse(fc)
+        return fc
     except HTTPException:
         raise
     except RasterioIOError as e:
@@ -300,12 +484,16 @@ def get_obstacles_aoi(
 # ─────────────────────────────────────────────────────────────────────────────
 
 @router.post("/m2/clearance/check", summary="Post Clearance (ROUTE AOI ONLY)")
+@offload("clearance")
 def post_clearance(
     req: ClearanceRequest,
     dsm_path: str = Query("data/DSM_utm.tif"),
     dtm_path: Optional[str] = Query("data/DTM_utm.tif"),
     min_h: float = Query(2.0),
     pad_m: float = Query(250.0, description="Corridor etrafına ek güvenlik payı"),
+    obstacle_index: Optional[str] = Query(OBSTACLE_INDEX_PATH, description=OBSTACLE_INDEX_HELP),
+    top_source: Literal["obstacles", "dsm"] = Query("obstacles", description=TOP_SOURCE_HELP),
+    format: Literal["geojson", "columnar"] = Query("geojson", description=FORMAT_HELP),
 ):
     if not Path(dsm_path).exists():
         raise HTTPException(404, f"DSM not found: {dsm_path}")
@@ -316,31 +504,125 @@ def post_clearance(
     route_ls = LineString(req.route.coordinates)
     corridor_half = req.corridor_width_m / 2.0
     aoi = route_ls.buffer(corridor_half + float(pad_m))
-    minx, miny, maxx, maxy = aoi.bounds
 
     try:
-        with tempfile.TemporaryDirectory() as td:
-            dsm_sub = os.path.join(td, "DSM_sub.tif")
-            dtm_sub = os.path.join(td, "DTM_sub.tif") if dtm_path else None
-            _subset_raster(dsm_path, (minx, miny, maxx, maxy), dsm_sub)
-            if dtm_path:
-                _subset_raster(dtm_path, (minx, miny, maxx, maxy), dtm_sub)
-
-            obstacles = compute_obstacles(dsm_sub, dtm_sub, min_h=min_h)
-
-            segs_fc, hotspots_fc, summary = clearance_along_route(
-                route=route_ls,
-                obstacles_fc={"type": "FeatureCollection", "features": obstacles},
-                altitude_mode=str(req.altitude.get("mode", "AGL")),
-                altitude_value_m=float(req.altitude.get("value_m", 60)),
-                corridor_width_m=req.corridor_width_m,
-                min_clearance_m=req.min_clearance_m,
-                step_m=req.step_m,
-                dtm_path=dtm_sub if dtm_sub else None,
-                dsm_path=dsm_sub,
-            )
-          
-            return JSONResponse({"segments": segs_fc, "hotspots": hotspots_fc, "summary": summary})
+        out, _ = _route_clearance(
+            route_ls, req, aoi.bounds, dsm_path, dtm_path, min_h, obstacle_index, top_source, format,
+        )
+
+        return FastJSONResponse(out)
+    except HTTPException:
+        raise
+    except RasterioIOError as e:
+        raise HTTPException(400, f"Raster read error: {e}")
+    except Exception as e:
+        raise HTTPException(500, str(e))
+
+
+@router.post("/m2/clearance/batch", summary="Post Clearance (routes × altitudes)")
+@offload("clearance")
+def post_clearance_batch(
+    req: BatchClearanceRequest,
+    dsm_path: str = Query("data/DSM_utm.tif"),
+    dtm_path: Optional[str] = Query("data/DTM_utm.tif"),
+    min_h: float = Query(2.0),
+    pad_m: float = Query(250.0, description="Corridor etrafına ek güvenlik payı"),
+    obstacle_index: Optional[str] = Query(OBSTACLE_INDEX_PATH, description=OBSTACLE_INDEX_HELP),
+    top_source: Literal["obstacles", "dsm"] = Query("obstacles", description=TOP_SOURCE_HELP),
+):
+    """
+    Aday rotalar × seyir irtifaları tek istekte: AOI tüm rotaların birleşimi, engeller bir kez;
+    her rota istasyonlarını bir kez örnekler, irtifalar dizi olarak değerlendirilir.
+    ranking: (rota, irtifa) senaryoları — fail sayısı artan, min clearance azalan.
+    """
+    if not Path(dsm_path).exists():
+        raise HTTPException(404, f"DSM not found: {dsm_path}")
+    if dtm_path and not Path(dtm_path).exists():
+        raise HTTPException(404, f"DTM not found: {dtm_path}")
+    values = req.altitude.get("values_m")
+    if values is None and "value_m" in req.altitude:
+        values = [req.altitude["value_m"]]
+    if not values:
+        raise HTTPException(400, "altitude.values_m must be a non-empty list")
+
+    routes = [LineString(r.coordinates) for r in req.routes]
+    multi = MultiLineString(routes)
+    aoi = multi.buffer(req.corridor_width_m / 2.0 + float(pad_m))
+
+    try:
+        dsm_sub, dtm_sub, obstacles, indexed = _clearance_inputs(
+            multi, req.corridor_width_m, aoi.bounds, dsm_path, dtm_path, min_h, obstacle_index, top_source,
+        )
+        mode = str(req.altitude.get("mode", "AGL"))
+        out = batch_clearance(
+            routes,
+            {"type": "FeatureCollection", "features": obstacles},
+            altitude_mode=mode,
+            altitudes_m=[float(v) for v in values],
+            corridor_width_m=req.corridor_width_m,
+            min_clearance_m=req.min_clearance_m,
+            step_m=req.step_m,
+            dtm=dtm_sub,
+            dsm=dsm_sub,
+            obstacles=indexed,
+            top_source=top_source,
+        )
+        out["summary"] = {
+            "routes": len(routes),
+            "altitude_mode": mode,
+            "altitudes_m": [float(v) for v in values],
+            "top_source": top_source,
+            "obstacle_source": _obstacle_source(indexed, top_source),
+        }
+        return FastJSONResponse(out)
+    except HTTPException:
+        raise
+    except RasterioIOError as e:
+        raise HTTPException(400, f"Raster read error: {e}")
+    except Exception as e:
+        raise HTTPException(500, str(e))
+
+
+@router.post("/m2/clearance/min_altitude", summary="Minimum safe altitude along a route")
+@offload("clearance")
+def post_min_altitude(
+    req: MinAltitudeRequest,
+    dsm_path: str = Query("data/DSM_utm.tif"),
+    dtm_path: Optional[str] = Query("data/DTM_utm.tif"),
+    min_h: float = Query(2.0),
+    pad_m: float = Query(250.0, description="Corridor etrafına ek güvenlik payı"),
+    obstacle_index: Optional[str] = Query(OBSTACLE_INDEX_PATH, description=OBSTACLE_INDEX_HELP),
+    top_source: Literal["obstacles", "dsm"] = Query("obstacles", description=TOP_SOURCE_HELP),
+):
+    """
+    Sabit irtifada pass/fail yerine min_clearance_m'yi sağlayan en düşük irtifa: segment başına profil,
+    basamak profili ve eğim sınırlı (tırmanış/iniş) MSL profili; tek geçişte (bkz. core.clearance.min_safe_altitude).
+    """
+    if not Path(dsm_path).exists():
+        raise HTTPException(404, f"DSM not found: {dsm_path}")
+    if dtm_path and not Path(dtm_path).exists():
+        raise HTTPException(404, f"DTM not found: {dtm_path}")
+
+    route_ls = LineString(req.route.coordinates)
+    aoi = route_ls.buffer(req.corridor_width_m / 2.0 + float(pad_m))
+
+    try:
+        dsm_sub, dtm_sub, obstacles, indexed = _clearance_inputs(
+            route_ls, req.corridor_width_m, aoi.bounds, dsm_path, dtm_path, min_h, obstacle_index, top_source,
+        )
+        tops = route_tops(
+            route_ls, req.corridor_width_m, req.step_m, dtm_sub, dsm_sub,
+            obstacles_fc={"type": "FeatureCollection", "features": obstacles},
+            obstacles=indexed, top_source=top_source,
+        )
+        out = min_safe_altitude(
+            tops, req.altitude_mode, req.min_clearance_m,
+            max_climb_gradient=req.max_climb_gradient, max_descent_gradient=req.max_descent_gradient,
+        )
+        out["summary"]["obstacle_source"] = _obstacle_source(indexed, top_source)
+        return FastJSONResponse(out)
+    except HTTPException:
+        raise
     except RasterioIOError as e:
         raise HTTPException(400, f"Raster read error: {e}")
     except Exception as e:
@@ -352,6 +634,8 @@ def post_clearance(
 # ─────────────────────────────────────────────────────────────────────────────
 
 @router.post("/m2/clearance/aoi", summary="Post Clearance (WGS84+AOI)")
+@cached(_clearance_aoi_key)
+@offload("clearance")
 def clearance_aoi(
     params: ClearanceParams,
     lat0: float,
@@ -363,7 +647,10 @@ def clearance_aoi(
     dsm_path: str = Query("data/DSM_utm.tif"),
     dtm_path: Optional[str] = Query("data/DTM_utm.tif"),
     min_h: float = 2.0,
-    out_crs: Optional[str] = Query(None), 
+    out_crs: Optional[str] = Query(None),
+    obstacle_index: Optional[str] = Query(OBSTACLE_INDEX_PATH, description=OBSTACLE_INDEX_HELP),
+    top_source: Literal["obstacles", "dsm"] = Query("obstacles", description=TOP_SOURCE_HELP),
+    format: Literal["geojson", "columnar"] = Query("geojson", description=FORMAT_HELP),
 ):
     try:
         x0, y0, _ = _wgs84_to_raster_xy(lon0, lat0, dsm_path)
@@ -376,37 +663,16 @@ def clearance_aoi(
         cy = 0.5 * (y0 + y1)
         bounds = (cx - half, cy - half, cx + half, cy + half)
 
-        with tempfile.TemporaryDirectory() as td:
-            dsm_sub = os.path.join(td, "DSM_sub.tif")
-            _subset_raster(dsm_path, bounds, dsm_sub)
-
-            dtm_sub = None
-            if dtm_path:
-                dtm_sub = os.path.join(td, "DTM_sub.tif")
-                _subset_raster(dtm_path, bounds, dtm_sub)
-
-            obstacles = compute_obstacles(dsm_sub, dtm_sub, min_h=min_h)
-
-            segs_fc, hotspots_fc, summary = clearance_along_route(
-                route=route_ls,
-                obstacles_fc={"type": "FeatureCollection", "features": obstacles},
-                altitude_mode=str(params.altitude.get("mode", "AGL")),
-                altitude_value_m=float(params.altitude.get("value_m", 60)),
-                corridor_width_m=params.corridor_width_m,
-                min_clearance_m=params.min_clearance_m,
-                step_m=params.step_m,
-                dtm_path=dtm_sub if dtm_sub else None,
-                dsm_path=dsm_sub,
-            )  
-          
-            
-            if out_crs:
-                with rasterio.open(dsm_sub) as ds:
-                    src_epsg = ds.crs.to_epsg()
-                segs_fc = _transform_fc(segs_fc, src_epsg, out_crs)
-                hotspots_fc = _transform_fc(hotspots_fc, src_epsg, out_crs)
-            
-            return JSONResponse({"segments": segs_fc, "hotspots": hotspots_fc, "summary": summary})
+        out, crs = _route_clearance(
+            route_ls, params, bounds, dsm_path, dtm_path, min_h, obstacle_index, top_source, format,
+        )
+
+        if out_crs:
+            src_epsg = crs.to_epsg()
+            out["segments"] = _transform_fc(out["segments"], src_epsg, out_crs)
+            out["hotspots"] = _transform_fc(out["hotspots"], src_epsg, out_crs)
+
+        return out
     except HTTPException:
         raise
     except RasterioIOError as e:
@@ -1,21 +1,67 @@
 # api/main.py
 from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+import json
+import multiprocessing
+import os
 import pathlib
 import sys
+import threading
+import weakref
 
 # --- M1: aircraft-aware helper ---
-# (api/aircraft.py dosyasında resolve_aircraft_params fonksiyonunu tutuyoruz)
+# (api/aircraft.py: PRESETS + resolve_request_aircraft, tüm uçlarda aynı eşik önceliği)
 try:
-    from .aircraft import resolve_aircraft_params  # package import (installed/as module)
+    from .aircraft import PRESETS, resolve_request_aircraft  # package import (installed/as module)
 except Exception:
     # local fallback: allow running when launched as script (no package context)
     sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
-    from aircraft import resolve_aircraft_params  # type: ignore
+    from aircraft import PRESETS, resolve_request_aircraft  # type: ignore
 
-app = FastAPI(title="TengriLZ API")
+from .datasets import REGISTRY, SLOPE_TILES_DIR
+from .executor import EXECUTOR, offload
+from .cache import CACHE, cached, file_identity, make_key
+from .encoding import FastJSONResponse
+from .metrics import metrics_response, timing_middleware
+from scripts.slope_tiles import INDEX_NAME as SLOPE_INDEX_NAME
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
+DEM_PATH = PROJECT_ROOT / "data" / "dem.tif"
+
+# /candidates/batch süreç havuzu (ilk istekte açılır); boyut: TENGRILZ_BATCH_WORKERS ya da çekirdek sayısı
+_BATCH_POOL: Optional[ProcessPoolExecutor] = None
+_BATCH_POOL_LOCK = threading.Lock()
+
+
+def _batch_pool() -> ProcessPoolExecutor:
+    global _BATCH_POOL
+    with _BATCH_POOL_LOCK:  # eşzamanlı ilk istekler tek havuz paylaşsın
+        if _BATCH_POOL is None:
+            workers = int(os.environ.get("TENGRILZ_BATCH_WORKERS", 0)) or os.cpu_count() or 1
+            _BATCH_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _BATCH_POOL
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _BATCH_POOL
+    # Varsayılan rasterları baştan aç; kapanışta tüm handle'ları bırak
+    REGISTRY.warm([str(DEM_PATH), "data/DSM_utm.tif", "data/DTM_utm.tif"])
+    yield
+    REGISTRY.close_all()
+    EXECUTOR.shutdown()
+    with _BATCH_POOL_LOCK:
+        pool, _BATCH_POOL = _BATCH_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="TengriLZ API", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # CORS (dev kolaylığı)
 app.add_middleware(
@@ -25,26 +71,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# İstek süreleri (/metrics) + ?debug_timings=1 → meta.timings
+app.middleware("http")(timing_middleware)
+
 from .m2 import router as m2_router
+from .tiles import router as tiles_router
 app.include_router(m2_router)
+app.include_router(tiles_router)
 
 
 @app.get("/", include_in_schema=False)
 def root():
     return RedirectResponse(url="/docs")
 
+@app.get("/stats/executor")
+async def executor_stats():
+    """Hesap havuzu: kuyruk derinliği, uç başına koşan/bekleyen iş ve bekleme süreleri."""
+    return EXECUTOR.stats()
+
+@app.get("/stats/cache")
+async def cache_stats():
+    return CACHE.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metin formatı: aşama/istek süre histogramları, yürütücü ve önbellek gauge'ları."""
+    return metrics_response()
+
+def _resolve_candidate_aircraft(aircraft_code, rotor_diameter_m, safety_margin_m, k, slope_max_deg,
+                                min_diameter_m, slope_override_deg) -> List[dict]:
+    """
+    aircraft_code tek kod ya da virgüllü liste (ör. "EC135,UH-1H,S70" → çoklu uçak).
+    Tek kod: override > istek eşiği > 12°. Çoklu uçakta istek eşiği verilmemişse preset'ler kendi limitini alır.
+    """
+    codes = list(dict.fromkeys(c.strip() for c in (aircraft_code or "").split(",") if c.strip()))
+    return [
+        resolve_request_aircraft(
+            code, slope_max_deg, min_diameter_m,
+            rotor_diameter_m=rotor_diameter_m,
+            safety_margin_m=safety_margin_m,
+            k=k,
+            slope_override_deg=slope_override_deg,
+            preset_slope=len(codes) > 1,
+        )
+        for code in (codes or [aircraft_code])
+    ]
+
+
+def _candidates_key(lat, lon, window_m, slope_max_deg, min_diameter_m, morph,
+                    aircraft_code, rotor_diameter_m, safety_margin_m, k, slope_override_deg, top_k, **_):
+    dem_path = str(DEM_PATH)
+    src = REGISTRY.open(dem_path)
+    x, y = REGISTRY.transformer("EPSG:4326", src.crs.to_string()).transform(lon, lat)
+    row, col = src.index(x, y)
+    acs = _resolve_candidate_aircraft(aircraft_code, rotor_diameter_m, safety_margin_m, k, slope_max_deg,
+                                      min_diameter_m, slope_override_deg)
+    tiles = REGISTRY.slope_store(SLOPE_TILES_DIR, dem_path) is not None
+    # karolar yeniden üretilirse (ör. farklı dtype) eski sonuçlar kullanılmasın
+    identity = (file_identity(dem_path), file_identity(str(SLOPE_TILES_DIR / SLOPE_INDEX_NAME)))
+    return make_key("candidates", (int(row), int(col)), window_m, morph, acs, top_k, identity, tiles)
+
+
 @app.get("/candidates")
+@cached(_candidates_key)
+@offload("candidates")
 def candidates(
     # --- M0 parametreleri (mevcut) ---
     lat: float = Query(..., description="Merkez enlem (DD)"),
     lon: float = Query(..., description="Merkez boylam (DD)"),
     window_m: float = 800.0,
-    slope_max_deg: float = 12.0,
+    slope_max_deg: Optional[float] = Query(None, description="Eğim eşiği (varsayılan 12°; çoklu uçakta preset limiti)"),
     min_diameter_m: float = 30.0,
     morph: str = Query("closing", regex="^(closing|opening)$"),
+    top_k: int = Query(3, ge=1, le=50, description="Döndürülecek aday sayısı (skora göre)"),
 
     # --- M1: aircraft-aware parametreleri (opsiyonel) ---
-    aircraft_code: Optional[str] = Query(None, description="EC135 | UH-1H | S70 | Custom(boş)"),
+    aircraft_code: Optional[str] = Query(None, description="EC135 | UH-1H | S70 | Custom(boş); virgüllü liste → çoklu uçak"),
     rotor_diameter_m: Optional[float] = Query(None, description="Rotor çapı (m)"),
     safety_margin_m: Optional[float] = Query(None, description="Emniyet payı (m)"),
     k: Optional[float] = Query(None, description="Operasyon katsayısı"),
@@ -52,24 +154,41 @@ def candidates(
 ):
     """
     M0: DEM -> slope -> morph -> candidate patches (lz_candidates.main ile)
-    M1: Aircraft-aware: sadece eşik değerlerini belirler (slope + min_clear_diameter)
+    M1: Aircraft-aware: eşik değerlerini (slope + min_clear_diameter) ve skor ağırlıklarını belirler
+    Çoklu uçak (aircraft_code=EC135,UH-1H,S70): eğim tek geçişte, her uçağın adayları ortak dizilerden;
+    dönüş {"results": [{"aircraft": kod, FeatureCollection}, ...], "meta": {...}}
     """
     try:
         # --- Yol kurulumları ---
-        project_root = pathlib.Path(__file__).resolve().parent.parent
-        scripts_dir  = project_root / "scripts"
-        dem_path     = project_root / "data" / "dem.tif"
+        scripts_dir  = PROJECT_ROOT / "scripts"
+        dem_path     = DEM_PATH
         sys.path.insert(0, str(scripts_dir))
 
         # --- M1: aircraft parametrelerini çözelim (yalnızca eşikleri belirlemek için) ---
-        ac = resolve_aircraft_params(
-            aircraft_code=aircraft_code,
-            rotor_diameter_m=rotor_diameter_m,
-            safety_margin_m=safety_margin_m,
-            k=k,
-            slope_max_deg=(slope_override_deg if slope_override_deg is not None else slope_max_deg),
-            user_min_diameter_m=min_diameter_m,
-        )
+        acs = _resolve_candidate_aircraft(aircraft_code, rotor_diameter_m, safety_margin_m, k, slope_max_deg,
+                                          min_diameter_m, slope_override_deg)
+        if len(acs) > 1:
+            from scripts.lz_candidates import main_multi
+            result = main_multi(
+                str(dem_path),
+                center_lat=lat,
+                center_lon=lon,
+                aircraft=[
+                    {"code": a["code"], "slope_max_deg": a["slope_max_deg"],
+                     "min_diameter_m": a["min_clear_diameter_m"], "score_weights": a["score_weights"]}
+                    for a in acs
+                ],
+                window_m=window_m,
+                morph=morph,
+                top_k=top_k,
+                dataset=REGISTRY.open(str(dem_path)),
+                slope_store=REGISTRY.slope_store(SLOPE_TILES_DIR, str(dem_path)),
+            )
+            for res, a in zip(result["results"], acs):
+                res["meta"]["aircraft"] = a
+            result["meta"]["center_wgs84"] = {"lat": lat, "lon": lon}
+            return result
+        ac = acs[0]
         # Aircraft override'ları M0 eşiğine uygula
         slope_limit = ac["slope_max_deg"]
         min_clear_diameter_m = ac["min_clear_diameter_m"]
@@ -85,6 +204,10 @@ def candidates(
             slope_max_deg=float(slope_limit),         # M1 etkisi
             min_diameter_m=float(min_clear_diameter_m),  # M1 etkisi
             morph=morph,
+            top_k=top_k,
+            score_weights=ac["score_weights"],         # uçağa göre sıralama
+            dataset=REGISTRY.open(str(dem_path)),
+            slope_store=REGISTRY.slope_store(SLOPE_TILES_DIR, str(dem_path)),
         )
 
         if result is None:
@@ -112,3 +235,85 @@ def candidates(
     except Exception as e:
         # Lokal debug kolaylığı için hatayı açık döndürüyoruz
         raise HTTPException(status_code=500, detail=str(e))
+
+
+class BatchCenter(BaseModel):
+    lat: float
+    lon: float
+    id: Optional[str] = None
+    aircraft_code: Optional[str] = None  # merkez başına preset (EC135 | UH-1H | S70)
+
+    @field_validator("aircraft_code")
+    @classmethod
+    def _known_preset(cls, v: Optional[str]) -> Optional[str]:
+        # batch'te özel uçak parametresi yok: bilinmeyen kod (yazım hatası) sessizce 12°'ye düşmesin → 422
+        if v is not None and v not in PRESETS:
+            raise ValueError(f"unknown aircraft_code {v!r} (available: {', '.join(PRESETS)})")
+        return v
+
+
+class CandidatesBatchRequest(BaseModel):
+    centers: List[BatchCenter] = Field(..., min_length=1)
+    window_m: float = 800.0
+    slope_max_deg: float = 12.0
+    min_diameter_m: float = 30.0
+    morph: Literal["closing", "opening"] = "closing"
+    top_k: int = Field(3, ge=1, le=50)
+
+
+@app.post("/candidates/batch")
+def candidates_batch(req: CandidatesBatchRequest):
+    """
+    Çok merkez için /candidates: işler süreç havuzuna dağıtılır, sonuçlar NDJSON olarak
+    her merkez bittikçe akar (sıra: bitiş sırası; satırdaki "index" istek sırasını verir).
+    Pencereleri örtüşen merkezler tek işte, DEM bir kez okunarak hesaplanır; aynı piksel + aynı eşik bir kez.
+    Kabul EXECUTOR ile ortak (uç "batch"): kuyruk ya da uç limiti doluysa 503 + Retry-After; yer akış bitince bırakılır.
+    """
+    if not DEM_PATH.exists():
+        raise HTTPException(404, f"DEM not found: {DEM_PATH}")
+    sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+    from scripts.lz_candidates import iter_candidates_batch
+
+    dem_path = str(DEM_PATH)
+    acs = [
+        # /candidates (tek kod) ile aynı öncelik: istek eşiği; preset yalnızca çap + ağırlıkları belirler
+        resolve_request_aircraft(c.aircraft_code, req.slope_max_deg, req.min_diameter_m)
+        for c in req.centers
+    ]
+    centers = [
+        {"lat": c.lat, "lon": c.lon, "slope_max_deg": ac["slope_max_deg"], "min_diameter_m": ac["min_clear_diameter_m"],
+         "score_weights": ac["score_weights"]}
+        for c, ac in zip(req.centers, acs)
+    ]
+    tiles_dir = str(SLOPE_TILES_DIR) if REGISTRY.slope_store(SLOPE_TILES_DIR, dem_path) is not None else None
+    release = EXECUTOR.admit("batch")
+
+    def _lines():
+        ok, results = False, None
+        try:
+            results = iter_candidates_batch(
+                dem_path, centers,
+                window_m=req.window_m,
+                morph=req.morph,
+                top_k=req.top_k,
+                slope_tiles_dir=tiles_dir,
+                executor=_batch_pool(),
+            )
+            for idxs, result in results:
+                for i in idxs:
+                    c = req.centers[i]
+                    line = {"index": i, "id": c.id, "center_wgs84": {"lat": c.lat, "lon": c.lon}, "aircraft": acs[i]}
+                    if "error" in result:
+                        line["error"] = result["error"]
+                    else:
+                        line["result"] = result
+                    yield json.dumps(line) + "\n"
+            ok = True
+        finally:
+            if results is not None:
+                results.close()  # erken kapanışta paylaşımlı havuzdaki bekleyen işler iptal edilir
+            release(ok)
+
+    body = _lines()
+    weakref.finalize(body, release, False)  # gövde hiç başlamadan bırakılırsa (istemci erken ayrıldı)
+    return StreamingResponse(body, media_type="application/x-ndjson")
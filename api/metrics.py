@@ -0,0 +1,104 @@
+# api/metrics.py
+"""
+İstek süresi metrikleri, ?debug_timings=1 zaman çizelgesi ve /metrics (Prometheus metni).
+
+- Her HTTP isteğinin süresi route şablonu + durum koduna göre histograma yazılır.
+- debug_timings=1 (veya true) ise istek boyunca core.profiling span'leri toplanır ve JSON
+  yanıtın meta.timings alanına eklenir: {"total_ms", "stages": [{"stage", "start_ms", "ms", ...}]}.
+  Akış (NDJSON) ve JSON olmayan yanıtlara dokunulmaz. Önbellek isabetinde yalnızca cache.get görünür.
+- /metrics: aşama/istek histogramları + yürütücü ve önbellek gauge'ları.
+"""
+import json
+import time
+from typing import List
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse, Response
+
+from core import profiling
+from core.profiling import Histogram
+from .cache import CACHE
+from .executor import EXECUTOR
+from .tiles import TILES
+
+REQUEST_SECONDS = Histogram(
+    "tengrilz_request_seconds", "HTTP request duration in seconds", ("route", "method", "status"),
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _wants_timings(request: Request) -> bool:
+    return request.query_params.get("debug_timings", "").lower() in ("1", "true", "yes")
+
+
+async def _with_timings(response: Response, timings: dict) -> Response:
+    """JSON gövdesini okuyup meta.timings ekler; JSON değilse gövde aynen döner."""
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        data["meta"] = {**data.get("meta", {}), "timings": timings}
+        body = json.dumps(data).encode()
+    return Response(body, status_code=response.status_code, headers=headers, media_type=response.media_type)
+
+
+async def timing_middleware(request: Request, call_next):
+    route_path = request.url.path
+    t0 = time.perf_counter()
+    if _wants_timings(request):
+        with profiling.collect() as stages:
+            response = await call_next(request)
+        total = time.perf_counter() - t0
+        if response.headers.get("content-type", "").startswith("application/json"):
+            response = await _with_timings(response, {"total_ms": round(total * 1000.0, 3), "stages": list(stages)})
+    else:
+        response = await call_next(request)
+        total = time.perf_counter() - t0
+    route = request.scope.get("route")
+    if route is not None:
+        route_path = getattr(route, "path", route_path)
+    REQUEST_SECONDS.observe(total, route=route_path, method=request.method, status=response.status_code)
+    return response
+
+
+def _gauge(name: str, help: str, samples: List[tuple], kind: str = "gauge") -> List[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lbl = ",".join(f'{k}="{profiling._escape(v)}"' for k, v in labels.items())
+        lines.append(f"{name}{{{lbl}}} {value}" if lbl else f"{name} {value}")
+    return lines
+
+
+def _runtime_lines() -> List[str]:
+    ex = EXECUTOR.stats()
+    eps = ex["endpoints"]
+    cache = CACHE.stats()
+    lines: List[str] = []
+    lines += _gauge("tengrilz_executor_workers", "Compute pool size", [({}, ex["max_workers"])])
+    lines += _gauge("tengrilz_executor_admitted", "Jobs admitted (queued + running)", [({}, ex["admitted"])])
+    lines += _gauge("tengrilz_executor_queue_depth", "Jobs waiting for a worker", [({}, ex["queue_depth"])])
+    lines += _gauge("tengrilz_executor_running", "Jobs running per endpoint",
+                    [({"endpoint": k}, v["running"]) for k, v in eps.items()])
+    lines += _gauge("tengrilz_executor_completed_total", "Jobs finished per endpoint",
+                    [({"endpoint": k}, v["completed"]) for k, v in eps.items()], "counter")
+    lines += _gauge("tengrilz_executor_failed_total", "Jobs failed per endpoint",
+                    [({"endpoint": k}, v["failed"]) for k, v in eps.items()], "counter")
+    lines += _gauge("tengrilz_executor_rejected_total", "Jobs rejected with 503 per endpoint",
+                    [({"endpoint": k}, v["rejected"]) for k, v in eps.items()], "counter")
+    lines += _gauge("tengrilz_cache_entries", "Result cache entries in memory", [({}, cache["entries"])])
+    lines += _gauge("tengrilz_cache_max_entries", "Result cache capacity", [({}, cache["max_entries"])])
+    lines += _gauge("tengrilz_cache_hits_total", "Result cache hits", [({}, cache["hits"])], "counter")
+    lines += _gauge("tengrilz_cache_misses_total", "Result cache misses", [({}, cache["misses"])], "counter")
+    tiles = TILES.stats()
+    lines += _gauge("tengrilz_tile_cache_entries", "Vector tile cache entries", [({}, tiles["entries"])])
+    lines += _gauge("tengrilz_tile_cache_hits_total", "Vector tile cache hits", [({}, tiles["hits"])], "counter")
+    lines += _gauge("tengrilz_tile_cache_misses_total", "Vector tile cache misses", [({}, tiles["misses"])], "counter")
+    return lines
+
+
+def metrics_response() -> PlainTextResponse:
+    return PlainTextResponse(profiling.render_prometheus(_runtime_lines()), media_type=PROMETHEUS_CONTENT_TYPE)
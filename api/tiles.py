@@ -0,0 +1,240 @@
+# api/tiles.py
+"""
+Vektör karolar: /tiles/{layer}/{z}/{x}/{y}.mvt (Mapbox Vector Tile, EPSG:3857 XYZ şeması).
+
+Katmanlar:
+- obstacles  (z ≥ 14): engel indeksi geçerliyse oradan, değilse karo + halo DSM/DTM'den canlı
+  (core.raster.compute_obstacles_arrays). Özellikler compute_obstacles ile aynı.
+- candidates (z ≥ 12): karo merkezinde, karo genişliğinde pencereyle lz_candidates.main
+  (karo başına en büyük 3 aday + iç teğet daire merkezleri).
+Clearance hotspot'ları rota isteğine bağlı olduğundan karo katmanı değildir (/m2/clearance/* GeoJSON).
+
+- Zoom'a göre sadeleştirme: tolerans bir karo birimi (karo genişliği / 4096).
+- Önbellek: karo baytları bellekte LRU (TENGRILZ_TILE_CACHE_ENTRIES, varsayılan 2048).
+- ETag: girdilerden (katman, z/x/y, parametreler, raster/indeks kimlikleri) türetilir; If-None-Match
+  eşleşirse karo üretilmeden 304 döner. Min zoom altı ve veri dışı karolar boş (0 bayt) karodur.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import shapely
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+from rasterio.windows import from_bounds
+from shapely.geometry import shape
+
+from core.mvt import EXTENT, BUFFER, encode_layer, encode_tile, tile_bounds_3857, tile_center_lonlat, to_tile_space, valid_tile
+from core.profiling import span
+from core.raster import RasterArray, compute_obstacles_arrays, obstacle_geometries, obstacle_halo_px
+from scripts.slope_tiles import INDEX_NAME as SLOPE_INDEX_NAME
+from .aircraft import resolve_request_aircraft
+from .cache import file_identity, make_key
+from .datasets import REGISTRY, SLOPE_TILES_DIR
+from .executor import EXECUTOR
+
+router = APIRouter(tags=["Tiles"])
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+TILE_VERSION = 2  # karo üretimi değişirse artırın (ETag'ler geçersiz olur)
+MIN_ZOOM = {"obstacles": 14, "candidates": 12}
+
+
+class TileCache:
+    """Karo baytları için sınırlı LRU (thread-safe)."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._mem.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._mem.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            self._mem[key] = data
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._mem), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+TILES = TileCache(int(os.environ.get("TENGRILZ_TILE_CACHE_ENTRIES", 2048)))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Katman kaynakları: (kaynak CRS geometrileri, özellikler, kaynak CRS)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _source_bounds(src, bounds_3857) -> Tuple[float, float, float, float]:
+    """Karo (+ MVT tamponu) sınırları raster CRS'inde."""
+    minx, miny, maxx, maxy = bounds_3857
+    pad = (maxx - minx) * BUFFER / EXTENT
+    t = REGISTRY.transformer("EPSG:3857", src.crs.to_string())
+    return t.transform_bounds(minx - pad, miny - pad, maxx + pad, maxy + pad, densify_pts=21)
+
+
+def _read(path: str, bounds) -> Optional[RasterArray]:
+    """Sınırlarla kesişen pencere (raster dışıysa None)."""
+    src = REGISTRY.open(path)
+    l, b, r, t = src.bounds
+    minx, miny, maxx, maxy = max(bounds[0], l), max(bounds[1], b), min(bounds[2], r), min(bounds[3], t)
+    if not (minx < maxx and miny < maxy):
+        return None
+    win = from_bounds(minx, miny, maxx, maxy, transform=src.transform).round_offsets().round_lengths()
+    if win.width < 1 or win.height < 1:
+        return None
+    return RasterArray.from_dataset(src, window=win)
+
+
+def _obstacles_source(z, x, y, bounds_3857, dsm_path, dtm_path, min_h, smooth_sigma, obstacle_index, **_):
+    src = REGISTRY.open(dsm_path)
+    bounds = _source_bounds(src, bounds_3857)
+    idx = REGISTRY.obstacle_index(obstacle_index) if obstacle_index else None
+    if idx is not None and idx.matches(dsm_path, dtm_path, min_h, smooth_sigma):
+        with span("tiles.obstacle_index"):
+            geoms, props = idx.query_bbox_geoms(*bounds)
+        return geoms, props, src.crs
+    # Karo kenarında sonuç tam raster ile aynı kalsın diye halo ile okunur
+    halo = obstacle_halo_px(smooth_sigma, dtm_path is None) * max(abs(src.res[0]), abs(src.res[1]))
+    read = (bounds[0] - halo, bounds[1] - halo, bounds[2] + halo, bounds[3] + halo)
+    dsm = _read(dsm_path, read)
+    if dsm is None:
+        return np.empty(0, dtype=object), [], src.crs
+    dtm = _read(dtm_path, read) if dtm_path else None
+    feats = compute_obstacles_arrays(dsm, dtm, min_h=min_h, smooth_sigma=smooth_sigma)
+    geoms, _ = obstacle_geometries(feats)
+    return geoms, [f["properties"] for f in feats], src.crs
+
+
+def _candidates_source(z, x, y, bounds_3857, dem_path, slope_max_deg, min_diameter_m, morph,
+                       score_weights=None, **_):
+    from scripts.lz_candidates import main as lz_main
+
+    src = REGISTRY.open(dem_path)
+    lon, lat = tile_center_lonlat(z, x, y)
+    l, b, r, t = _source_bounds(src, bounds_3857)
+    # lz_candidates.main pencereyi merkezden yarı genişlik (m) olarak alır; raster CRS'i metrik varsayılır
+    half = 0.5 * max(r - l, t - b)
+    result = lz_main(
+        dem_path, center_lat=lat, center_lon=lon, window_m=half,
+        slope_max_deg=slope_max_deg, min_diameter_m=min_diameter_m, morph=morph,
+        score_weights=score_weights, dataset=src, slope_store=REGISTRY.slope_store(SLOPE_TILES_DIR, dem_path),
+    )
+    feats = result.get("features", [])
+    geoms = np.array([shape(f["geometry"]) for f in feats], dtype=object)
+    return geoms, [f.get("properties", {}) for f in feats], src.crs
+
+
+LAYERS: Dict[str, Callable] = {"obstacles": _obstacles_source, "candidates": _candidates_source}
+
+
+def render_tile(layer: str, z: int, x: int, y: int, **params) -> bytes:
+    """Tek katmanlı MVT karo baytları (veri yoksa b"")."""
+    bounds_3857 = tile_bounds_3857(z, x, y)
+    with span(f"tiles.{layer}.source"):
+        geoms, props, crs = LAYERS[layer](z, x, y, bounds_3857, **params)
+    if len(geoms) == 0:
+        return b""
+    with span("tiles.encode", features=len(geoms)):
+        t = REGISTRY.transformer(crs.to_string(), "EPSG:3857")
+        merc = shapely.transform(np.asarray(geoms, dtype=object),
+                                 lambda c: np.column_stack(t.transform(c[:, 0], c[:, 1])))
+        tile_geoms, keep = to_tile_space(merc, bounds_3857)
+        return encode_tile([encode_layer(layer, tile_geoms, [props[i] for i in keep])])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Endpoint
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    return bool(inm) and (inm.strip() == "*" or etag in [v.strip() for v in inm.split(",")])
+
+
+def _tile_response(data: bytes, etag: str, state: str) -> Response:
+    return Response(
+        data, media_type=MVT_MEDIA_TYPE,
+        headers={"ETag": etag, "Cache-Control": "public, max-age=300", "X-Tile-Cache": state},
+    )
+
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}.mvt", summary="Vector tile (MVT): obstacles | candidates")
+async def get_tile(
+    request: Request,
+    layer: str,
+    z: int,
+    x: int,
+    y: int,
+    dsm_path: str = Query("data/DSM_utm.tif"),
+    dtm_path: Optional[str] = Query("data/DTM_utm.tif"),
+    min_h: float = Query(2.0),
+    smooth_sigma: float = Query(1.0),
+    obstacle_index: Optional[str] = Query("data/obstacles.sqlite", description="Engel indeksi (.sqlite); geçersizse canlı hesap"),
+    dem_path: str = Query("data/dem.tif"),
+    aircraft_code: Optional[str] = Query(None, description="EC135 | UH-1H | S70 (candidates)"),
+    slope_max_deg: float = Query(12.0),
+    min_diameter_m: float = Query(30.0),
+    morph: str = Query("closing", pattern="^(closing|opening)$"),
+):
+    if layer not in LAYERS:
+        raise HTTPException(404, f"Unknown layer: {layer} (available: {', '.join(LAYERS)})")
+    if not valid_tile(z, x, y):
+        raise HTTPException(404, f"Invalid tile: {z}/{x}/{y}")
+
+    if layer == "obstacles":
+        for p in (dsm_path, dtm_path):
+            if p and not os.path.exists(p):
+                raise HTTPException(404, f"Raster not found: {p}")
+        params = dict(dsm_path=dsm_path, dtm_path=dtm_path, min_h=min_h, smooth_sigma=smooth_sigma,
+                      obstacle_index=obstacle_index)
+        identity = (file_identity(dsm_path), file_identity(dtm_path), file_identity(obstacle_index))
+    else:
+        if not os.path.exists(dem_path):
+            raise HTTPException(404, f"DEM not found: {dem_path}")
+        # /candidates (tek kod) ile aynı öncelik: istek eşiği; preset yalnızca çap + ağırlıkları belirler
+        ac = resolve_request_aircraft(aircraft_code, slope_max_deg, min_diameter_m)
+        params = dict(dem_path=dem_path, slope_max_deg=float(ac["slope_max_deg"]),
+                      min_diameter_m=float(ac["min_clear_diameter_m"]), morph=morph,
+                      score_weights=ac["score_weights"])
+        identity = (file_identity(dem_path), file_identity(os.path.join(SLOPE_TILES_DIR, SLOPE_INDEX_NAME)))
+
+    key = make_key("tiles", TILE_VERSION, layer, z, x, y, params, identity)
+    etag = f'"{key[:32]}"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "public, max-age=300"})
+
+    data = TILES.get(key)
+    if data is not None:
+        return _tile_response(data, etag, "hit")
+    if z < MIN_ZOOM[layer]:
+        data = b""
+    else:
+        try:
+            data = await EXECUTOR.run("tiles", render_tile, layer, z, x, y, **params)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(500, str(e))
+    TILES.put(key, data)
+    return _tile_response(data, etag, "miss")
@@ -0,0 +1,58 @@
+# benchmarks/compare.py
+"""
+İki benchmark koşusunu karşılaştırır (benchmarks/run.py çıktıları).
+
+    python -m benchmarks.compare base.json new.json [--threshold 0.10] [--metric wall_s]
+
+(size, stage) başına tekrarların medyanı alınır. new/base oranı 1 + threshold'u aşan
+bir aşama varsa çıkış kodu 1 olur (CI'da yükseltmeleri kapılamak için).
+"""
+import argparse
+import json
+import statistics
+import sys
+from typing import Dict, Tuple
+
+
+def _medians(report: dict, metric: str) -> Dict[Tuple[int, str], float]:
+    vals: Dict[Tuple[int, str], list] = {}
+    for r in report.get("results", []):
+        if "error" in r or metric not in r:
+            continue
+        vals.setdefault((r["size"], r["stage"]), []).append(float(r[metric]))
+    return {k: statistics.median(v) for k, v in vals.items()}
+
+
+def compare(base: dict, new: dict, metric: str = "wall_s", threshold: float = 0.10) -> dict:
+    b, n = _medians(base, metric), _medians(new, metric)
+    rows, regressions = [], []
+    for key in sorted(set(b) & set(n)):
+        ratio = n[key] / b[key] if b[key] > 0 else float("inf")
+        row = {"size": key[0], "stage": key[1], "base": b[key], "new": n[key], "ratio": round(ratio, 3)}
+        rows.append(row)
+        if ratio > 1.0 + threshold:
+            regressions.append(row)
+    missing = sorted(set(b) ^ set(n))
+    return {"metric": metric, "threshold": threshold, "rows": rows, "regressions": regressions,
+            "unmatched": [list(k) for k in missing]}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compare two benchmark runs")
+    ap.add_argument("base")
+    ap.add_argument("new")
+    ap.add_argument("--metric", default="wall_s", choices=("wall_s", "peak_rss_mb"))
+    ap.add_argument("--threshold", type=float, default=0.10, help="izin verilen göreli kötüleşme (0.10 = %%10)")
+    args = ap.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    res = compare(base, new, metric=args.metric, threshold=args.threshold)
+    print(f"{'size':>7} {'stage':<12} {'base':>10} {'new':>10} {'ratio':>7}")
+    for r in res["rows"]:
+        flag = "  <-- regression" if r in res["regressions"] else ""
+        print(f"{r['size']:>7} {r['stage']:<12} {r['base']:>10.4f} {r['new']:>10.4f} {r['ratio']:>7.3f}{flag}")
+    for k in res["unmatched"]:
+        print(f"unmatched: size={k[0]} stage={k[1]}")
+    sys.exit(1 if res["regressions"] else 0)
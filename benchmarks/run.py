@@ -0,0 +1,282 @@
+# benchmarks/run.py
+"""
+Pipeline aşamalarının sentetik arazide zaman/bellek ölçümü.
+
+    python -m benchmarks.run --sizes 1000,2000,4000 --out bench.json
+    python -m benchmarks.run --sizes 1000 --stages slope,obstacles --repeat 3
+
+Her aşama ayrı (fork edilmiş) bir süreçte koşar; böylece tepe RSS aşamaya özgüdür.
+Aşamalar: slope, candidates, obstacles, obstacles_chunked, clearance, api (TestClient üzerinden /m2/* ve /candidates),
+morphology (core.morphology ile scipy.ndimage grey_opening karşılaştırması; breakdown'da her iki süre).
+Çıktı JSON'u benchmarks/compare.py ile karşılaştırılabilir.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import pathlib
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from pyproj import Transformer
+
+from benchmarks.synthetic import ORIGIN, center_xy, dsm_from_dem, fractal_dem, write_geotiff
+
+ALL_STAGES = ("slope", "candidates", "obstacles", "obstacles_chunked", "clearance", "api", "morphology")
+MORPH_RECT_PX = (5, 41)
+MORPH_DISK_R = (5, 10)
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # Linux: KiB
+
+
+def _lonlat(x: float, y: float):
+    return Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(x, y)
+
+
+# ---- Aşamalar: ctx → extra (dict). Süre ölçümü _measure'da; hazırlık adımları breakdown'a yazılır.
+
+def stage_slope(ctx: dict, bd: Dict[str, float]) -> dict:
+    from scripts.lz_candidates import slope_from_dem
+    t = time.perf_counter()
+    dem = np.load(ctx["dem_npy"])
+    bd["load_s"] = time.perf_counter() - t
+    t = time.perf_counter()
+    slope = slope_from_dem(dem, ctx["pix_m"], ctx["pix_m"])
+    bd["slope_s"] = time.perf_counter() - t
+    return {"pixels": int(slope.size)}
+
+
+def stage_candidates(ctx: dict, bd: Dict[str, float]) -> dict:
+    from scripts.lz_candidates import main as lz_main
+    lon, lat = _lonlat(*center_xy(ctx["size"], ctx["pix_m"]))
+    fc = lz_main(ctx["dem_path"], lat, lon, window_m=ctx["window_m"])
+    return {"count": fc["meta"].get("count", 0), "window_m": fc["meta"].get("window_m")}
+
+
+def stage_obstacles(ctx: dict, bd: Dict[str, float]) -> dict:
+    from core.raster import RasterArray, compute_obstacles_arrays
+    t = time.perf_counter()
+    dsm = RasterArray.from_path(ctx["dsm_path"])
+    dtm = RasterArray.from_path(ctx["dem_path"])
+    bd["read_s"] = time.perf_counter() - t
+    t = time.perf_counter()
+    feats = compute_obstacles_arrays(dsm, dtm)
+    bd["compute_s"] = time.perf_counter() - t
+    return {"obstacles": len(feats)}
+
+
+def stage_obstacles_chunked(ctx: dict, bd: Dict[str, float]) -> dict:
+    from core.raster import iter_obstacles_chunked
+    n = sum(1 for _ in iter_obstacles_chunked(ctx["dsm_path"], ctx["dem_path"], block_px=512, max_workers=1))
+    return {"obstacles": n, "block_px": 512}
+
+
+def stage_clearance(ctx: dict, bd: Dict[str, float]) -> dict:
+    from shapely.geometry import LineString
+    from core.raster import RasterArray, compute_obstacles_arrays
+    from core.clearance import clearance_along_route_arrays
+    dsm = RasterArray.from_path(ctx["dsm_path"])
+    dtm = RasterArray.from_path(ctx["dem_path"])
+    t = time.perf_counter()
+    feats = compute_obstacles_arrays(dsm, dtm)
+    bd["obstacles_s"] = time.perf_counter() - t  # hazırlık (wall_s'e dahil)
+
+    ext = ctx["size"] * ctx["pix_m"]
+    x0, y0 = ORIGIN
+    route = LineString([(x0 + 5.0, y0 - 5.0), (x0 + ext - 5.0, y0 - ext + 5.0)])
+    t = time.perf_counter()
+    _, hot, summary = clearance_along_route_arrays(
+        route=route, obstacles_fc={"type": "FeatureCollection", "features": feats},
+        altitude_mode="AGL", altitude_value_m=60.0, corridor_width_m=150.0,
+        min_clearance_m=30.0, step_m=25.0, dtm=dtm, dsm=dsm,
+    )
+    bd["clearance_s"] = time.perf_counter() - t
+    idx = summary.get("obstacle_index", {})
+    bd["index_build_s"] = idx.get("build_ms", 0.0) / 1000.0
+    bd["index_query_s"] = idx.get("query_ms", 0.0) / 1000.0
+    return {"segments": summary["segments"], "obstacles": len(feats), "route_m": round(route.length, 1)}
+
+
+def stage_api(ctx: dict, bd: Dict[str, float]) -> dict:
+    from fastapi.testclient import TestClient
+    import api.main as api_main
+    from api.cache import CACHE
+
+    CACHE.enabled = False  # her çağrı gerçekten hesaplasın
+    api_main.DEM_PATH = pathlib.Path(ctx["dem_path"])
+    cx, cy = center_xy(ctx["size"], ctx["pix_m"])
+    lon, lat = _lonlat(cx, cy)
+    lon1, lat1 = _lonlat(cx + ctx["window_m"] / 3.0, cy - ctx["window_m"] / 3.0)
+    paths = {"dsm_path": ctx["dsm_path"], "dtm_path": ctx["dem_path"]}
+    status = {}
+    with TestClient(api_main.app) as c:
+        calls = {
+            "m2_obstacles_aoi": lambda: c.get("/m2/obstacles/aoi", params=dict(lat=lat, lon=lon, window_m=ctx["window_m"], **paths)),
+            "m2_clearance_aoi": lambda: c.post(
+                "/m2/clearance/aoi",
+                params=dict(lat0=lat, lon0=lon, lat1=lat1, lon1=lon1, window_m=ctx["window_m"], **paths),
+                json={"altitude": {"mode": "AGL", "value_m": 60}},
+            ),
+            "candidates": lambda: c.get("/candidates", params=dict(lat=lat, lon=lon, window_m=ctx["window_m"] / 2.0)),
+        }
+        for name, call in calls.items():
+            t = time.perf_counter()
+            r = call()
+            bd[f"{name}_s"] = time.perf_counter() - t
+            status[name] = r.status_code
+    return {"status": status}
+
+
+def stage_morphology(ctx: dict, bd: Dict[str, float]) -> dict:
+    from scipy import ndimage
+    from core import morphology
+    dsm = np.load(ctx["dem_npy"])
+    for k in MORPH_RECT_PX:
+        t = time.perf_counter()
+        ndimage.grey_opening(dsm, size=(k, k))
+        bd[f"scipy_rect{k}_s"] = time.perf_counter() - t
+        t = time.perf_counter()
+        morphology.opening(dsm, morphology.rect(k))
+        bd[f"fast_rect{k}_s"] = time.perf_counter() - t
+    for r in MORPH_DISK_R:
+        fp = morphology.disk(r)
+        t = time.perf_counter()
+        ndimage.grey_opening(dsm, footprint=fp.to_array())  # aynı (sekizgen) eleman, O(r²)
+        bd[f"scipy_disk{r}_s"] = time.perf_counter() - t
+        t = time.perf_counter()
+        morphology.opening(dsm, fp)
+        bd[f"fast_disk{r}_s"] = time.perf_counter() - t
+    return {"pixels": int(dsm.size), "rect_px": list(MORPH_RECT_PX), "disk_r": list(MORPH_DISK_R)}
+
+
+STAGES: Dict[str, Callable[[dict, Dict[str, float]], dict]] = {
+    "slope": stage_slope,
+    "candidates": stage_candidates,
+    "obstacles": stage_obstacles,
+    "obstacles_chunked": stage_obstacles_chunked,
+    "clearance": stage_clearance,
+    "api": stage_api,
+    "morphology": stage_morphology,
+}
+
+
+def _child(stage: str, ctx: dict, conn):
+    try:
+        rss0 = _rss_mb()
+        bd: Dict[str, float] = {}
+        t = time.perf_counter()
+        extra = STAGES[stage](ctx, bd)
+        wall = time.perf_counter() - t
+        conn.send({
+            "wall_s": round(wall, 6),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "rss_start_mb": round(rss0, 1),
+            "breakdown": {k: round(v, 6) for k, v in bd.items()},
+            "extra": extra,
+        })
+    except Exception as e:  # aşama hatası tüm koşuyu durdurmasın
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def _measure(stage: str, ctx: dict) -> dict:
+    mp = multiprocessing.get_context("fork")
+    parent, child = mp.Pipe(duplex=False)
+    p = mp.Process(target=_child, args=(stage, ctx, child))
+    p.start()
+    child.close()
+    try:
+        res = parent.recv()
+    except EOFError:
+        res = {"error": "stage process died (OOM?)"}
+    p.join()
+    return res
+
+
+def prepare(size: int, workdir: str, pix_m: float, seed: int) -> dict:
+    dem = fractal_dem(size, seed=seed)
+    dsm = dsm_from_dem(dem, pix_m=pix_m, seed=seed)
+    ctx = {
+        "size": size,
+        "pix_m": pix_m,
+        "dem_path": os.path.join(workdir, f"dem_{size}.tif"),
+        "dsm_path": os.path.join(workdir, f"dsm_{size}.tif"),
+        "dem_npy": os.path.join(workdir, f"dem_{size}.npy"),
+    }
+    write_geotiff(ctx["dem_path"], dem, pix_m=pix_m)
+    write_geotiff(ctx["dsm_path"], dsm, pix_m=pix_m)
+    np.save(ctx["dem_npy"], dem)
+    return ctx
+
+
+def run(sizes: List[int], stages: List[str], repeat: int = 1, pix_m: float = 10.0,
+        window_m: float = 3000.0, seed: int = 0, workdir: str = None) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory(dir=workdir) as td:
+        for size in sizes:
+            t = time.perf_counter()
+            ctx = prepare(size, td, pix_m, seed)
+            ctx["window_m"] = window_m
+            print(f"[bench] size={size} generated in {time.perf_counter() - t:.2f}s", file=sys.stderr)
+            for stage in stages:
+                for rep in range(repeat):
+                    res = _measure(stage, ctx)
+                    res.update({"size": size, "stage": stage, "repeat": rep})
+                    results.append(res)
+                    msg = res.get("error") or f"{res['wall_s']:.3f}s peak={res['peak_rss_mb']}MB"
+                    print(f"[bench] size={size} {stage}#{rep}: {msg}", file=sys.stderr)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pix_m": pix_m,
+            "window_m": window_m,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def _parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="TengriLZ pipeline benchmarks")
+    ap.add_argument("--sizes", default="1000,2000", help="virgülle ayrılmış kenar boyları (piksel)")
+    ap.add_argument("--stages", default=",".join(ALL_STAGES))
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--pix_m", type=float, default=10.0)
+    ap.add_argument("--window_m", type=float, default=3000.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default=None, help="sentetik rasterlar için geçici dizin kökü")
+    ap.add_argument("--out", default=None, help="JSON çıktı dosyası (varsayılan: stdout)")
+    return ap.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"unknown stages: {sorted(unknown)}")
+    report = run([int(s) for s in args.sizes.split(",")], stages, repeat=args.repeat, pix_m=args.pix_m,
+                 window_m=args.window_m, seed=args.seed, workdir=args.workdir)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
@@ -0,0 +1,84 @@
+# benchmarks/synthetic.py
+"""
+Benchmark'lar için sentetik arazi üreticileri (1k² … 20k² piksel).
+
+- fractal_dem: oktav toplamalı (value-noise) fraktal DEM; bellek ~ tek float32 çıktı + bir oktav.
+- dsm_from_dem: DEM üzerine yoğunluğu ayarlanabilir bina (dikdörtgen blok) ve ağaç (kubbe) ekler.
+- write_geotiff: UTM (EPSG:32636), iç karolu GeoTIFF yazar.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from scipy.ndimage import zoom
+
+ORIGIN = (500000.0, 4200000.0)  # UTM 36N, sol üst köşe
+
+
+def fractal_dem(n: int, seed: int = 0, relief_m: float = 400.0, octaves: int = 7,
+                persistence: float = 0.5, base_cells: int = 4) -> np.ndarray:
+    """n×n fraktal yüzey (float32, metre). Her oktav kaba bir gürültü grid'inin kübik büyütmesidir."""
+    rng = np.random.default_rng(seed)
+    out = np.zeros((n, n), dtype=np.float32)
+    amp, cells, total = 1.0, base_cells, 0.0
+    for _ in range(octaves):
+        cells = min(cells, n)
+        g = rng.standard_normal((cells + 1, cells + 1)).astype(np.float32)
+        up = zoom(g, n / cells, order=3, prefilter=False)[:n, :n]
+        out[:up.shape[0], :up.shape[1]] += amp * up
+        total += amp
+        amp *= persistence
+        cells *= 2
+    out *= relief_m / (total * 2.0)
+    out += relief_m
+    return out
+
+
+def dsm_from_dem(dem: np.ndarray, pix_m: float = 10.0, building_density: float = 20.0,
+                 tree_density: float = 50.0, seed: int = 0) -> np.ndarray:
+    """
+    DEM + engeller. Yoğunluklar km² başına adet.
+    Bina: 10–40 m kenar, 5–30 m yükseklik; ağaç: 3–8 m yarıçap, 4–15 m yükseklik.
+    """
+    rng = np.random.default_rng(seed + 1)
+    dsm = dem.copy()
+    H, W = dem.shape
+    area_km2 = H * W * pix_m * pix_m / 1e6
+
+    n_b = int(rng.poisson(building_density * area_km2))
+    rows = rng.integers(0, H, n_b); cols = rng.integers(0, W, n_b)
+    hs = rng.uniform(5.0, 30.0, n_b)
+    sx = np.maximum(1, (rng.uniform(10.0, 40.0, n_b) / pix_m).astype(int))
+    sy = np.maximum(1, (rng.uniform(10.0, 40.0, n_b) / pix_m).astype(int))
+    for r, c, h, w, d in zip(rows, cols, hs, sx, sy):
+        blk = dsm[r:r + d, c:c + w]
+        np.maximum(blk, dem[r:r + d, c:c + w] + np.float32(h), out=blk)
+
+    n_t = int(rng.poisson(tree_density * area_km2))
+    rows = rng.integers(0, H, n_t); cols = rng.integers(0, W, n_t)
+    hs = rng.uniform(4.0, 15.0, n_t)
+    rad = np.maximum(1, (rng.uniform(3.0, 8.0, n_t) / pix_m).astype(int))
+    for r, c, h, k in zip(rows, cols, hs, rad):
+        r0, r1, c0, c1 = max(0, r - k), min(H, r + k + 1), max(0, c - k), min(W, c + k + 1)
+        yy, xx = np.mgrid[r0 - r:r1 - r, c0 - c:c1 - c]
+        dome = np.float32(h) * np.clip(1.0 - (yy * yy + xx * xx) / float(k * k), 0.0, None).astype(np.float32)
+        blk = dsm[r0:r1, c0:c1]
+        np.maximum(blk, dem[r0:r1, c0:c1] + dome, out=blk)
+    return dsm
+
+
+def write_geotiff(path: str, arr: np.ndarray, pix_m: float = 10.0, crs: str = "EPSG:32636",
+                  origin: Tuple[float, float] = ORIGIN, nodata: Optional[float] = None):
+    profile = dict(
+        driver="GTiff", height=arr.shape[0], width=arr.shape[1], count=1, dtype=str(arr.dtype),
+        crs=crs, transform=from_origin(origin[0], origin[1], pix_m, pix_m), nodata=nodata,
+        tiled=True, blockxsize=256, blockysize=256,
+    )
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(arr, 1)
+
+
+def center_xy(n: int, pix_m: float = 10.0, origin: Tuple[float, float] = ORIGIN) -> Tuple[float, float]:
+    """n×n raster'ın merkezi (UTM)."""
+    return origin[0] + n * pix_m / 2.0, origin[1] - n * pix_m / 2.0
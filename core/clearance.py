@@ -1,39 +1,25 @@
 # core/clearance.py
-from typing import Dict, Optional
-from shapely.geometry import LineString, shape, Point
-import rasterio
+from typing import Dict, Optional, Tuple
+from shapely.geometry import LineString
+import shapely
 import numpy as np
 import math  # ← eklendi
+import time
 
+from core.profiling import span
+from core.raster import RasterArray, obstacle_geometries
 
-def _sample_route_points(route: LineString, step_m: float):
+
+def _sample_route_coords(route: LineString, step_m: float) -> np.ndarray:
+    """Rota üzerinde step_m aralıklı istasyonlar (N×2); son nokta her zaman dahil."""
     L = route.length
-    s = 0.0
-    pts = []
-    while s <= L:
-        pts.append(route.interpolate(s))
-        s += step_m
-    if pts and pts[-1].distance(Point(route.coords[-1])) > 1e-6:
-        pts.append(Point(route.coords[-1]))
-    return pts
-
-def _elev_at(point: Point, dataset) -> float:
-    if dataset is None:
-        return float("nan")
-    row, col = dataset.index(point.x, point.y)
-
-    # clamp: pencere dışına taşan indeksleri sınırla
-    row = max(0, min(int(row), dataset.height - 1))
-    col = max(0, min(int(col), dataset.width - 1))
-
-    val = dataset.read(1)[row, col]
-    nd = dataset.nodata
-    if nd is not None and val == nd:
-        return float("nan")
-    try:
-        return float(val)
-    except Exception:
-        return float("nan")
+    n = int(math.floor(L / step_m)) + 1 if step_m > 0 else 1
+    pts = shapely.line_interpolate_point(route, np.arange(n, dtype=np.float64) * step_m)
+    xy = shapely.get_coordinates(pts)
+    end = np.asarray(route.coords[-1][:2], dtype=np.float64)
+    if len(xy) and np.hypot(*(xy[-1] - end)) > 1e-6:
+        xy = np.vstack([xy, end])
+    return xy
 
 def _safe_num(x):
     """NaN/Inf → None (JSON uyumlu)."""
@@ -54,98 +40,443 @@ def clearance_along_route(
     dtm_path: Optional[str],
     dsm_path: str,
 ):
-    dtm_ds = rasterio.open(dtm_path) if dtm_path else None
-    dsm_ds = rasterio.open(dsm_path)
-
-    pts = _sample_route_points(route, step_m)
-
-    obs = []
-    for f in obstacles_fc.get("features", []):
-        geom = shape(f.get("geometry"))
-        h = float(f.get("properties", {}).get("height_m", 0.0))
-        obs.append((geom, h))
-
-    seg_features, hotspot_features = [], []
-
-    for i in range(len(pts) - 1):
-        a, b = pts[i], pts[i + 1]
-        seg = LineString([a, b])
-        corridor = seg.buffer(corridor_width_m / 2.0)
-
-        z_top_max = -1e9
-        nearest_d = float("nan")
-        nearest_idx = -1
-
-        for j, (g, h) in enumerate(obs):
-            if not g.intersects(corridor):
-                continue
-            centroid = g.centroid
-            if dtm_ds is not None:
-                z_ground = _elev_at(centroid, dtm_ds)
-                z_top = z_ground + h
+    """Dosya yolu sarmalayıcısı; bkz. clearance_along_route_arrays."""
+    return clearance_along_route_arrays(
+        route=route,
+        obstacles_fc=obstacles_fc,
+        altitude_mode=altitude_mode,
+        altitude_value_m=altitude_value_m,
+        corridor_width_m=corridor_width_m,
+        min_clearance_m=min_clearance_m,
+        step_m=step_m,
+        dtm=RasterArray.from_path(dtm_path) if dtm_path else None,
+        dsm=RasterArray.from_path(dsm_path),
+    )
+
+
+def _swath_tops(dsm: RasterArray, xy: np.ndarray, corridor_width_m: float, max_points: int = 2_000_000) -> np.ndarray:
+    """
+    Her segment için koridor şeridindeki (boyuna × enine grid, ~piksel aralıklı) en yüksek DSM değeri.
+    Segmentler parça parça işlenir; bellek max_points örnekle sınırlı.
+    """
+    n_seg = len(xy) - 1
+    out = np.full(n_seg, np.nan)
+    if n_seg <= 0:
+        return out
+    pix = max(abs(dsm.transform.a), abs(dsm.transform.e))
+    d = xy[1:] - xy[:-1]
+    seg_len = np.hypot(d[:, 0], d[:, 1])
+    along = np.linspace(0.0, 1.0, max(2, int(math.ceil(float(seg_len.max(initial=0.0)) / pix)) + 1))
+    across = np.linspace(-corridor_width_m / 2.0, corridor_width_m / 2.0, max(3, int(math.ceil(corridor_width_m / pix)) + 1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        normal = np.stack([-d[:, 1], d[:, 0]], axis=1) / seg_len[:, None]
+    normal[~np.isfinite(normal)] = 0.0
+
+    per_seg = along.size * across.size
+    chunk = max(1, max_points // per_seg)
+    for s0 in range(0, n_seg, chunk):
+        s1 = min(n_seg, s0 + chunk)
+        base = xy[s0:s1, None, None, :] + along[None, :, None, None] * d[s0:s1, None, None, :]
+        pts = base + across[None, None, :, None] * normal[s0:s1, None, None, :]
+        vals = dsm.sample(pts[..., 0].ravel(), pts[..., 1].ravel()).reshape(s1 - s0, -1)
+        fin = np.isfinite(vals)
+        top = np.where(fin, vals, -np.inf).max(axis=1)
+        out[s0:s1] = np.where(fin.any(axis=1), top, np.nan)
+    return out
+
+
+def route_tops(
+    route: LineString,
+    corridor_width_m: float,
+    step_m: float,
+    dtm: Optional[RasterArray],
+    dsm: Optional[RasterArray],
+    obstacles_fc: Optional[Dict] = None,
+    obstacles: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    top_source: str = "obstacles",
+) -> dict:
+    """
+    İrtifadan bağımsız rota profili (segment başına diziler): istasyonlar, orta nokta zemini ve koridordaki
+    en yüksek tepe. top_source="obstacles": engel poligonları (centroid zemini + height_m, STRtree ile);
+    "dsm": koridor şeridinde DSM maksimumu (engel çıkarımı gerekmez; arazinin kendisi de dahil).
+    Aynı profil farklı irtifalar için tekrar tekrar değerlendirilebilir (evaluate_clearance).
+    """
+    ground_r = dtm if dtm is not None else dsm
+
+    with span("clearance.sample") as rec:
+        xy = _sample_route_coords(route, step_m)
+        mids = 0.5 * (xy[:-1] + xy[1:])
+        # Segment ortasındaki zemin (AGL referansı + engelsiz segmentlerde nötr tepe)
+        z_ground_mid = ground_r.sample(mids[:, 0], mids[:, 1])
+        rec["stations"] = int(len(xy))
+
+    n_seg = len(mids)
+    seg_len = np.hypot(*(xy[1:] - xy[:-1]).T) if n_seg else np.empty(0)
+    distance = np.cumsum(seg_len) - 0.5 * seg_len  # segment ortasının rota üzerindeki mesafesi
+    nearest_idx = np.full(n_seg, -1, dtype=np.intp)
+    nearest_d = np.full(n_seg, np.nan)
+    index_stats = {"obstacles": 0, "candidate_pairs": 0, "build_ms": 0.0, "query_ms": 0.0}
+
+    if top_source == "dsm":
+        if dsm is None:
+            raise ValueError("top_source='dsm' requires a DSM")
+        with span("clearance.swath", segments=n_seg):
+            z_top_max = _swath_tops(dsm, xy, corridor_width_m)
+        return {
+            "xy": xy, "mids": mids, "distance_m": distance, "ground_m": z_ground_mid, "top_m": z_top_max,
+            "nearest_idx": nearest_idx, "nearest_d": nearest_d, "obstacle_index": index_stats,
+            "top_source": top_source,
+        }
+
+    with span("clearance.obstacle_tops") as rec:
+        if obstacles is not None:
+            obs_arr, obs_h = obstacles
+            obs_arr = np.asarray(obs_arr, dtype=object)
+        else:
+            obs_arr, obs_h = obstacle_geometries((obstacles_fc or {}).get("features", []))
+        n_obs = len(obs_arr)
+
+        # Engel tepe kotları: centroid'ler tek seferde örneklenir
+        if n_obs:
+            cxy = shapely.get_coordinates(shapely.centroid(obs_arr))
+            if dtm is not None:
+                obs_top = dtm.sample(cxy[:, 0], cxy[:, 1]) + np.asarray(obs_h, dtype=np.float64)
             else:
-                z_top = _elev_at(centroid, dsm_ds)
-            if np.isnan(z_top):
-                continue
-            if z_top > z_top_max:
-                z_top_max = z_top
-                nearest_idx = j
-                nearest_d = g.distance(seg)
-
-        # Hiç engel yoksa: z_top_max'ı segment ortasındaki zeminle dolduralım (nötr referans)
-        if z_top_max < -1e8:
-            center = seg.interpolate(0.5, normalized=True)
-            z_ground_mid = _elev_at(center, dtm_ds) if dtm_ds is not None else _elev_at(center, dsm_ds)
-            z_top_max = z_ground_mid
-
-        center = seg.interpolate(0.5, normalized=True)
-        if str(altitude_mode).upper() == "AGL":
-            z_ground = _elev_at(center, dtm_ds) if dtm_ds is not None else _elev_at(center, dsm_ds)
-            z_route = z_ground + float(altitude_value_m)
+                obs_top = dsm.sample(cxy[:, 0], cxy[:, 1])
         else:
-            z_route = float(altitude_value_m)
+            obs_top = np.empty(0, dtype=np.float64)
+        rec["obstacles"] = n_obs
 
-        # Clearance hesabı
-        clearance_raw = z_route - z_top_max
-        clearance_val = _safe_num(clearance_raw)
+    # Segmentler + koridorlar toplu kurulur; engel–koridor kesişimleri STRtree ile tek sorguda
+    with span("clearance.corridors", segments=n_seg):
+        segs = shapely.linestrings(np.stack([xy[:-1], xy[1:]], axis=1)) if len(xy) > 1 else np.empty(0, dtype=object)
+        corridors = shapely.buffer(segs, corridor_width_m / 2.0)
 
-        # Durum
-        if clearance_val is None:
-            status = "unknown"
-        else:
-            status = "pass" if clearance_val >= float(min_clearance_m) else "fail"
-
-        # Segment feature
-        seg_prop = {"i": i, "clearance_m": clearance_val, "status": status}
-        seg_features.append({
-            "type": "Feature",
-            "geometry": seg.__geo_interface__,
-            "properties": seg_prop,
-        })
+    t0 = time.perf_counter()
+    with span("clearance.index_build", obstacles=n_obs):
+        tree = shapely.STRtree(obs_arr)
+    t1 = time.perf_counter()
+    with span("clearance.index_query") as rec:
+        seg_idx, obs_idx = tree.query(corridors, predicate="intersects")
+        rec["pairs"] = int(seg_idx.size)
+    t2 = time.perf_counter()
+
+    z_top_max = z_ground_mid.copy()  # engelsiz segment: ortadaki zemin (nötr referans)
+
+    keep = np.isfinite(obs_top[obs_idx])
+    seg_idx, obs_idx = seg_idx[keep], obs_idx[keep]
+    if seg_idx.size:
+        # Her segment için en yüksek tepe (eşitlikte en küçük engel indeksi)
+        order = np.lexsort((obs_idx, -obs_top[obs_idx], seg_idx))
+        first = order[np.unique(seg_idx[order], return_index=True)[1]]
+        si, oj = seg_idx[first], obs_idx[first]
+        z_top_max[si] = obs_top[oj]
+        nearest_idx[si] = oj
+        nearest_d[si] = shapely.distance(obs_arr[oj], segs[si])
+
+    index_stats = {
+        "obstacles": n_obs,
+        "candidate_pairs": int(seg_idx.size),
+        "build_ms": round((t1 - t0) * 1000.0, 3),
+        "query_ms": round((t2 - t1) * 1000.0, 3),
+    }
+    return {
+        "xy": xy, "mids": mids, "distance_m": distance, "ground_m": z_ground_mid, "top_m": z_top_max,
+        "nearest_idx": nearest_idx, "nearest_d": nearest_d, "obstacle_index": index_stats,
+        "top_source": top_source,
+    }
+
+
+STATUS_NAMES = np.array(["pass", "fail", "unknown"])
+
+
+def evaluate_clearance(tops: dict, altitude_mode: str, altitude_value_m, min_clearance_m: float):
+    """
+    route_tops profili üzerinde clearance + durum (dizi işlemleri).
+    altitude_value_m skaler ya da dizi olabilir; dizi ise (..., 1) biçiminde yayınlanır (ör. irtifa senaryoları).
+    Dönüş: (rota irtifası, clearance [NaN = bilinmiyor], durum kodu: 0 pass, 1 fail, 2 unknown)
+    """
+    alt = np.asarray(altitude_value_m, dtype=np.float64)
+    if alt.ndim:
+        alt = alt[..., None]
+    if str(altitude_mode).upper() == "AGL":
+        z_route = tops["ground_m"] + alt
+    else:
+        z_route = np.broadcast_to(alt, np.broadcast_shapes(alt.shape, tops["top_m"].shape)).astype(np.float64)
+    clearance = z_route - tops["top_m"]
+    known = np.isfinite(clearance)
+    status = np.where(known, np.where(clearance >= float(min_clearance_m), 0, 1), 2).astype(np.int8)
+    clearance = np.where(known, clearance, np.nan)
+    return z_route, clearance, status
+
+
+def _opt(v: float):
+    return float(v) if math.isfinite(v) else None
+
+
+def profile_columns(tops: dict, z_route: np.ndarray, clearance: np.ndarray, status: np.ndarray, ndigits: int = 2) -> dict:
+    """Uzun profilleri ucuza çizmek için sütunsal (dizi) çıktı; NaN → None."""
+    def col(a):
+        return [None if not math.isfinite(v) else v for v in np.round(a, ndigits).tolist()]
+    return {
+        "distance_m": col(tops["distance_m"]),
+        "ground_m": col(tops["ground_m"]),
+        "top_m": col(tops["top_m"]),
+        "route_alt_m": col(z_route),
+        "clearance_m": col(clearance),
+        "status": STATUS_NAMES[status].tolist(),
+    }
+
+
+def clearance_profile(
+    route: LineString,
+    obstacles_fc: Optional[Dict],
+    altitude_mode: str,
+    altitude_value_m: float,
+    corridor_width_m: float,
+    min_clearance_m: float,
+    step_m: float,
+    dtm: Optional[RasterArray],
+    dsm: Optional[RasterArray],
+    obstacles: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    top_source: str = "obstacles",
+    geojson: bool = True,
+    columnar: bool = False,
+) -> dict:
+    """
+    Dizi tabanlı clearance motoru: {"segments", "hotspots", "summary"} (+ columnar=True ise "profile").
+    geojson=False segment FeatureCollection'ını atlar (uzun rotalarda yalnızca profil + hotspot).
+    """
+    tops = route_tops(route, corridor_width_m, step_m, dtm, dsm, obstacles_fc=obstacles_fc,
+                      obstacles=obstacles, top_source=top_source)
+    z_route, clearance, status = evaluate_clearance(tops, altitude_mode, altitude_value_m, min_clearance_m)
+    xy, mids = tops["xy"], tops["mids"]
+    n_seg = len(mids)
 
-        # Hotspot (yalnızca hesaplanabilirse ve fail ise)
-        if (status == "fail") and (clearance_val is not None):
-            hotspot_features.append({
+    with span("clearance.features", segments=n_seg):
+        clr = [_opt(v) for v in clearance.tolist()]
+        names = STATUS_NAMES[status].tolist()
+        seg_features = []
+        if geojson:
+            ends = np.stack([xy[:-1], xy[1:]], axis=1).tolist()
+            seg_features = [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "LineString", "coordinates": ends[i]},
+                    "properties": {"i": i, "clearance_m": clr[i], "status": names[i]},
+                }
+                for i in range(n_seg)
+            ]
+        fails = np.flatnonzero(status == 1)
+        needed = np.round(float(min_clearance_m) - clearance[fails], 2).tolist()
+        hotspot_features = [
+            {
                 "type": "Feature",
-                "geometry": center.__geo_interface__,
+                "geometry": {"type": "Point", "coordinates": mids[i].tolist()},
                 "properties": {
-                    "i": i,
-                    "clearance_m": clearance_val,
-                    "needed_extra_m": round(float(min_clearance_m) - clearance_val, 2),
-                    "nearest_obstacle_idx": nearest_idx,
-                    "distance_to_obstacle_m": _safe_num(nearest_d),
+                    "i": int(i),
+                    "clearance_m": clr[i],
+                    "needed_extra_m": needed[k],
+                    "nearest_obstacle_idx": int(tops["nearest_idx"][i]),
+                    "distance_to_obstacle_m": _safe_num(tops["nearest_d"][i]),
                 },
-            })
+            }
+            for k, i in enumerate(fails)
+        ]
 
-    # Özete sadece sonlu clearance'lar girsin
-    finite_vals = [f["properties"]["clearance_m"] for f in seg_features if isinstance(f["properties"]["clearance_m"], (int, float))]
+    finite = clearance[np.isfinite(clearance)]
     summary = {
-        "segments": len(seg_features),
-        "fails": sum(1 for f in seg_features if f["properties"]["status"] == "fail"),
-        "unknowns": sum(1 for f in seg_features if f["properties"]["status"] == "unknown"),
-        "min_clearance_m": (min(finite_vals) if finite_vals else None),
+        "segments": n_seg,
+        "fails": int(fails.size),
+        "unknowns": int(np.count_nonzero(status == 2)),
+        "min_clearance_m": (float(finite.min()) if finite.size else None),
+        "obstacle_index": tops["obstacle_index"],
+        "top_source": tops["top_source"],
+    }
+    out = {
+        "segments": {"type": "FeatureCollection", "features": seg_features},
+        "hotspots": {"type": "FeatureCollection", "features": hotspot_features},
+        "summary": summary,
     }
+    if columnar:
+        out["profile"] = profile_columns(tops, z_route, clearance, status)
+    return out
 
-    segs_fc = {"type": "FeatureCollection", "features": seg_features}
-    hotspots_fc = {"type": "FeatureCollection", "features": hotspot_features}
-    return segs_fc, hotspots_fc, summary
+
+def clearance_along_route_arrays(
+    route: LineString,
+    obstacles_fc: Dict,
+    altitude_mode: str,
+    altitude_value_m: float,
+    corridor_width_m: float,
+    min_clearance_m: float,
+    step_m: float,
+    dtm: Optional[RasterArray],
+    dsm: Optional[RasterArray],
+    obstacles: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+):
+    """
+    Rota boyunca segment bazlı clearance; bellekteki DSM/DTM bantları (RasterArray) ile toplu örnekleme.
+    obstacles=(shapely geometri dizisi, height_m dizisi) verilirse (ör. engel indeksinden) obstacles_fc yok sayılır.
+    DTM verildiyse DSM kullanılmaz (None olabilir). Dönüş: (segments_fc, hotspots_fc, summary); bkz. clearance_profile.
+    """
+    out = clearance_profile(
+        route, obstacles_fc, altitude_mode, altitude_value_m, corridor_width_m, min_clearance_m, step_m,
+        dtm, dsm, obstacles=obstacles,
+    )
+    return out["segments"], out["hotspots"], out["summary"]
+
+
+def batch_clearance(
+    routes,
+    obstacles_fc: Optional[Dict],
+    altitude_mode: str,
+    altitudes_m,
+    corridor_width_m: float,
+    min_clearance_m: float,
+    step_m: float,
+    dtm: Optional[RasterArray],
+    dsm: Optional[RasterArray],
+    obstacles: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    top_source: str = "obstacles",
+) -> dict:
+    """
+    Çok rota × çok irtifa: engeller bir kez ayrıştırılır, her rota istasyonlarını bir kez örnekler,
+    irtifa senaryoları evaluate_clearance ile (M, n_seg) olarak tek işlemde değerlendirilir.
+    Dönüş: {"routes": [...], "ranking": [...]}; sıralama: fail sayısı artan, sonra min clearance azalan.
+    """
+    alts = np.atleast_1d(np.asarray(altitudes_m, dtype=np.float64))
+    if top_source != "dsm" and obstacles is None:
+        with span("clearance.parse_obstacles"):
+            obstacles = obstacle_geometries((obstacles_fc or {}).get("features", []))
+
+    results, ranking = [], []
+    for r, route in enumerate(routes):
+        tops = route_tops(route, corridor_width_m, step_m, dtm, dsm, obstacles=obstacles, top_source=top_source)
+        _, clearance, status = evaluate_clearance(tops, altitude_mode, alts, min_clearance_m)
+        fails = np.count_nonzero(status == 1, axis=-1)
+        unknowns = np.count_nonzero(status == 2, axis=-1)
+        known = np.isfinite(clearance)
+        min_clr = np.where(known, clearance, np.inf).min(axis=-1, initial=np.inf)
+        scenarios = [
+            {
+                "altitude_m": float(a),
+                "fails": int(f),
+                "unknowns": int(u),
+                "min_clearance_m": _opt(float(m)),
+            }
+            for a, f, u, m in zip(alts, fails, unknowns, min_clr)
+        ]
+        results.append({
+            "route": r,
+            "length_m": round(float(route.length), 2),
+            "segments": int(len(tops["mids"])),
+            "obstacle_index": tops["obstacle_index"],
+            "scenarios": scenarios,
+        })
+        ranking += [{"route": r, **s} for s in scenarios]
+
+    # Bilinmeyen min clearance (None) en sona
+    ranking.sort(key=lambda s: (s["fails"], -(s["min_clearance_m"] if s["min_clearance_m"] is not None else -np.inf),
+                                s["route"], s["altitude_m"]))
+    return {"routes": results, "ranking": ranking}
+
+
+def gradient_envelope(x: np.ndarray, z: np.ndarray, max_climb: float, max_descent: Optional[float] = None) -> np.ndarray:
+    """
+    z'nin üstünde kalan, eğimi tırmanışta max_climb, inişte max_descent (m/m) ile sınırlı en alçak profil.
+    x artan (mesafe); NaN noktalar kısıt değildir. İki geçişli kayan maksimum (np.maximum.accumulate):
+      ileri: inişi sınırlar  → max_{j≤i} (z_j + d·x_j) − d·x_i
+      geri:  tırmanışı sınırlar → max_{j≥i} (z_j − c·x_j) + c·x_i
+    """
+    c = float(max_climb)
+    d = float(max_climb if max_descent is None else max_descent)
+    zz = np.where(np.isfinite(z), z, -np.inf)
+    fwd = np.maximum.accumulate(zz + d * x) - d * x
+    bwd = np.maximum.accumulate((zz - c * x)[::-1])[::-1] + c * x
+    out = np.maximum(fwd, bwd)
+    return np.where(np.isfinite(out), out, np.nan)
+
+
+def _ceil2(a: np.ndarray) -> np.ndarray:
+    # Yukarı yuvarlama: rapor edilen irtifada değerlendirme kayan nokta hatasıyla fail vermesin
+    return np.ceil(np.round(a * 100.0, 6)) / 100.0
+
+
+def min_safe_altitude(
+    tops: dict,
+    altitude_mode: str,
+    min_clearance_m: float,
+    max_climb_gradient: float = 0.1,
+    max_descent_gradient: Optional[float] = None,
+) -> dict:
+    """
+    route_tops profilinden, min_clearance_m'yi sağlayan en düşük irtifa (tek geçiş; tekrar tekrar
+    clearance çağırmaya gerek yok).
+    - profile: segment başına gerekli irtifa (mod cinsinden; AGL ise tepe + pay − zemin) ve MSL karşılığı
+    - steps: aynı gerekli irtifaya sahip ardışık segmentler birleştirilmiş basamak profili
+    - smoothed: tırmanış/iniş eğimi sınırlı MSL profili (segment başı/sonu köşeleri)
+    - summary.required_altitude_m: tüm rota için tek (sabit) irtifa = segmentlerin maksimumu
+    Değerler 0.01 m'ye yukarı yuvarlanır; tepe bilinmeyen segmentler None'dur ve kısıt oluşturmaz.
+    """
+    agl = str(altitude_mode).upper() == "AGL"
+    req_msl = tops["top_m"] + float(min_clearance_m)
+    req = req_msl - tops["ground_m"] if agl else req_msl
+    req, req_msl = _ceil2(req), _ceil2(req_msl)
+
+    xy = tops["xy"]
+    seg_len = np.hypot(*(xy[1:] - xy[:-1]).T) if len(xy) > 1 else np.empty(0)
+    end = np.cumsum(seg_len)
+    start = end - seg_len
+
+    known = np.isfinite(req)
+    crit = int(np.argmax(np.where(known, req, -np.inf))) if known.any() else None
+
+    # Basamaklar: değer değiştiğinde (NaN ↔ sayı dahil) yeni basamak
+    if req.size:
+        same = (req[1:] == req[:-1]) | (~known[1:] & ~known[:-1])
+        b = np.flatnonzero(np.concatenate([[True], ~same]))
+        e = np.concatenate([b[1:], [req.size]]) - 1
+    else:
+        b = e = np.empty(0, dtype=np.intp)
+
+    # Eğim sınırlı profil: her segment [başlangıç, bitiş] boyunca kendi gerekli kotunu korur
+    x2 = np.stack([start, end], axis=1).ravel()
+    z2 = np.repeat(req_msl, 2)
+    smooth = _ceil2(gradient_envelope(x2, z2, max_climb_gradient, max_descent_gradient)) if x2.size else x2
+    keep = np.ones(x2.size, dtype=bool)
+    if x2.size > 1:
+        # Aynı noktadaki ardışık eşit köşeler (segment sınırları) tekrar yazılmaz
+        keep[1:] = ~((x2[1:] == x2[:-1]) & ((smooth[1:] == smooth[:-1]) | (np.isnan(smooth[1:]) & np.isnan(smooth[:-1]))))
+
+    col = lambda a: [_opt(v) for v in np.round(a, 2).tolist()]
+    return {
+        "profile": {
+            "distance_m": col(tops["distance_m"]),
+            "start_m": col(start),
+            "end_m": col(end),
+            "required_m": col(req),
+            "required_msl_m": col(req_msl),
+        },
+        "steps": {
+            "from_m": col(start[b]),
+            "to_m": col(end[e]),
+            "altitude_m": col(req[b]),
+        },
+        "smoothed": {
+            "distance_m": col(x2[keep]),
+            "altitude_msl_m": col(smooth[keep]),
+        },
+        "summary": {
+            "altitude_mode": "AGL" if agl else "MSL",
+            "segments": int(req.size),
+            "unknowns": int(np.count_nonzero(~known)),
+            "required_altitude_m": (float(req[crit]) if crit is not None else None),
+            "critical_segment": crit,
+            "max_required_msl_m": (float(np.nanmax(req_msl)) if known.any() else None),
+            "max_smoothed_msl_m": (float(np.nanmax(smooth)) if known.any() else None),
+            "max_climb_gradient": float(max_climb_gradient),
+            "max_descent_gradient": float(max_climb_gradient if max_descent_gradient is None else max_descent_gradient),
+            "top_source": tops["top_source"],
+        },
+    }
@@ -0,0 +1,147 @@
+# core/morphology.py
+"""
+Büyük yapısal elemanlar için hızlı gri/ikili morfoloji (erosion, dilation, opening, closing).
+
+Yapısal eleman doğru parçalarına ayrılır; her parça tek boyutlu bir kayan min/max'tır ve piksel başı
+maliyet pencere boyundan bağımsızdır (O(1)):
+- rect(h, w): yatay ⊕ düşey parça (ayrılabilir dikdörtgen). scipy.ndimage grey_* ile bire bir aynı sonuç.
+- disk(r):    r = 1 → artı (yatay ∪ düşey), r = 2 → artı ⊕ artı (ikisi de skimage disk ile aynı);
+              r ≥ 3 → sekizgen yaklaşımı: yatay ⊕ düşey ⊕ iki köşegen parça (Minkowski toplamı).
+              Eksen uzanımı r, köşegen uzanımı ≈ r; kenarda eleman raster dışına taşmaz (kırpılır).
+
+Eksen parçaları scipy.ndimage.minimum_filter1d / maximum_filter1d ile (C, van Herk/Gil-Werman sınıfı
+O(1) kayan min/max); köşegen parçalar diziyi kaydırılmış (skew) bir görünüme yerleştirip sütun
+boyunca aynı filtreyle hesaplanır. scipy'nin footprint dizili grey_* çağrıları ise O(r²)'dir.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy import ndimage
+
+Line = Tuple[int, int, int]  # (dy, dx, uzunluk)
+
+
+class Footprint:
+    """
+    Doğru parçalarına ayrılmış yapısal eleman: aşamaların Minkowski toplamı, her aşama parçaların birleşimi.
+    Ör. artı = [[yatay3, düşey3]]; dikdörtgen = [[yatay], [düşey]].
+    """
+
+    def __init__(self, stages: List[List[Line]]):
+        self.stages = [st for st in ([ln for ln in stage if ln[2] > 1] for stage in stages) if st]
+
+    def __repr__(self):
+        return f"Footprint({self.stages})"
+
+    def to_array(self) -> np.ndarray:
+        """Eşdeğer ikili footprint dizisi (test / scipy karşılaştırması için)."""
+        pts = {(0, 0)}
+        for stage in self.stages:
+            offs = {((t - n // 2) * dy, (t - n // 2) * dx) for dy, dx, n in stage for t in range(n)}
+            pts = {(y + oy, x + ox) for y, x in pts for oy, ox in offs}
+        ys, xs = zip(*pts)
+        ry, rx = max(map(abs, ys)), max(map(abs, xs))
+        out = np.zeros((2 * ry + 1, 2 * rx + 1), dtype=bool)
+        out[np.array(ys) + ry, np.array(xs) + rx] = True
+        return out
+
+
+CROSS: List[Line] = [(0, 1, 3), (1, 0, 3)]
+
+
+def rect(h: int, w: Optional[int] = None) -> Footprint:
+    return Footprint([[(0, 1, int(w if w is not None else h))], [(1, 0, int(h))]])
+
+
+def disk(radius: int) -> Footprint:
+    r = int(radius)
+    if r <= 2:
+        return Footprint([CROSS] * r)  # r = 1: artı, r = 2: artı ⊕ artı (skimage disk ile aynı)
+    # Sekizgen: eksen uzanımı a + 2b = r, köşegen uzanımı √2·(a + b) ≈ r → b ≈ 0.293·r, a ≈ 0.414·r
+    b = int(round(r * (1.0 - 2 ** -0.5)))
+    if r - 2 * b < 1:  # a ≥ 1: yalnız köşegen parçalar tek/çift pariteli ızgara bırakır
+        b -= 1
+    a = r - 2 * b
+    return Footprint([[(0, 1, 2 * a + 1)], [(1, 0, 2 * a + 1)], [(1, 1, 2 * b + 1)], [(1, -1, 2 * b + 1)]])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Tek parça (1B kayan min/max)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _identity(dtype, erode: bool):
+    if dtype == np.bool_:
+        return 1 if erode else 0
+    if np.issubdtype(dtype, np.floating):
+        return np.inf if erode else -np.inf
+    info = np.iinfo(dtype)
+    return info.max if erode else info.min
+
+
+def _axis_line(a: np.ndarray, axis: int, n: int, erode: bool) -> np.ndarray:
+    # scipy grey_dilation çift boyda elemanı yansıtır (origin −1); aynısı burada
+    if erode:
+        return ndimage.minimum_filter1d(a, n, axis=axis, mode="reflect")
+    return ndimage.maximum_filter1d(a, n, axis=axis, mode="reflect", origin=-1 if n % 2 == 0 else 0)
+
+
+def _diagonal_line(a: np.ndarray, dx: int, n: int, erode: bool) -> np.ndarray:
+    """(1, dx) yönünde parça: satır i, sütun kaydırılmış (skew) diziye yazılır → köşegenler sütun olur."""
+    H, W = a.shape
+    L = W + H - 1
+    fill = _identity(a.dtype, erode)
+    skew = np.full(H * L, fill, dtype=a.dtype)
+    isz = a.itemsize
+    # dx = +1: (i, j) → (i, j − i + H − 1);  dx = −1: (i, j) → (i, i + j)
+    start, row_step = (H - 1, L - 1) if dx == 1 else (0, L + 1)
+    view = as_strided(skew[start:], shape=(H, W), strides=(row_step * isz, isz))
+    view[...] = a
+    S = skew.reshape(H, L)
+    f = ndimage.minimum_filter1d if erode else ndimage.maximum_filter1d
+    origin = -1 if (not erode and n % 2 == 0) else 0
+    S = f(S, n, axis=0, mode="constant", cval=fill, origin=origin)
+    return as_strided(S.ravel()[start:], shape=(H, W), strides=(row_step * isz, isz)).copy()
+
+
+def _line(a: np.ndarray, line: Line, erode: bool) -> np.ndarray:
+    dy, dx, n = line
+    if dy == 0:
+        return _axis_line(a, 1, n, erode)
+    if dx == 0:
+        return _axis_line(a, 0, n, erode)
+    return _diagonal_line(a, dx, n, erode)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Erosion / dilation / opening / closing
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _apply(a: np.ndarray, fp: Footprint, erode: bool) -> np.ndarray:
+    a = np.asarray(a)
+    is_bool = a.dtype == np.bool_
+    out = a.view(np.uint8) if is_bool else a  # 1B filtreler bool'da cval kabul etmez
+    if not fp.stages:
+        out = out.copy()
+    for stage in fp.stages:
+        parts = [_line(out, ln, erode) for ln in stage]
+        out = parts[0]
+        for p in parts[1:]:
+            out = np.minimum(out, p) if erode else np.maximum(out, p)
+    return out.view(np.bool_) if is_bool else out
+
+
+def erosion(a: np.ndarray, fp: Footprint) -> np.ndarray:
+    return _apply(a, fp, erode=True)
+
+
+def dilation(a: np.ndarray, fp: Footprint) -> np.ndarray:
+    return _apply(a, fp, erode=False)
+
+
+def opening(a: np.ndarray, fp: Footprint) -> np.ndarray:
+    return dilation(erosion(a, fp), fp)
+
+
+def closing(a: np.ndarray, fp: Footprint) -> np.ndarray:
+    return erosion(dilation(a, fp), fp)
@@ -0,0 +1,379 @@
+# core/mvt.py
+"""
+Mapbox Vector Tile (MVT 2.1) kodlayıcı + Web Mercator karo matematiği (harici bağımlılık yok).
+
+Akış (karo başına, dizi işlemleri shapely 2 ile):
+  kaynak CRS geometrileri → EPSG:3857 → karo + tampon ile kırp → zoom'a göre sadeleştir
+  (tolerans = bir karo birimi × simplify_units) → 0..extent tamsayı grid → protobuf.
+Poligonlarda dış halka karo uzayında (y aşağı) pozitif alanlı, iç halkalar negatif yazılır; grid'e
+yuvarlanınca çöken halkalar/parçalar atlanır.
+"""
+import math
+import struct
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+
+EXTENT = 4096
+BUFFER = 64  # karo birimi; kenar çizgileri komşu karolarla örtüşsün
+ORIGIN_SHIFT = 2.0 * math.pi * 6378137.0 / 2.0
+
+_POINT, _LINESTRING, _POLYGON = 1, 2, 3
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+
+
+def tile_bounds_3857(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """XYZ karo → EPSG:3857 sınırları (minx, miny, maxx, maxy)."""
+    size = 2.0 * ORIGIN_SHIFT / (1 << z)
+    minx = -ORIGIN_SHIFT + x * size
+    maxy = ORIGIN_SHIFT - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def tile_center_lonlat(z: int, x: int, y: int) -> Tuple[float, float]:
+    n = float(1 << z)
+    lon = (x + 0.5) / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * (y + 0.5) / n))))
+    return lon, lat
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= 24 and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+
+# ─── protobuf ilkelleri ───
+
+def _varint(n: int, out: bytearray):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _key(field: int, wire: int, out: bytearray):
+    _varint((field << 3) | wire, out)
+
+
+def _bytes_field(field: int, payload: bytes, out: bytearray):
+    _key(field, 2, out)
+    _varint(len(payload), out)
+    out += payload
+
+
+def _packed(field: int, values: Iterable[int], out: bytearray):
+    buf = bytearray()
+    for v in values:
+        _varint(v, buf)
+    _bytes_field(field, bytes(buf), out)
+
+
+def _zigzag(a: np.ndarray) -> np.ndarray:
+    return (a << 1) ^ (a >> 63)
+
+
+def _value(v) -> Optional[bytes]:
+    out = bytearray()
+    if isinstance(v, (bool, np.bool_)):
+        _key(7, 0, out)
+        _varint(int(bool(v)), out)
+    elif isinstance(v, (int, np.integer)):
+        v = int(v)
+        if v >= 0:
+            _key(5, 0, out)          # uint_value
+            _varint(v, out)
+        else:
+            _key(6, 0, out)          # sint_value (zigzag)
+            _varint((v << 1) ^ (v >> 63), out)
+    elif isinstance(v, (float, np.floating)):
+        if not math.isfinite(float(v)):
+            return None
+        _key(3, 1, out)              # double_value
+        out += struct.pack("<d", float(v))
+    elif isinstance(v, str):
+        _bytes_field(1, v.encode("utf-8"), out)
+    else:
+        return None
+    return bytes(out)
+
+
+# ─── geometri komutları ───
+
+def _ring_commands(ring: np.ndarray, cursor: np.ndarray, closed: bool, cmds: List[int]) -> np.ndarray:
+    d = np.diff(np.vstack([cursor, ring]), axis=0)
+    zz = _zigzag(d).ravel().tolist()
+    cmds.append((_MOVE_TO & 7) | (1 << 3))
+    cmds += zz[:2]
+    if len(ring) > 1:
+        cmds.append((_LINE_TO & 7) | ((len(ring) - 1) << 3))
+        cmds += zz[2:]
+    if closed:
+        cmds.append((_CLOSE_PATH & 7) | (1 << 3))
+    return ring[-1]
+
+
+def _dedupe(a: np.ndarray) -> np.ndarray:
+    if len(a) < 2:
+        return a
+    keep = np.ones(len(a), dtype=bool)
+    keep[1:] = np.any(a[1:] != a[:-1], axis=1)
+    return a[keep]
+
+
+def _signed_area2(ring: np.ndarray) -> int:
+    x, y = ring[:, 0], ring[:, 1]
+    return int(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+
+def _polygon_rings(poly) -> List[np.ndarray]:
+    """Tamsayı grid'inde geçerli halkalar (kapanış noktası yok); dış halka ilk. Dış halka çökerse []."""
+    rings = []
+    for k, lr in enumerate([poly.exterior, *poly.interiors]):
+        r = _dedupe(np.rint(shapely.get_coordinates(lr)).astype(np.int64))
+        if len(r) > 1 and np.array_equal(r[0], r[-1]):
+            r = r[:-1]
+        if len(r) < 3:
+            if k == 0:
+                return []
+            continue
+        a = _signed_area2(r)
+        if a == 0:
+            if k == 0:
+                return []
+            continue
+        # Karo uzayı y aşağı: dış halka pozitif, iç halka negatif alan
+        if (k == 0) != (a > 0):
+            r = r[::-1]
+        rings.append(r)
+    return rings
+
+
+def _geometry_commands(geom) -> Tuple[Optional[int], List[int]]:
+    cmds: List[int] = []
+    cursor = np.zeros(2, dtype=np.int64)
+    gtype = shapely.get_type_id(geom)
+    parts = list(shapely.get_parts(geom)) if gtype in (4, 5, 6, 7) else [geom]
+    kind = None
+    for part in parts:
+        pid = shapely.get_type_id(part)
+        if pid == 0:    # Point
+            if kind not in (None, _POINT):
+                continue
+            kind = _POINT
+            pts = np.rint(shapely.get_coordinates(part)).astype(np.int64)
+            cursor = _ring_commands(pts, cursor, False, cmds)
+        elif pid == 1:  # LineString
+            if kind not in (None, _LINESTRING):
+                continue
+            line = _dedupe(np.rint(shapely.get_coordinates(part)).astype(np.int64))
+            if len(line) < 2:
+                continue
+            kind = _LINESTRING
+            cursor = _ring_commands(line, cursor, False, cmds)
+        elif pid == 3:  # Polygon
+            if kind not in (None, _POLYGON):
+                continue
+            for ring in _polygon_rings(part):
+                kind = _POLYGON
+                cursor = _ring_commands(ring, cursor, True, cmds)
+    # Birden çok nokta tek MoveTo(count) ile yazılmalı
+    if kind == _POINT and len(parts) > 1:
+        pts = np.rint(shapely.get_coordinates(geom)).astype(np.int64)
+        d = np.diff(np.vstack([np.zeros((1, 2), dtype=np.int64), pts]), axis=0)
+        cmds = [(_MOVE_TO & 7) | (len(pts) << 3)] + _zigzag(d).ravel().tolist()
+    return kind, cmds
+
+
+# ─── karo hazırlama ───
+
+def to_tile_space(
+    geoms: np.ndarray,
+    bounds_3857: Tuple[float, float, float, float],
+    extent: int = EXTENT,
+    buffer: int = BUFFER,
+    simplify_units: float = 1.0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    EPSG:3857 geometrileri → karo grid'i (float, y aşağı); tampon dışı kırpılır, boşalanlar atılır.
+    Dönüş: (geometriler, girdideki indeksleri).
+    """
+    minx, miny, maxx, maxy = bounds_3857
+    size = maxx - minx
+    unit = size / extent
+    pad = buffer * unit
+    geoms = np.asarray(geoms, dtype=object)
+    if geoms.size == 0:
+        return geoms, np.empty(0, dtype=np.intp)
+    clipped = shapely.clip_by_rect(geoms, minx - pad, miny - pad, maxx + pad, maxy + pad)
+    if simplify_units > 0:
+        clipped = shapely.simplify(clipped, unit * simplify_units, preserve_topology=True)
+    keep = np.flatnonzero(~shapely.is_empty(clipped) & ~shapely.is_missing(clipped))
+    sx = extent / size
+    tile = shapely.transform(clipped[keep], lambda c: np.column_stack([(c[:, 0] - minx) * sx, (maxy - c[:, 1]) * sx]))
+    return tile, keep
+
+
+def encode_layer(name: str, geoms: Sequence, properties: Sequence[Dict], extent: int = EXTENT) -> bytes:
+    """Karo uzayındaki geometriler (+ özellik dict'leri) → Layer mesajı; çöken geometriler atlanır."""
+    keys: Dict[str, int] = {}
+    values: Dict[bytes, int] = {}
+    features = bytearray()
+    n = 0
+    for geom, props in zip(geoms, properties):
+        kind, cmds = _geometry_commands(geom)
+        if kind is None or not cmds:
+            continue
+        tags: List[int] = []
+        for k, v in (props or {}).items():
+            enc = _value(v)
+            if enc is None:
+                continue
+            tags.append(keys.setdefault(k, len(keys)))
+            tags.append(values.setdefault(enc, len(values)))
+        n += 1
+        feat = bytearray()
+        _key(1, 0, feat)
+        _varint(n, feat)
+        if tags:
+            _packed(2, tags, feat)
+        _key(3, 0, feat)
+        _varint(kind, feat)
+        _packed(4, cmds, feat)
+        _bytes_field(2, bytes(feat), features)
+
+    out = bytearray()
+    _key(15, 0, out)
+    _varint(2, out)
+    _bytes_field(1, name.encode("utf-8"), out)
+    out += features
+    for k in keys:
+        _bytes_field(3, k.encode("utf-8"), out)
+    for v in values:
+        _bytes_field(4, v, out)
+    _key(5, 0, out)
+    _varint(extent, out)
+    return bytes(out) if n else b""
+
+
+def encode_tile(layers: Iterable[bytes]) -> bytes:
+    """Layer mesajları → Tile (boş katmanlar atlanır; hiç katman yoksa boş karo b"")."""
+    out = bytearray()
+    for layer in layers:
+        if layer:
+            _bytes_field(3, layer, out)
+    return bytes(out)
+
+
+# ─── referans çözücü (test / hata ayıklama) ───
+
+def _read_varint(buf: bytes, i: int) -> Tuple[int, int]:
+    shift = n = 0
+    while True:
+        b = buf[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+
+
+def _fields(buf: bytes):
+    i = 0
+    while i < len(buf):
+        key, i = _read_varint(buf, i)
+        field, wire = key >> 3, key & 7
+        if wire == 0:
+            v, i = _read_varint(buf, i)
+        elif wire == 1:
+            v, i = buf[i:i + 8], i + 8
+        elif wire == 2:
+            ln, i = _read_varint(buf, i)
+            v, i = buf[i:i + ln], i + ln
+        elif wire == 5:
+            v, i = buf[i:i + 4], i + 4
+        else:
+            raise ValueError(f"unsupported wire type {wire}")
+        yield field, v
+
+
+def _unpack(buf: bytes) -> List[int]:
+    out, i = [], 0
+    while i < len(buf):
+        v, i = _read_varint(buf, i)
+        out.append(v)
+    return out
+
+
+def _decode_value(buf: bytes):
+    for field, v in _fields(buf):
+        if field == 1:
+            return v.decode("utf-8")
+        if field == 2:
+            return struct.unpack("<f", v)[0]
+        if field == 3:
+            return struct.unpack("<d", v)[0]
+        if field in (4, 5):
+            return v
+        if field == 6:
+            return (v >> 1) ^ -(v & 1)
+        if field == 7:
+            return bool(v)
+    return None
+
+
+def _decode_geometry(cmds: List[int]) -> List[List[Tuple[int, int]]]:
+    """Komut dizisi → parça listesi (her parça karo koordinatları; kapalı halkalar ilk noktayla biter)."""
+    parts, cur, x, y, i = [], None, 0, 0, 0
+    while i < len(cmds):
+        cid, count = cmds[i] & 7, cmds[i] >> 3
+        i += 1
+        if cid == _CLOSE_PATH:
+            cur.append(cur[0])
+            continue
+        for _ in range(count):
+            dx, dy = cmds[i], cmds[i + 1]
+            i += 2
+            x += (dx >> 1) ^ -(dx & 1)
+            y += (dy >> 1) ^ -(dy & 1)
+            if cid == _MOVE_TO:
+                cur = [(x, y)]
+                parts.append(cur)
+            else:
+                cur.append((x, y))
+    return parts
+
+
+def decode_tile(data: bytes) -> Dict[str, dict]:
+    """Tile → {katman adı: {"extent", "features": [{"id", "type", "parts", "properties"}]}}."""
+    out = {}
+    for field, layer_buf in _fields(data):
+        if field != 3:
+            continue
+        name, extent, keys, values, feats = None, EXTENT, [], [], []
+        for f, v in _fields(layer_buf):
+            if f == 1:
+                name = v.decode("utf-8")
+            elif f == 2:
+                feats.append(v)
+            elif f == 3:
+                keys.append(v.decode("utf-8"))
+            elif f == 4:
+                values.append(_decode_value(v))
+            elif f == 5:
+                extent = v
+        features = []
+        for fb in feats:
+            feat = {"id": None, "type": None, "parts": [], "properties": {}}
+            for f, v in _fields(fb):
+                if f == 1:
+                    feat["id"] = v
+                elif f == 2:
+                    tags = _unpack(v)
+                    feat["properties"] = {keys[tags[j]]: values[tags[j + 1]] for j in range(0, len(tags), 2)}
+                elif f == 3:
+                    feat["type"] = {1: "Point", 2: "LineString", 3: "Polygon"}.get(v)
+                elif f == 4:
+                    feat["parts"] = _decode_geometry(_unpack(v))
+            features.append(feat)
+        out[name] = {"extent": extent, "features": features}
+    return out
@@ -0,0 +1,151 @@
+# core/profiling.py
+"""
+Hafif profil kancası: aşama süreleri + dizi boyutları.
+
+- span("obstacles.smooth", pixels=H.size): bloğun süresini ölçer, süreç geneli histograma yazar
+  ve etkin bir toplayıcı varsa (collect()) isteğin zaman çizelgesine ekler. Boyutlar yield edilen
+  sözlüğe blok içinde de eklenebilir (rec["features"] = len(feats)).
+- collect(): ContextVar tabanlı istek toplayıcısı. Thread havuzuna geçerken
+  contextvars.copy_context() ile taşınmalıdır (api/executor bunu yapar).
+- Histogram + render_prometheus(): Prometheus metin formatı (/metrics).
+"""
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PIXEL_BUCKETS = tuple(float(4 ** k) for k in range(5, 14))  # 1k … 67M piksel
+
+_FAMILIES: List["Histogram"] = []
+
+
+def _fmt(v: float) -> str:
+    return "+Inf" if v == math.inf else repr(float(v))
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Etiketli, kümülatif kovalı histogram (Prometheus semantiği)."""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = SECONDS_BUCKETS, register: bool = True):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # etiketler → [kova sayıları, toplam, adet]
+        self._lock = threading.Lock()
+        if register:
+            _FAMILIES.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], dict]:
+        with self._lock:
+            return {k: {"counts": list(s[0]), "sum": s[1], "count": s[2]} for k, s in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, s in sorted(self.snapshot().items()):
+            base = [f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, key)]
+            cum = 0
+            for le, c in zip(self.buckets + (math.inf,), s["counts"]):
+                cum += c
+                lbl = ",".join(base + [f'le="{_fmt(le)}"'])
+                lines.append(f"{self.name}_bucket{{{lbl}}} {cum}")
+            lbl = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{self.name}_sum{lbl} {repr(float(s['sum']))}")
+            lines.append(f"{self.name}_count{lbl} {s['count']}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("tengrilz_stage_seconds", "Pipeline stage duration in seconds", ("stage",))
+STAGE_PIXELS = Histogram("tengrilz_stage_pixels", "Raster pixels processed per stage", ("stage",), PIXEL_BUCKETS)
+
+
+def render_prometheus(extra: Optional[List[str]] = None) -> str:
+    """Kayıtlı tüm histogramlar (+ çağıranın gauge satırları) tek metin olarak."""
+    lines: List[str] = []
+    for fam in _FAMILIES:
+        lines.extend(fam.render())
+    lines.extend(extra or [])
+    return "\n".join(lines) + "\n"
+
+
+class _Collector:
+    __slots__ = ("t0", "records", "_lock")
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.records: List[dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, rec: dict):
+        with self._lock:
+            self.records.append(rec)
+
+
+_CURRENT: contextvars.ContextVar[Optional[_Collector]] = contextvars.ContextVar("tengrilz_profile", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[List[dict]]:
+    """Bu bağlamdaki span'leri toplar; yield edilen liste blok bitince de okunabilir."""
+    col = _Collector()
+    token = _CURRENT.set(col)
+    try:
+        yield col.records
+    finally:
+        _CURRENT.reset(token)
+
+
+def active() -> bool:
+    return _CURRENT.get() is not None
+
+
+def record(stage: str, seconds: float, start: Optional[float] = None, **sizes):
+    """Ölçülmüş bir süreyi (ör. kuyruk beklemesi) span gibi kaydeder."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    px = sizes.get("pixels")
+    if px:
+        STAGE_PIXELS.observe(float(px), stage=stage)
+    col = _CURRENT.get()
+    if col is not None:
+        if start is None:
+            start = time.perf_counter() - seconds
+        col.add({
+            "stage": stage,
+            "start_ms": round((start - col.t0) * 1000.0, 3),
+            "ms": round(seconds * 1000.0, 3),
+            **{k: v for k, v in sizes.items() if v is not None},
+        })
+
+
+@contextmanager
+def span(stage: str, **sizes) -> Iterator[dict]:
+    rec = dict(sizes)
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        record(stage, time.perf_counter() - t0, start=t0, **rec)
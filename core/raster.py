@@ -1,12 +1,84 @@
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
+import multiprocessing
+import os
+import time
+import warnings
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, as_completed, wait
+from contextlib import nullcontext
 import rasterio
 import numpy as np
-from shapely.geometry import Polygon, mapping
+import shapely
+from shapely.affinity import affine_transform
+from shapely.geometry import Polygon, mapping, shape
 from shapely.ops import unary_union
 from rasterio.features import shapes
-from skimage.morphology import opening, closing, disk
+from scipy import ndimage
 from skimage.filters import gaussian
 import rasterio.windows as rw
+from rasterio.enums import Resampling
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.transform import Affine
+from rasterio.warp import reproject
+
+from core import morphology
+from core.profiling import record, span
+
+
+class RasterArray:
+    """
+    Tek bantlı raster'ın bellekteki hali: veri + affine + CRS + nodata.
+    Band bir kez okunur, nodata pikselleri NaN'a çevrilir; noktalar toplu (NumPy) örneklenir.
+    """
+
+    __slots__ = ("data", "transform", "crs", "nodata")
+
+    def __init__(self, data: np.ndarray, transform, crs=None, nodata=None):
+        arr = np.asarray(data, dtype=np.float32)
+        if nodata is not None and not np.isnan(nodata):
+            arr = np.where(arr == np.float32(nodata), np.float32(np.nan), arr)
+        self.data = arr
+        self.transform = transform
+        self.crs = crs
+        self.nodata = nodata
+
+    @classmethod
+    def from_dataset(cls, ds, window=None) -> "RasterArray":
+        with span("raster.read") as rec:
+            data = ds.read(1, window=window)
+            rec["pixels"] = int(data.size)
+            rec["bytes"] = int(data.nbytes)
+        transform = ds.window_transform(window) if window is not None else ds.transform
+        return cls(data, transform, crs=ds.crs, nodata=ds.nodata)
+
+    @classmethod
+    def from_path(cls, path: str, window=None) -> "RasterArray":
+        with rasterio.open(path) as ds:
+            return cls.from_dataset(ds, window=window)
+
+    @property
+    def height(self) -> int:
+        return int(self.data.shape[0])
+
+    @property
+    def width(self) -> int:
+        return int(self.data.shape[1])
+
+    def rowcol(self, xs, ys):
+        """(x, y) dizilerini satır/sütun indekslerine çevirir; pencere dışını kenara kıstırır."""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        inv = ~self.transform
+        cols = np.floor(inv.a * xs + inv.b * ys + inv.c)
+        rows = np.floor(inv.d * xs + inv.e * ys + inv.f)
+        rows = np.clip(rows, 0, self.height - 1).astype(np.intp)
+        cols = np.clip(cols, 0, self.width - 1).astype(np.intp)
+        return rows, cols
+
+    def sample(self, xs, ys) -> np.ndarray:
+        """Noktalardaki piksel değerleri (float64, nodata → NaN)."""
+        rows, cols = self.rowcol(xs, ys)
+        return self.data[rows, cols].astype(np.float64)
+
 
 def read_subset(path: str, center_x: float, center_y: float, window_m: float):
     with rasterio.open(path) as src:
@@ -19,74 +91,458 @@ def read_subset(path: str, center_x: float, center_y: float, window_m: float):
         transform = src.window_transform(win)
         return data, transform
 
-def _read_align(dsm_path: str, dtm_path: Optional[str]):
-    dsm = rasterio.open(dsm_path)
-    if dtm_path:
-        dtm = rasterio.open(dtm_path)
-        # Assume aligned for M2; production: reproject/resample dtm to dsm profile
-        if (dtm.width != dsm.width) or (dtm.height != dsm.height) or (dtm.transform != dsm.transform):
-            # Resample DTM to DSM grid
-            data = dtm.read(1, out_shape=(dsm.height, dsm.width), resampling=rasterio.enums.Resampling.bilinear)
-            dtm_data = data.astype(np.float32)
-        else:
-            dtm_data = dtm.read(1).astype(np.float32)
-    else:
-        dtm_data = None
-    dsm_data = dsm.read(1).astype(np.float32)
-    no = dsm.nodata
-    if no is not None:
-        dsm_mask = dsm_data == no
-        dsm_data[dsm_mask] = np.nan
-        if dtm_data is not None:
-            dtm_data[dsm_mask] = np.nan
-    return dsm, dsm_data, dtm_data
+def _align_to(src: RasterArray, ref: RasterArray) -> np.ndarray:
+    """src'yi ref grid'ine getirir (aynı grid ise kopyasız); nodata → NaN."""
+    if src.data.shape == ref.data.shape and src.transform == ref.transform:
+        return src.data
+    out = np.full(ref.data.shape, np.nan, dtype=np.float32)
+    reproject(
+        source=src.data, destination=out,
+        src_transform=src.transform, src_crs=src.crs or ref.crs, src_nodata=np.nan,
+        dst_transform=ref.transform, dst_crs=ref.crs or src.crs, dst_nodata=np.nan,
+        resampling=Resampling.bilinear,
+    )
+    return out
+
+
+def _label_stats(values: np.ndarray, labels: np.ndarray, n_labels: int) -> dict:
+    """
+    Etiket başına count/max/mean/p95 (NaN'lar hariç), tek sıralama ile.
+    Dönen diziler etiket numarasıyla indekslenir (0 = arka plan).
+    """
+    lab = labels.ravel()
+    v = values.ravel()
+    sel = lab > 0
+    lab, v = lab[sel], v[sel]
+    count = np.bincount(lab, minlength=n_labels + 1)
+
+    fin = np.isfinite(v)
+    lab, v = lab[fin], v[fin]
+    order = np.lexsort((v, lab))
+    lab, v = lab[order], v[order]
+    nf = np.bincount(lab, minlength=n_labels + 1)
+    start = np.concatenate(([0], np.cumsum(nf)[:-1]))
+    has = nf > 0
+
+    out_max = np.full(n_labels + 1, np.nan)
+    out_mean = np.full(n_labels + 1, np.nan)
+    out_p95 = np.full(n_labels + 1, np.nan)
+    if v.size:
+        sums = np.bincount(lab, weights=v, minlength=n_labels + 1)
+        out_max[has] = v[start[has] + nf[has] - 1]
+        out_mean[has] = sums[has] / nf[has]
+        # np.percentile(..., 95) ile aynı doğrusal interpolasyon
+        pos = 0.95 * (nf[has] - 1)
+        lo = np.floor(pos).astype(np.intp)
+        hi = np.ceil(pos).astype(np.intp)
+        v_lo = v[start[has] + lo]
+        v_hi = v[start[has] + hi]
+        out_p95[has] = v_lo + (v_hi - v_lo) * (pos - lo)
+    return {"count": count, "max": out_max, "mean": out_mean, "p95": out_p95}
 
 
 def compute_obstacles(dsm_path: str, dtm_path: Optional[str], min_h: float = 2.0, smooth_sigma: float = 1.0) -> List[dict]:
-    dsm, dsm_data, dtm_data = _read_align(dsm_path, dtm_path)
-
-    if dtm_data is not None:
-        H = dsm_data - dtm_data
-    else:
-        # Conservative: use DSM as-top; relative height unknown (treat >min_h above local median). Simple baseline:
-        # High-pass via Gaussian blur
-        base = gaussian(dsm_data, sigma=5, preserve_range=True)
-        H = dsm_data - base
-
-    H = gaussian(H, sigma=smooth_sigma, preserve_range=True)
-    H[np.isnan(H)] = -9999
-
-    mask = H >= min_h
-    # Morphology clean-up
-    selem = disk(1)
-    mask = opening(mask, selem)
-    mask = closing(mask, selem)
-
-    # Vectorize
+    """Dosya yolu sarmalayıcısı; bkz. compute_obstacles_arrays."""
+    dsm = RasterArray.from_path(dsm_path)
+    dtm = RasterArray.from_path(dtm_path) if dtm_path else None
+    return compute_obstacles_arrays(dsm, dtm, min_h=min_h, smooth_sigma=smooth_sigma)
+
+
+def _height_mask(dsm_data: np.ndarray, dtm_data: Optional[np.ndarray], min_h: float, smooth_sigma: float):
+    """Göreli yükseklik H (geçersiz = -9999), geçerlilik maskesi ve morfolojiden geçmiş engel maskesi."""
+    with span("obstacles.smooth", pixels=dsm_data.size):
+        if dtm_data is not None:
+            H = dsm_data - dtm_data
+        else:
+            # Conservative: use DSM as-top; relative height unknown (treat >min_h above local median). Simple baseline:
+            # High-pass via Gaussian blur
+            base = gaussian(dsm_data, sigma=5, preserve_range=True)
+            H = dsm_data - base
+
+        H = gaussian(H, sigma=smooth_sigma, preserve_range=True)
+        H_valid = np.isfinite(H)
+        H[~H_valid] = -9999
+
+    with span("obstacles.morphology", pixels=H.size):
+        mask = H >= min_h
+        # Morphology clean-up
+        selem = morphology.disk(1)
+        mask = morphology.opening(mask, selem)
+        mask = morphology.closing(mask, selem)
+    return H, H_valid, mask
+
+
+def _obstacle_props(stats: dict, k: int, pixel_area: float, source: str) -> dict:
+    return {
+        "height_m": round(float(stats["max"][k]), 2),
+        "height_p95_m": round(float(stats["p95"][k]), 2),
+        "height_mean_m": round(float(stats["mean"][k]), 2),
+        "area_m2": round(float(stats["count"][k]) * pixel_area, 2),
+        "pixel_count": int(stats["count"][k]),
+        "source": source,
+    }
+
+
+def compute_obstacles_arrays(dsm: RasterArray, dtm: Optional[RasterArray], min_h: float = 2.0,
+                             smooth_sigma: float = 1.0) -> List[dict]:
+    """Bellekteki DSM/DTM (RasterArray) üzerinden engel poligonları; DTM gerekirse DSM grid'ine örneklenir."""
+    dsm_data = dsm.data
+    with span("obstacles.align", pixels=dsm_data.size):
+        dtm_data = _align_to(dtm, dsm) if dtm is not None else None
+
+    H, H_valid, mask = _height_mask(dsm_data, dtm_data, min_h, smooth_sigma)
+
+    # Bağlı bileşenler: her engel kendi etiketiyle; istatistikler etiket görüntüsünden tek geçişte
+    with span("obstacles.label", pixels=mask.size) as rec:
+        labels, n_labels = ndimage.label(mask)
+        stats = _label_stats(np.where(H_valid, H, np.nan), labels, n_labels)
+        rec["labels"] = int(n_labels)
+
+    # Vectorize (shapes değeri = etiket numarası)
     results = []
     transform = dsm.transform
-    for geom, val in shapes(mask.astype(np.uint8), mask=mask, transform=transform):
-        # Extract max height within polygon footprint
-        # Build a simple bbox clip for speed; for M2, we approximate using raster mask itself
-        # Compute max H where mask==True inside geom via raster windowing can be heavy; use val mask region itself
-        # Here, just compute the representative height as 95th percentile over masked region
-        # Create boolean mask of pixels inside geom by rasterizing could be used; for simplicity use value==1 area
-        # This loop already iterates only True pixels regions, so estimate height from H where mask True AND geom bounds
-        # (Good enough for M2; production: rasterize geom to array and take max)
-        # We'll sample by bounding box indices
+    pixel_area = abs(transform.a * transform.e - transform.b * transform.d)
+    source = "DSM-DTM" if dtm_data is not None else "DSM-highpass"
+    with span("obstacles.vectorize", pixels=labels.size) as rec:
+        for geom, val in shapes(labels.astype(np.int32), mask=mask, transform=transform):
+            k = int(val)
+            poly = Polygon(geom["coordinates"][0])
+            if not poly.is_valid or poly.area == 0 or not np.isfinite(stats["max"][k]):
+                continue
+            results.append({
+                "type": "Feature",
+                "geometry": geom,
+                "properties": _obstacle_props(stats, k, pixel_area, source),
+            })
+        rec["features"] = len(results)
+
+    return results
+
+
+def obstacle_geometries(features) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    GeoJSON feature'ları → (shapely geometri dizisi, height_m dizisi).
+    Deliksiz Polygon'lar (engellerin çoğu) koordinat dizisinden tek çağrıda kurulur; diğerleri shape() ile.
+    """
+    n = len(features)
+    geoms = np.empty(n, dtype=object)
+    heights = np.array([float(f.get("properties", {}).get("height_m", 0.0)) for f in features], dtype=np.float64)
+    simple, rings = [], []
+    for i, f in enumerate(features):
+        g = f.get("geometry") or {}
+        if g.get("type") == "Polygon" and len(g.get("coordinates", ())) == 1 and len(g["coordinates"][0]) >= 4:
+            simple.append(i)
+            rings.append(g["coordinates"][0])
+        else:
+            geoms[i] = shape(g)
+    if rings:
+        lens = np.fromiter((len(r) for r in rings), dtype=np.intp, count=len(rings))
+        coords = np.array([p[:2] for r in rings for p in r], dtype=np.float64)
+        idx = np.repeat(np.arange(len(rings)), lens)
+        geoms[simple] = shapely.polygons(shapely.linearrings(coords, indices=idx))
+    return geoms, heights
+
+
+# ─── Parçalı (blok blok) engel çıkarımı: bellek blok boyutuyla sınırlı ───
+
+def obstacle_halo_px(smooth_sigma: float, highpass: bool) -> int:
+    """
+    Blok kenarında sonucu tam raster ile aynı tutmak için gereken halo (piksel):
+    gaussian çekirdekleri (truncate=4σ) + opening/closing (disk(1), toplam 4 px) + 1 emniyet.
+    """
+    halo = int(np.ceil(4.0 * smooth_sigma)) + 4 + 1
+    if highpass:
+        halo += 20  # DSM-highpass tabanı: sigma=5
+    return halo
+
+
+def _read_block_arrays(dsm_ds, dtm_ds, win) -> tuple:
+    """Blok penceresini okur; DTM farklı grid'deyse pencere sınırlarından okunup DSM bloğuna örneklenir."""
+    dsm = RasterArray.from_dataset(dsm_ds, window=win)
+    if dtm_ds is None:
+        return dsm, None
+    if dtm_ds.transform == dsm_ds.transform and dtm_ds.shape == dsm_ds.shape:
+        return dsm, RasterArray.from_dataset(dtm_ds, window=win).data
+    minx, miny, maxx, maxy = rw.bounds(win, dsm_ds.transform)
+    pad = 2 * max(abs(dtm_ds.transform.a), abs(dtm_ds.transform.e))
+    dwin = rw.from_bounds(minx - pad, miny - pad, maxx + pad, maxy + pad, transform=dtm_ds.transform)
+    dwin = dwin.round_offsets().round_lengths().intersection(rw.Window(0, 0, dtm_ds.width, dtm_ds.height))
+    dtm = RasterArray.from_dataset(dtm_ds, window=dwin)
+    return dsm, _align_to(dtm, dsm)
+
+
+def _obstacle_block(job: dict) -> dict:
+    """
+    Tek blok (süreç/thread havuzunda): halo'lu pencerede H + maske, çekirdekte etiketleme.
+    Çekirdeğin iç kenarlarına (komşu bloğa) değmeyen engeller tamdır → feature olarak döner.
+    Değenler "parça" olarak döner: piksel uzayında poligon + H değerleri; dikişi ana süreç birleştirir.
+    """
+    t0 = time.perf_counter()
+    r0, r1, c0, c1 = job["core"]
+    halo = job["halo"]
+    with rasterio.open(job["dsm_path"]) as dsm_ds, \
+            (rasterio.open(job["dtm_path"]) if job["dtm_path"] else nullcontext()) as dtm_ds:
+        H_img, W_img = dsm_ds.height, dsm_ds.width
+        hr0, hr1 = max(0, r0 - halo), min(H_img, r1 + halo)
+        hc0, hc1 = max(0, c0 - halo), min(W_img, c1 + halo)
+        win = rw.Window.from_slices((hr0, hr1), (hc0, hc1))
+        dsm, dtm_data = _read_block_arrays(dsm_ds, dtm_ds, win)
+        transform = dsm_ds.transform
+
+    H, H_valid, mask = _height_mask(dsm.data, dtm_data, job["min_h"], job["smooth_sigma"])
+    core = (slice(r0 - hr0, r1 - hr0), slice(c0 - hc0, c1 - hc0))
+    H, H_valid, mask = H[core], H_valid[core], np.ascontiguousarray(mask[core])
+    del dsm, dtm_data
+
+    labels, n_labels = ndimage.label(mask)
+    values = np.where(H_valid, H, np.nan)
+    stats = _label_stats(values, labels, n_labels)
+
+    # İç dikişlere değen etiketler → komşu blok kimlikleri
+    edges = {
+        "top": (labels[0, :], job["neighbours"].get("top")),
+        "bottom": (labels[-1, :], job["neighbours"].get("bottom")),
+        "left": (labels[:, 0], job["neighbours"].get("left")),
+        "right": (labels[:, -1], job["neighbours"].get("right")),
+    }
+    seam_nb: dict = {}
+    for edge, nb in edges.values():
+        if nb is None:
+            continue
+        for k in np.unique(edge[edge > 0]):
+            seam_nb.setdefault(int(k), []).append(nb)
+
+    # Dikiş parçalarının H değerleri (istatistikler birleşince yeniden hesaplanır)
+    seam_values = {}
+    if seam_nb:
+        lab = labels.ravel()
+        ks = np.sort(np.fromiter(seam_nb.keys(), dtype=lab.dtype))
+        sel = np.flatnonzero(np.isin(lab, ks))
+        sel = sel[np.argsort(lab[sel], kind="stable")]
+        lo = np.searchsorted(lab[sel], ks, side="left")
+        hi = np.searchsorted(lab[sel], ks, side="right")
+        for k, a, b in zip(ks, lo, hi):
+            seam_values[int(k)] = values.ravel()[sel[a:b]].astype(np.float32)
+
+    pixel_area = abs(transform.a * transform.e - transform.b * transform.d)
+    features, pieces = [], []
+    pixel_tf = Affine.translation(c0, r0)  # global piksel uzayı: dikişler tam sayı koordinatlarda çakışır
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)  # ilk blokta pixel_tf birim matristir
+        block_shapes = list(shapes(labels.astype(np.int32), mask=mask, transform=pixel_tf))
+    for geom, val in block_shapes:
+        k = int(val)
+        if k in seam_nb:
+            pieces.append({"geometry": geom, "values": seam_values[k], "neighbours": seam_nb[k]})
+            continue
         poly = Polygon(geom["coordinates"][0])
-        if not poly.is_valid or poly.area == 0:
+        if not poly.is_valid or poly.area == 0 or not np.isfinite(stats["max"][k]):
             continue
-        # approximate height as min(30m cap, nanmax over area) to avoid spikes
-        # Note: a robust approach requires rasterization; skipping for brevity
-        height_est = float(np.nanpercentile(H[mask], 95))
-        results.append({
+        features.append({
             "type": "Feature",
-            "geometry": geom,
-            "properties": {
-                "height_m": round(height_est, 2),
-                "source": "DSM-DTM" if dtm_data is not None else "DSM-highpass",
-            }
+            "geometry": mapping(affine_transform(shape(geom), _shapely_affine(transform))),
+            "properties": _obstacle_props(stats, k, pixel_area, job["source"]),
         })
+    return {
+        "bid": job["bid"],
+        "features": features,
+        "pieces": pieces,
+        "neighbours": list(job["neighbours"].values()),
+        "seconds": time.perf_counter() - t0,
+        "pixels": int((hr1 - hr0) * (hc1 - hc0)),
+    }
+
+
+def _shapely_affine(t) -> list:
+    return [t.a, t.b, t.d, t.e, t.c, t.f]
+
+
+class _SeamStitcher:
+    """
+    Dikişe değen parçaları birleştirir (union-find). Parçalar ancak ortak bir kenar paylaşıyorsa
+    (4-komşuluk; köşe teması değil) aynı engeldir. Bir grubun değdiği tüm bloklar bittiğinde grup
+    tamamlanır ve feature olarak çıkar; böylece bekleyen parça sayısı da dikişlerle sınırlı kalır.
+    """
+
+    def __init__(self, transform, source: str):
+        self.transform = transform
+        self.source = source
+        self.pixel_area = abs(transform.a * transform.e - transform.b * transform.d)
+        self.pieces: dict = {}       # pid → parça
+        self.parent: dict = {}
+        self.members: dict = {}      # kök → [pid]
+        self.needs: dict = {}        # kök → gereken blok kimlikleri
+        self.by_seam: dict = {}      # (bid_a, bid_b) → [pid]
+        self.done: set = set()
+        self._next = 0
+
+    def _find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def _union(self, a: int, b: int):
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb:
+            return
+        if len(self.members[ra]) < len(self.members[rb]):
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.members[ra].extend(self.members.pop(rb))
+        self.needs[ra] |= self.needs.pop(rb)
+
+    def add_block(self, bid: int, pieces: List[dict], neighbours: List[int]) -> List[dict]:
+        """Bloğun parçalarını ekler; tamamlanan grupları feature olarak döndürür."""
+        self.done.add(bid)
+        touched = set()
+        for p in pieces:
+            pid = self._next
+            self._next += 1
+            p["bid"] = bid
+            p["shape"] = shape(p.pop("geometry"))
+            self.pieces[pid] = p
+            self.parent[pid] = pid
+            self.members[pid] = [pid]
+            self.needs[pid] = {bid, *p["neighbours"]}
+            for nb in p["neighbours"]:
+                seam = (min(bid, nb), max(bid, nb))
+                lst = self.by_seam.setdefault(seam, [])
+                for q in lst:
+                    other = self.pieces.get(q)
+                    if other is None or other["bid"] == bid:
+                        continue
+                    inter = p["shape"].intersection(other["shape"])
+                    if not inter.is_empty and (inter.length > 0 or inter.area > 0):
+                        self._union(pid, q)
+                lst.append(pid)
+            touched.add(pid)
+        # Bu blok, komşu bloklardaki bekleyen grupların son eksiği olabilir
+        for nb in neighbours:
+            seam = (min(bid, nb), max(bid, nb))
+            lst = self.by_seam.get(seam)
+            if lst is None:
+                continue
+            lst[:] = [q for q in lst if q in self.pieces]
+            if not lst and nb in self.done:
+                del self.by_seam[seam]
+            touched.update(lst)
+
+        out = []
+        for root in {self._find(q) for q in touched}:
+            if self.needs[root] <= self.done:
+                f = self._finish(root)
+                if f is not None:
+                    out.append(f)
+        return out
+
+    def flush(self) -> List[dict]:
+        """Kalan tüm grupları (ör. hatalı blok yüzünden eksik kalanlar) kapatır."""
+        out = []
+        for root in list(self.members):
+            if root in self.members and self._find(root) == root:
+                f = self._finish(root)
+                if f is not None:
+                    out.append(f)
+        return out
+
+    def _finish(self, root: int) -> Optional[dict]:
+        pids = self.members.pop(root)
+        self.needs.pop(root, None)
+        parts = [self.pieces.pop(q) for q in pids]
+        values = np.concatenate([p["values"] for p in parts])
+        geom = shapely.union_all([p["shape"] for p in parts])
+        stats = _label_stats(values, np.ones(values.shape, dtype=np.intp), 1)
+        exterior = geom.exterior if geom.geom_type == "Polygon" else max(geom.geoms, key=lambda g: g.area).exterior
+        if not Polygon(exterior).is_valid or geom.area == 0 or not np.isfinite(stats["max"][1]):
+            return None
+        return {
+            "type": "Feature",
+            "geometry": mapping(affine_transform(geom, _shapely_affine(self.transform))),
+            "properties": _obstacle_props(stats, 1, self.pixel_area, self.source),
+        }
+
+
+def iter_obstacles_chunked(
+    dsm_path: str,
+    dtm_path: Optional[str],
+    min_h: float = 2.0,
+    smooth_sigma: float = 1.0,
+    block_px: int = 1024,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+) -> Iterator[dict]:
+    """
+    compute_obstacles'ın parçalı hali: raster halo'lu bloklarla gezilir, bloklar paralel işlenir,
+    dikişe değen engeller birleştirilip feature'lar üretildikçe yield edilir.
+    Bellek ~ (blok + halo)² × eşzamanlı blok sayısı; sonuç kümesi tam raster ile aynıdır (sıra hariç).
+
+    executor verilmezse max_workers süreçli geçici bir havuz açılır; max_workers=1 → havuzsuz, seri.
+    """
+    with rasterio.open(dsm_path) as ds:
+        H_img, W_img, transform = ds.height, ds.width, ds.transform
+    highpass = not dtm_path
+    source = "DSM-highpass" if highpass else "DSM-DTM"
+    halo = obstacle_halo_px(smooth_sigma, highpass)
+    block_px = max(16, int(block_px))
+    nbi, nbj = -(-H_img // block_px), -(-W_img // block_px)
+
+    def _jobs():
+        for bi in range(nbi):
+            for bj in range(nbj):
+                bid = bi * nbj + bj
+                nb = {}
+                if bi > 0:
+                    nb["top"] = bid - nbj
+                if bi < nbi - 1:
+                    nb["bottom"] = bid + nbj
+                if bj > 0:
+                    nb["left"] = bid - 1
+                if bj < nbj - 1:
+                    nb["right"] = bid + 1
+                yield {
+                    "bid": bid,
+                    "core": (bi * block_px, min(H_img, (bi + 1) * block_px),
+                             bj * block_px, min(W_img, (bj + 1) * block_px)),
+                    "halo": halo,
+                    "neighbours": nb,
+                    "dsm_path": dsm_path,
+                    "dtm_path": dtm_path,
+                    "min_h": min_h,
+                    "smooth_sigma": smooth_sigma,
+                    "source": source,
+                }
+
+    stitcher = _SeamStitcher(transform, source)
+
+    def _consume(res: dict) -> List[dict]:
+        record("obstacles.block", res["seconds"], pixels=res["pixels"], features=len(res["features"]))
+        return res["features"] + stitcher.add_block(res["bid"], res["pieces"], res["neighbours"])
+
+    workers = max_workers or os.cpu_count() or 1
+    if executor is None and workers == 1:
+        for job in _jobs():
+            yield from _consume(_obstacle_block(job))
+        yield from stitcher.flush()
+        return
 
-    return results
\ No newline at end of file
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        # Eşzamanlı blok sayısı sınırlı: sonuçlar tüketildikçe yeni blok gönderilir
+        inflight = set()
+        jobs = _jobs()
+        limit = 2 * workers
+        for job in jobs:
+            inflight.add(executor.submit(_obstacle_block, job))
+            if len(inflight) >= limit:
+                finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    yield from _consume(fut.result())
+        for fut in as_completed(inflight):
+            yield from _consume(fut.result())
+        yield from stitcher.flush()
+    finally:
+        if own:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,42 +1,195 @@
+import math
+import multiprocessing
+import os
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import List, Optional
+
 import numpy as np
 import rasterio
-from rasterio.enums import Resampling
-from scipy.ndimage import minimum_filter, gaussian_filter, grey_opening
+from rasterio.windows import Window
+from scipy.ndimage import gaussian_filter
+
+try:
+	from core import morphology
+except ImportError:  # python scripts/dtm_from_dsm.py ...
+	sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	from core import morphology
 
 
 # Usage: python scripts/dtm_from_dsm.py <DSM_utm.tif> <DTM_utm.tif> [--win_px 5] [--sigma 1.0] [--method min|open]
+#        [--progressive] [--slope 0.3] [--dh0 0.5] [--dh_max 3.0] [--block_px 1024] [--workers N]
 # Öneri: UTM'ye çevrilmiş DSM kullan; win_px ~ (hedef bastırılacak obje çapı / piksel_metre)
+#
+# DSM halo'lu bloklar halinde okunur (halo = morfoloji + gaussian erimi), bloklar süreç havuzunda işlenir ve
+# karolu çıktıya blok blok yazılır; bellek ~ (blok + 2·halo)² × eşzamanlı blok. Sonuç tam raster ile aynıdır.
+#
+# --progressive: ilerleyen pencereli morfolojik filtre (Zhang vd. 2003). Pencereler 3, 5, 9, 17, ... win_px;
+# her adımda bir önceki yüzey açılır, fark eşiği aşan pikseller zemin-dışı işaretlenir:
+#   dh_k = min(dh_max, dh0 + slope · (w_k − w_{k−1}) · piksel_m)
+# Zemin pikselleri DSM değerini korur (büyük pencere sırt/tepe kesmez), zemin-dışı olanlar son yüzeyden dolar.
+
+GAUSS_TRUNCATE = 4.0  # scipy gaussian_filter varsayılanı
+TILE_PX = 256
+
+
+def progressive_windows(win_px: int) -> List[int]:
+	"""3, 5, 9, 17, ... (2^k + 1) win_px'e kadar; son pencere win_px."""
+	ws, k = [], 1
+	while 2 ** k + 1 < win_px:
+		ws.append(2 ** k + 1)
+		k += 1
+	return ws + [win_px]
+
+
+def dtm_halo_px(win_px: int, sigma: float, method: str = 'open', progressive: bool = False) -> int:
+	"""Çekirdek pikselin sonucunu etkileyen en uzak komşu (piksel)."""
+	if progressive:
+		morph = sum(2 * (w // 2) for w in progressive_windows(win_px))
+	else:
+		morph = (2 if method == 'open' else 1) * (win_px // 2)
+	return morph + (int(math.ceil(GAUSS_TRUNCATE * sigma)) if sigma > 0 else 0)
+
+
+def progressive_opening(dsm: np.ndarray, win_px: int, cell_m: float, slope: float = 0.3,
+						dh0: float = 0.5, dh_max: float = 3.0) -> np.ndarray:
+	surface = dsm
+	nonground = np.zeros(dsm.shape, dtype=bool)
+	prev_w = 1
+	for w in progressive_windows(win_px):
+		opened = morphology.opening(surface, morphology.rect(w))
+		dh = min(dh_max, dh0 + slope * (w - prev_w) * cell_m)
+		nonground |= (surface - opened) > dh
+		surface, prev_w = opened, w
+	return np.where(nonground, surface, dsm)
+
 
+def dtm_from_array(dsm: np.ndarray, win_px: int = 5, sigma: float = 1.0, method: str = 'open',
+				   progressive: bool = False, cell_m: float = 1.0, slope: float = 0.3,
+				   dh0: float = 0.5, dh_max: float = 3.0) -> np.ndarray:
+	# Morfolojik taban (zemini yakalayıp çıkıntıları yok eder)
+	if progressive:
+		dtm = progressive_opening(dsm, win_px, cell_m, slope=slope, dh0=dh0, dh_max=dh_max)
+	elif method == 'min':
+		dtm = morphology.erosion(dsm, morphology.rect(win_px))
+	elif method == 'open':
+		# opening: erozyon + genişletme, yapısal eleman ~ win_px (core.morphology, maliyet win_px'ten bağımsız)
+		dtm = morphology.opening(dsm, morphology.rect(win_px))
+	else:
+		raise ValueError("method must be 'min' or 'open'")
 
-src_path, dst_path = sys.argv[1], sys.argv[2]
-win_px = int(next((sys.argv[i+1] for i,a in enumerate(sys.argv) if a=='--win_px'), 5))
-sigma = float(next((sys.argv[i+1] for i,a in enumerate(sys.argv) if a=='--sigma'), 1.0))
-method = str(next((sys.argv[i+1] for i,a in enumerate(sys.argv) if a=='--method'), 'open')).lower()
+	# Gürültü yumuşatma
+	if sigma > 0:
+		dtm = gaussian_filter(dtm, sigma=sigma, truncate=GAUSS_TRUNCATE)
+	return dtm.astype(np.float32)
 
 
-with rasterio.open(src_path) as src:
-	dsm = src.read(1).astype(np.float32)
-	meta = src.meta.copy(); meta.update(dtype='float32')
+def _dtm_block(job: dict) -> dict:
+	"""Tek blok (süreç havuzunda): halo'lu pencereyi okur, DTM'in çekirdek kısmını döndürür."""
+	t0 = time.perf_counter()
+	r0, r1, c0, c1 = job["core"]
+	halo = job["halo"]
+	with rasterio.open(job["src_path"]) as src:
+		hr0, hr1 = max(0, r0 - halo), min(src.height, r1 + halo)
+		hc0, hc1 = max(0, c0 - halo), min(src.width, c1 + halo)
+		dsm = src.read(1, window=Window.from_slices((hr0, hr1), (hc0, hc1))).astype(np.float32)
+	dtm = dtm_from_array(dsm, **job["params"])
+	return {
+		"core": job["core"],
+		"data": np.ascontiguousarray(dtm[r0 - hr0:r1 - hr0, c0 - hc0:c1 - hc0]),
+		"seconds": time.perf_counter() - t0,
+	}
 
 
-# Morfolojik taban (zemini yakalayıp çıkıntıları yok eder)
-if method == 'min':
-	dtm = minimum_filter(dsm, size=win_px)
-elif method == 'open':
-	# grey_opening: erozyon + genişletme, yapısal eleman ~ win_px
-	dtm = grey_opening(dsm, size=(win_px, win_px))
-else:
-	raise SystemExit("method must be 'min' or 'open'")
+def build_dtm(src_path: str, dst_path: str, win_px: int = 5, sigma: float = 1.0, method: str = 'open',
+			  progressive: bool = False, slope: float = 0.3, dh0: float = 0.5, dh_max: float = 3.0,
+			  block_px: int = 1024, max_workers: Optional[int] = None, progress: bool = False) -> dict:
+	"""
+	DSM → DTM, halo'lu bloklar halinde. max_workers=1 → havuzsuz, seri.
+	Dönüş: blok/piksel sayısı, süre, throughput (Mpx/s).
+	"""
+	if method not in ('min', 'open'):
+		raise ValueError("method must be 'min' or 'open'")
+	if block_px % 16:
+		raise ValueError("block_px must be a multiple of 16")
+	t0 = time.perf_counter()
+	with rasterio.open(src_path) as src:
+		H, W = src.height, src.width
+		cell_m = abs(src.res[0])
+		profile = src.profile.copy()
+	tile = math.gcd(block_px, TILE_PX)
+	profile.update(driver='GTiff', dtype='float32', tiled=True, blockxsize=tile, blockysize=tile,
+				   compress='deflate', predictor=3, BIGTIFF='IF_SAFER')
+	params = dict(win_px=win_px, sigma=sigma, method=method, progressive=progressive,
+				  cell_m=cell_m, slope=slope, dh0=dh0, dh_max=dh_max)
+	halo = dtm_halo_px(win_px, sigma, method, progressive)
+	jobs = [
+		{"core": (r, min(H, r + block_px), c, min(W, c + block_px)), "halo": halo,
+		 "src_path": src_path, "params": params}
+		for r in range(0, H, block_px) for c in range(0, W, block_px)
+	]
 
+	done = [0, 0.0, 0]  # blok, blok süresi toplamı, piksel
 
-# Gürültü yumuşatma
-if sigma > 0:
-	dtm = gaussian_filter(dtm, sigma=sigma)
+	def _write(dst, res: dict):
+		r0, r1, c0, c1 = res["core"]
+		dst.write(res["data"], 1, window=Window.from_slices((r0, r1), (c0, c1)))
+		done[0] += 1
+		done[1] += res["seconds"]
+		done[2] += (r1 - r0) * (c1 - c0)
+		if progress:
+			el = time.perf_counter() - t0
+			eta = el / done[2] * (H * W - done[2])
+			print(f"\r[{done[0]}/{len(jobs)}] {done[2] / max(el, 1e-9) / 1e6:.2f} Mpx/s, ETA {eta:.0f}s",
+				  end="", file=sys.stderr, flush=True)
 
+	workers = max_workers or os.cpu_count() or 1
+	with rasterio.open(dst_path, 'w', **profile) as dst:
+		if workers == 1:
+			for job in jobs:
+				_write(dst, _dtm_block(job))
+		else:
+			# Eşzamanlı blok sayısı sınırlı: sonuçlar yazıldıkça yeni blok gönderilir
+			with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+				inflight = set()
+				for job in jobs:
+					inflight.add(pool.submit(_dtm_block, job))
+					if len(inflight) >= 2 * workers:
+						finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+						for fut in finished:
+							_write(dst, fut.result())
+				for fut in as_completed(inflight):
+					_write(dst, fut.result())
+	if progress:
+		print(file=sys.stderr)
 
-with rasterio.open(dst_path, 'w', **meta) as dst:
-	dst.write(dtm.astype(np.float32), 1)
+	seconds = time.perf_counter() - t0
+	return {
+		"blocks": len(jobs),
+		"halo_px": halo,
+		"pixels": H * W,
+		"seconds": round(seconds, 3),
+		"block_seconds": round(done[1], 3),
+		"mpx_per_s": round(H * W / max(seconds, 1e-9) / 1e6, 3),
+	}
 
 
-print(f"DTM written: {dst_path}")
\ No newline at end of file
+if __name__ == "__main__":
+	src_path, dst_path = sys.argv[1], sys.argv[2]
+	arg = lambda name, default: next((sys.argv[i+1] for i, a in enumerate(sys.argv) if a == name), default)
+	stats = build_dtm(
+		src_path, dst_path,
+		win_px=int(arg('--win_px', 5)),
+		sigma=float(arg('--sigma', 1.0)),
+		method=str(arg('--method', 'open')).lower(),
+		progressive='--progressive' in sys.argv,
+		slope=float(arg('--slope', 0.3)),
+		dh0=float(arg('--dh0', 0.5)),
+		dh_max=float(arg('--dh_max', 3.0)),
+		block_px=int(arg('--block_px', 1024)),
+		max_workers=(int(arg('--workers', 0)) or None),
+		progress=True,
+	)
+	print(f"DTM written: {dst_path} ({stats['blocks']} blocks, halo {stats['halo_px']} px, "
+		  f"{stats['seconds']}s, {stats['mpx_per_s']} Mpx/s)")
@@ -1,19 +1,47 @@
 # scripts/lz_candidates.py
+import heapq
 import math
-from typing import Dict, Any, List, Tuple, Optional
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Dict, Any, Iterator, List, Tuple, Optional
 
 import numpy as np
 import rasterio
 from rasterio.crs import CRS
-from rasterio.features import shapes, rasterize
+from rasterio.features import shapes
 from rasterio.warp import transform as rio_transform
+from rasterio.windows import Window
 from shapely.geometry import shape, Polygon, mapping, Point
+from scipy import ndimage
 from scipy.ndimage import binary_dilation, binary_erosion, distance_transform_edt
+from scipy.spatial import cKDTree
+
+try:
+    from core.profiling import span
+except ImportError:  # scripts/ dizininden betik olarak çalıştırıldığında
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from core.profiling import span
 
 # ---- Varsayılan parametreler (M0 için makul)
 SLOPE_MAX_DEG = 12.0            # Eğim eşiği (derece)
 MIN_DIAMETER_M = 30.0           # Minimum iniş çapı (metre)
 DILATE_CELLS = 1                # Morfoloji adım sayısı (1 iyi başlangıç)
+TOP_K = 3                       # Döndürülen aday sayısı (varsayılan)
+NESTED_CROP_OVERHEAD_PX = 2500  # Çoklu uçak: kutu başı sabit maliyet, piksel cinsinden (bkz. _nested_regions)
+OBSTACLE_SLOPE_DEG = 30.0       # Bu eğimin üstü (ve geçersiz piksel) engel sayılır: duvar, yar, bina kenarı
+BATCH_BLOCK_FACTOR = 4          # Batch: örtüşen pencereler, ortak blok en büyük pencerenin bu katını geçmedikçe birleşir
+# Skor ağırlıkları (api/aircraft.PRESETS[...]["score_weights"] üzerine yazar; toplamın 1 olması gerekmez)
+SCORE_WEIGHTS: Dict[str, float] = {
+    "clear_diameter": 0.30,  # temiz çap / (2 × min çap), 1'de doyar
+    "slope_mean": 0.20,      # 1 − ortalama eğim / eğim eşiği
+    "slope_max": 0.10,       # 1 − en büyük eğim / eğim eşiği
+    "distance": 0.20,        # 1 − merkeze uzaklık / pencere
+    "obstacle": 0.10,        # en yakın engele uzaklık / min çap, 1'de doyar
+    "roughness": 0.10,       # 1 − eğim std / eğim eşiği
+}
 
 def slope_from_dem(dem: np.ndarray, xres_m: float, yres_m: float) -> np.ndarray:
     dzdx, dzdy = np.gradient(dem, xres_m, yres_m)
@@ -44,6 +72,409 @@ def _bbox_min_diameter_meters(poly: Polygon, crs, lat_ref: float) -> float:
         width_m, height_m = dx, dy
     return max(width_m, height_m)
 
+def _region_clear_radius(labels: np.ndarray, n: int, edt: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Etiket başına en büyük iç teğet daire yarıçapı (bölgedeki EDT maksimumu) ve o maksimumun ilk
+    pikselinin düz indeksi; tek geçiş, O(piksel). Dizi indeksi = etiket (0 = arka plan).
+    """
+    lab = labels.ravel()
+    e = edt.ravel()
+    radius = np.zeros(n + 1)
+    np.maximum.at(radius, lab, e)
+    hit = np.flatnonzero((lab > 0) & (e == radius[lab]))
+    ids, first = np.unique(lab[hit], return_index=True)
+    peak = np.zeros(n + 1, dtype=np.intp)
+    peak[ids] = hit[first]
+    return radius, peak
+
+def _obstacle_tree(obstacle: np.ndarray, px_m: Tuple[float, float]) -> Optional[cKDTree]:
+    """
+    Engel sınır piksellerinin (metre) KD-ağacı; engel yoksa None. Tam bir EDT yerine kullanılır:
+    en yakın engel her zaman sınırdadır, sorgu yalnızca bölge merkezleri kadar yapılır.
+    """
+    if not obstacle.any():
+        return None
+    edge = obstacle & ~binary_erosion(obstacle)
+    return cKDTree(np.argwhere(edge) * np.array([px_m[1], px_m[0]]))
+
+
+def region_stats(labels: np.ndarray, n: int, slope: np.ndarray, radius: np.ndarray, peak: np.ndarray,
+                 obstacle_tree: Optional[cKDTree], center_rc: Tuple[float, float], px_m: Tuple[float, float],
+                 which: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Bölge başına istatistikler (dizi indeksi = etiket), bincount ile tek geçişte:
+    alan (px), ortalama / en büyük / std eğim, temiz çap, iç teğet daire merkezinin istenen merkeze
+    ve en yakın engele uzaklığı (m; _obstacle_tree). Engel uzaklığı yalnızca which etiketleri için (diğerleri sonsuz).
+    Yalnızca etiketli pikseller taranır (düz pikseller, eğimleri sonlu).
+    """
+    lab = labels.ravel()
+    inside = lab > 0
+    lab, s = lab[inside], slope.ravel()[inside].astype(np.float64)
+    count = np.bincount(lab, minlength=n + 1)
+    nz = np.maximum(count, 1)
+    mean = np.bincount(lab, weights=s, minlength=n + 1) / nz
+    sq = np.bincount(lab, weights=s * s, minlength=n + 1) / nz
+    smax = np.zeros(n + 1)
+    np.maximum.at(smax, lab, s)
+    pr, pc = np.divmod(peak, labels.shape[1])
+    which = np.arange(1, n + 1) if which is None else which
+    obstacle_m = np.full(n + 1, np.inf)
+    if obstacle_tree is not None and len(which):
+        obstacle_m[which] = obstacle_tree.query(np.column_stack((pr[which] * px_m[1], pc[which] * px_m[0])))[0]
+    return {
+        "area_px": count,
+        "slope_mean": mean,
+        "slope_max": smax,
+        "roughness": np.sqrt(np.maximum(sq - mean * mean, 0.0)),
+        "clear_diameter": 2.0 * radius,
+        "distance": np.hypot((pr - center_rc[0]) * px_m[1], (pc - center_rc[1]) * px_m[0]),
+        "obstacle": obstacle_m,
+    }
+
+
+def score_regions(stats: Dict[str, np.ndarray], weights: Dict[str, float], slope_max_deg: float,
+                  min_diameter_m: float, window_m: float) -> np.ndarray:
+    """Bileşenler [0, 1]'e normalize edilir (1 = iyi), ağırlıklı ortalama skor döner."""
+    ref_d = max(min_diameter_m, 1e-6)
+    terms = {
+        "clear_diameter": np.minimum(stats["clear_diameter"] / (2.0 * ref_d), 1.0),
+        "slope_mean": 1.0 - stats["slope_mean"] / slope_max_deg,
+        "slope_max": 1.0 - stats["slope_max"] / slope_max_deg,
+        "distance": 1.0 - stats["distance"] / max(window_m, 1e-6),
+        "obstacle": np.minimum(stats["obstacle"] / ref_d, 1.0),
+        "roughness": 1.0 - stats["roughness"] / slope_max_deg,
+    }
+    w = {name: float(weights.get(name, 0.0)) for name in terms}
+    total = sum(w.values()) or 1.0
+    score = sum(w[name] * np.clip(t, 0.0, 1.0) for name, t in terms.items())
+    return score / total
+
+
+def top_k_regions(score: np.ndarray, clear_diameter: np.ndarray, candidates: np.ndarray, k: int) -> List[int]:
+    """En yüksek skorlu k bölge (eşitlikte temiz çap, sonra küçük etiket); heap ile O(n log k)."""
+    keyed = zip(score[candidates].tolist(), clear_diameter[candidates].tolist(), (-candidates).tolist())
+    return [-lab for _, _, lab in heapq.nlargest(k, keyed)]
+
+def _read_block(src, r0: int, r1: int, c0: int, c1: int,
+                prev: Optional[Tuple[np.ndarray, int, int]] = None) -> Tuple[np.ndarray, int, int]:
+    """
+    DEM'den [r0:r1, c0:c1] bloğunu float32 okur; (dizi, r0, c0) döndürür.
+    prev yeni bloğun içinde kalıyorsa örtüşen kısım kopyalanır, yalnızca çevre şeritler okunur.
+    """
+    out = np.empty((r1 - r0, c1 - c0), dtype=np.float32)
+    if prev is not None:
+        arr, pr0, pc0 = prev
+        pr1, pc1 = pr0 + arr.shape[0], pc0 + arr.shape[1]
+        if r0 <= pr0 and pr1 <= r1 and c0 <= pc0 and pc1 <= c1:
+            out[pr0 - r0:pr1 - r0, pc0 - c0:pc1 - c0] = arr
+            strips = [
+                (r0, pr0, c0, c1), (pr1, r1, c0, c1),      # üst / alt
+                (pr0, pr1, c0, pc0), (pr0, pr1, pc1, c1),  # sol / sağ
+            ]
+            for sr0, sr1, sc0, sc1 in strips:
+                if sr1 > sr0 and sc1 > sc0:
+                    win = Window.from_slices((sr0, sr1), (sc0, sc1))
+                    out[sr0 - r0:sr1 - r0, sc0 - c0:sc1 - c0] = src.read(1, window=win)
+            return out, r0, c0
+    out[:] = src.read(1, window=Window.from_slices((r0, r1), (c0, c1)))
+    return out, r0, c0
+
+def _crop_block(block: Optional[Tuple[np.ndarray, int, int]], r0: int, r1: int, c0: int, c1: int
+                ) -> Optional[Tuple[np.ndarray, int, int]]:
+    """Önceden okunmuş blok [r0:r1, c0:c1]'i kapsıyorsa o parçayı (görünüm) döndürür, yoksa None."""
+    if block is None:
+        return None
+    arr, br0, bc0 = block
+    if br0 <= r0 and r1 <= br0 + arr.shape[0] and bc0 <= c0 and c1 <= bc0 + arr.shape[1]:
+        return arr[r0 - br0:r1 - br0, c0 - bc0:c1 - bc0], r0, c0
+    return None
+
+
+def _window_bounds(row: int, col: int, window_m: float, px_m: Tuple[float, float], height: int, width: int
+                   ) -> Tuple[int, int, int, int]:
+    """Merkez pikseli etrafındaki pencere (r0, r1, c0, c1); yarı genişlik 8 px altına düşmez."""
+    half_wx = max(8, int(window_m / px_m[0]))
+    half_wy = max(8, int(window_m / px_m[1]))
+    return max(0, row - half_wy), min(height, row + half_wy), max(0, col - half_wx), min(width, col + half_wx)
+
+
+def _empty(meta: Dict[str, Any], **extra) -> Dict[str, Any]:
+    return {"type": "FeatureCollection", "features": [], "meta": {**meta, **extra}}
+
+
+def _morphology(flat: np.ndarray, morph: str) -> np.ndarray:
+    fm = flat.astype(bool)
+    if morph == "opening":
+        # ince bağlantıları kır, alanları parçalara ayır
+        for _ in range(DILATE_CELLS):
+            fm = binary_erosion(fm)
+        for _ in range(DILATE_CELLS):
+            fm = binary_dilation(fm)
+    else:
+        # varsayılan: closing (pütürleri toparlar, alanları birleştirir)
+        for _ in range(DILATE_CELLS):
+            fm = binary_dilation(fm)
+        for _ in range(DILATE_CELLS):
+            fm = binary_erosion(fm)
+    return fm
+
+
+def _terrain(src, dem_path: str, center_lat: float, center_lon: float, window_m: float,
+             slope_deg: float, slope_store=None, dem_block: Optional[Tuple[np.ndarray, int, int]] = None
+             ) -> Dict[str, Any]:
+    """
+    Adım 1-6: pencere + eğim (uçaktan bağımsız, çoklu uçakta bir kez). slope_deg yalnızca boş pencerede
+    büyütme kararı için kullanılır (çoklu uçakta en gevşek eşik). meta "reason" içeriyorsa aday üretilemez.
+    dem_block: önceden okunmuş DEM bloğu (dizi, r0, c0); pencere + halo içindeyse DEM okunmaz (batch).
+    """
+    transform = src.transform
+    crs = src.crs
+    nodata = src.nodata
+
+    # 1) WGS84 (lon/lat) -> DEM CRS dönüşümü
+    wgs84 = CRS.from_epsg(4326)
+    if crs is not None and crs != wgs84:
+        xs, ys = rio_transform(wgs84, crs, [center_lon], [center_lat])
+        cx, cy = xs[0], ys[0]
+    else:
+        cx, cy = center_lon, center_lat
+
+    # 2) Grid index
+    row, col = src.index(cx, cy)
+
+    # 3) Piksel boyutları (metre); 4326'da istek merkezinin enlemiyle — eğim karoları karo merkezini
+    #    kullanır, küçük farkı için bkz. scripts/slope_tiles.py
+    xres, yres = src.res
+    px_m_x, px_m_y = _compute_pixel_meters(crs, xres, yres, center_lat)
+
+    meta = {
+        "dem_path": dem_path,
+        "dem_crs": str(crs),
+        "center_wgs84": {"lat": center_lat, "lon": center_lon},
+        "center_dem_crs": {"x": cx, "y": cy},
+        "window_m": window_m,
+    }
+    block: Optional[Tuple[np.ndarray, int, int]] = None
+    while True:
+        # 4) Pencereyi piksele çevir (8 px altına düşmesin)
+        r0, r1, c0, c1 = _window_bounds(row, col, window_m, (px_m_x, px_m_y), src.height, src.width)
+        if (r1 - r0) < 5 or (c1 - c0) < 5:
+            return {"meta": {**meta, "window_m": window_m, "reason": "window too small in pixels"}}
+
+        sub_transform = rasterio.transform.Affine(
+            transform.a, transform.b, transform.c + c0 * transform.a,
+            transform.d, transform.e, transform.f + r0 * transform.e
+        )
+
+        if slope_store is not None:
+            # 5-6) Önceden hesaplanmış eğim karoları (geçersiz piksel = NaN)
+            with span("lz.slope_tiles", pixels=(r1 - r0) * (c1 - c0)):
+                slope = slope_store.window(r0, r1, c0, c1)
+                valid = np.isfinite(slope)
+        else:
+            # 5) Yalnızca pencere + 1 px halo okunur (np.gradient kenarları için);
+            #    önceki okuma varsa sadece eksik şeritler okunur
+            hr0, hr1 = max(0, r0 - 1), min(src.height, r1 + 1)
+            hc0, hc1 = max(0, c0 - 1), min(src.width, c1 + 1)
+            with span("lz.read", pixels=(hr1 - hr0) * (hc1 - hc0)):
+                block = _crop_block(dem_block, hr0, hr1, hc0, hc1) or _read_block(src, hr0, hr1, hc0, hc1, prev=block)
+            dem_halo = block[0]
+            dem_win = dem_halo[r0 - hr0:r1 - hr0, c0 - hc0:c1 - hc0]
+
+            # 6) Maskeler + eğim
+            with span("lz.slope", pixels=dem_halo.size):
+                valid = (dem_win != nodata) & np.isfinite(dem_win) if nodata is not None else np.isfinite(dem_win)
+                slope = slope_from_dem(dem_halo, px_m_x, px_m_y)[r0 - hr0:r1 - hr0, c0 - hc0:c1 - hc0]
+                slope[~valid] = np.nan
+
+        if not ((slope < slope_deg) & valid).any() and window_m < 2000.0:
+            # bir kez daha büyük pencerede dene (okunan tampon genişletilerek)
+            window_m = 2000.0
+            continue
+        break
+
+    return {
+        "meta": {**meta, "window_m": window_m},
+        "slope": slope,
+        "valid": valid,
+        "valid_px": int(valid.sum()),
+        "window_m": window_m,
+        "crs": crs,
+        "center_lat": center_lat,
+        "center_rc": (row - r0, col - c0),
+        "px_m": (px_m_x, px_m_y),
+        "sub_transform": sub_transform,
+    }
+
+
+def _nested_regions(flat: np.ndarray, morph: str, nest: Dict[str, Any], sampling: Tuple[float, float]
+                    ) -> Tuple[np.ndarray, int, np.ndarray]:
+    """
+    flat: morfoloji öncesi düz maske; bu uçağın eşikleri daha gevşek bir uçağınkinin içinde (eğim eşiği ≤,
+    min çap ≥). Morfoloji monoton ve alt kümenin EDT'si küçük olduğundan geçen bölgeler yalnızca gevşek
+    uçağın geçen bölgelerinin içinde olabilir. Morfoloji + etiket + EDT bu bölgelerin kutularında
+    (morfoloji erimi kadar paylı) yapılır; kutu başı sabit maliyet (NESTED_CROP_OVERHEAD_PX) dahil toplam
+    pencereden büyükse tek geçişte, dışarısı maskelenerek. Diğer bileşenlerin sıfırlanması EDT'yi
+    değiştirmez (en yakın sıfır, başka bileşenin pikselinden her zaman daha yakındır).
+    Etiketler tam pencere etiketlemesiyle aynı (raster) sırada numaralanır.
+    """
+    H, W = flat.shape
+    nest_labels, passing = nest["labels"], nest["passing"]
+    objs = ndimage.find_objects(nest_labels)
+    pad = 2 * DILATE_CELLS  # closing/opening erimi: bu kadar içerideki pikseller tam pencere ile aynı
+    crops = []
+    for k in passing:
+        sr, sc = objs[k - 1]
+        crops.append((k, slice(max(0, sr.start - pad), min(H, sr.stop + pad)),
+                      slice(max(0, sc.start - pad), min(W, sc.stop + pad))))
+    cost = sum((sr.stop - sr.start) * (sc.stop - sc.start) + NESTED_CROP_OVERHEAD_PX for _, sr, sc in crops)
+    if cost > flat.size:
+        keep = np.zeros(len(objs) + 1, dtype=bool)
+        keep[passing] = True
+        fm = _morphology(flat, morph) & keep[nest_labels]
+        labels, n = ndimage.label(fm)
+        return labels, n, distance_transform_edt(fm, sampling=sampling)
+
+    labels = np.zeros(flat.shape, dtype=np.int32)
+    edt = np.zeros(flat.shape, dtype=np.float64)
+    n = 0
+    for k, sr, sc in crops:
+        m = _morphology(flat[sr, sc], morph) & (nest_labels[sr, sc] == k)
+        lab, nk = ndimage.label(m)
+        if nk == 0:
+            continue
+        labels[sr, sc][m] = lab[m] + n
+        edt[sr, sc][m] = distance_transform_edt(m, sampling=sampling)[m]
+        n += nk
+    if n > 1:
+        # raster sırasına göre yeniden numaralandır (eşitlik kırıcı küçük etiket tam pencere ile aynı kalsın)
+        lab = labels.ravel()
+        idx = np.flatnonzero(lab)
+        _, first = np.unique(lab[idx], return_index=True)
+        remap = np.zeros(n + 1, dtype=np.int32)
+        remap[np.argsort(first) + 1] = np.arange(1, n + 1, dtype=np.int32)
+        labels = remap[labels]
+    return labels, n, edt
+
+
+def _evaluate(t: Dict[str, Any], SLOPE: float, MIN_DIA: float, morph: str, top_k: int,
+              weights: Dict[str, float], nest: Optional[Dict[str, Any]] = None
+              ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Adım 7-12: tek eşik çifti (eğim, min çap) için adaylar. nest: daha gevşek bir uçağın durumu (bkz.
+    _nested_regions). Dönüş: (FeatureCollection, sonraki uçaklar için durum).
+    """
+    slope, valid, window_m = t["slope"], t["valid"], t["window_m"]
+    px_m_x, px_m_y = t["px_m"]
+    flat = (slope < SLOPE) & valid
+    flat_px = int(flat.sum())
+    if flat_px == 0:
+        return _empty(t["meta"], valid_pixels=t["valid_px"], flat_pixels=flat_px,
+                      reason="no flat pixels under slope threshold"), None
+
+    # 7-8) Morfoloji, bağlı düz bölgeler (4-komşuluk, shapes ile aynı) + EDT → bölge başına temiz yarıçap
+    #      Not: edt sampling row->px_m_y, col->px_m_x. nest varsa yalnızca gevşek uçağın geçen bölgelerinde.
+    if nest is None:
+        with span("lz.morphology", pixels=flat.size):
+            flat = _morphology(flat, morph)
+    with span("lz.regions", pixels=flat.size, nested=nest is not None) as rec:
+        if nest is not None:
+            labels, n_regions, edt = _nested_regions(flat, morph, nest, (px_m_y, px_m_x))
+        else:
+            labels, n_regions = ndimage.label(flat)
+            edt = distance_transform_edt(flat, sampling=(px_m_y, px_m_x))
+        radius, peak = _region_clear_radius(labels, n_regions, edt)
+        passing = np.flatnonzero(2.0 * radius[1:] >= MIN_DIA) + 1
+        rec["regions"] = n_regions
+
+    # 9) Temiz çap filtresi (ince uzun sırtlar bbox testinden geçebiliyordu) + bölge istatistikleri + skor
+    #    Engel: dik (≥ OBSTACLE_SLOPE_DEG) ya da geçersiz piksel — duvar, yar, bina kenarı
+    with span("lz.score", regions=n_regions, passing=len(passing)):
+        if "obstacle_tree" not in t and len(passing):
+            # ilk skorlamada kurulur, uçaklar arasında ortak
+            t["obstacle_tree"] = _obstacle_tree(~(slope < OBSTACLE_SLOPE_DEG), t["px_m"])
+        stats = region_stats(labels, n_regions, slope, radius, peak, t.get("obstacle_tree"),
+                             t["center_rc"], t["px_m"], which=passing)
+        score = score_regions(stats, weights, SLOPE, MIN_DIA, window_m)
+
+        # 10) En iyi top_k aday (heap)
+        top = top_k_regions(score, stats["clear_diameter"], passing, max(0, int(top_k)))
+
+    # 11) Yalnızca seçilen bölgeler poligonlaştırılır (değer = etiket)
+    sub_transform = t["sub_transform"]
+    polys: Dict[int, Polygon] = {}
+    with span("lz.polygonize", pixels=flat.size, candidates=len(top)):
+        if top:
+            keep = np.zeros(n_regions + 1, dtype=bool)
+            keep[top] = True
+            for geom, val in shapes(labels.astype(np.int32), mask=keep[labels], transform=sub_transform):
+                polys[int(val)] = shape(geom)
+
+    # 12) Alan ve iç teğet daire merkezi feature'ları
+    pixel_area = px_m_x * px_m_y
+    area_features: List[Dict[str, Any]] = []
+    center_features: List[Dict[str, Any]] = []
+    for i, k in enumerate(top, 1):
+        p = polys[k]
+        radius_m = float(radius[k])  # zaten metre cinsinden
+        obstacle_m = float(stats["obstacle"][k])
+        area_features.append({
+            "type": "Feature",
+            "properties": {
+                "id": f"LZ-{i}",
+                "rank": i,
+                "score": round(float(score[k]), 4),
+                "clear_diameter_m": 2.0 * radius_m,
+                "bbox_diameter_m": float(_bbox_min_diameter_meters(p, t["crs"], t["center_lat"])),
+                "area_m2": round(float(stats["area_px"][k]) * pixel_area, 2),
+                "slope_mean_deg": round(float(stats["slope_mean"][k]), 2),
+                "slope_peak_deg": round(float(stats["slope_max"][k]), 2),
+                "roughness_deg": round(float(stats["roughness"][k]), 2),
+                "distance_m": round(float(stats["distance"][k]), 1),
+                "obstacle_dist_m": round(obstacle_m, 1) if math.isfinite(obstacle_m) else None,
+                "min_clear_diameter_m": MIN_DIA,
+                "window_m": window_m,
+            },
+            "geometry": mapping(p),
+        })
+        # pixel merkezini koordinata çevir
+        r, c = divmod(int(peak[k]), flat.shape[1])
+        x, y = sub_transform * (c + 0.5, r + 0.5)
+        center_features.append({
+            "type": "Feature",
+            "properties": {
+                "id": f"LZ-CENTER-{i}",
+                "rank": i,
+                "score": round(float(score[k]), 4),
+                "clear_radius_m": radius_m,
+                "clear_diameter_m": 2.0 * radius_m,
+                "window_m": window_m,
+            },
+            "geometry": mapping(Point(x, y)),
+        })
+
+    fc = {
+        "type": "FeatureCollection",
+        # önce alanlar, sonra merkezler (UI'da sıraya göre çizmek istersen)
+        "features": area_features + center_features,
+        "meta": {
+            **t["meta"],
+            "count": len(area_features),
+            "valid_pixels": t["valid_px"],
+            "flat_pixels": flat_px,
+            "regions": n_regions,
+            "regions_passing": int(len(passing)),
+            "top_k": int(top_k),
+            "score_weights": weights,
+            "slope_max_deg": SLOPE,
+            "morph": morph,
+        },
+    }
+    state = {"slope_max_deg": SLOPE, "min_diameter_m": MIN_DIA, "labels": labels, "passing": passing,
+             "passing_px": int(stats["area_px"][passing].sum())}
+    return fc, state
+
+
 def main(
     dem_path: str,
     center_lat: float,
@@ -52,190 +483,259 @@ def main(
     slope_max_deg: Optional[float] = None,   # isteğe bağlı override
     min_diameter_m: Optional[float] = None,  # isteğe bağlı override
     morph: str = "closing",                  # "closing" | "opening"
+    dataset=None,                            # açık DEM handle'ı (API registry); verilmezse dem_path açılır
+    slope_store=None,                        # scripts/slope_tiles.SlopeTileStore; verilirse eğim karolardan okunur
+    top_k: int = TOP_K,                      # döndürülecek aday sayısı
+    score_weights: Optional[Dict[str, float]] = None,  # SCORE_WEIGHTS üzerine yazılır (ör. uçak preset'i)
+    dem_block=None,                          # önceden okunmuş DEM bloğu (dizi, r0, c0); bkz. _terrain
 ) -> Dict[str, Any]:
     """
     DEM üzerinde center_lat/lon etrafında window_m pencerede eğimi küçük (flat) poligonları bulur.
+    Bölgeler region_stats + score_regions ile skorlanır, en iyi top_k tanesi döner.
     GeoJSON FeatureCollection döndürür.
     """
+    SLOPE = slope_max_deg if slope_max_deg is not None else SLOPE_MAX_DEG
+    MIN_DIA = min_diameter_m if min_diameter_m is not None else MIN_DIAMETER_M
+    with (nullcontext(dataset) if dataset is not None else rasterio.open(dem_path)) as src:
+        t = _terrain(src, dem_path, center_lat, center_lon, window_m, SLOPE, slope_store, dem_block)
+        if "reason" in t["meta"]:
+            return _empty(t["meta"])
+        fc, _ = _evaluate(t, SLOPE, MIN_DIA, morph, top_k, {**SCORE_WEIGHTS, **(score_weights or {})})
+    if "reason" not in fc["meta"]:
+        fc["meta"]["slope_source"] = "tiles" if slope_store is not None else "dem"
+    return fc
+
+
+def main_multi(
+    dem_path: str,
+    center_lat: float,
+    center_lon: float,
+    aircraft: List[Dict[str, Any]],
+    window_m: float = 1200.0,
+    morph: str = "closing",
+    dataset=None,
+    slope_store=None,
+    top_k: int = TOP_K,
+) -> Dict[str, Any]:
+    """
+    Birden çok uçak için tek arazi geçişi: pencere + eğim bir kez hesaplanır, her uçağın adayları bu ortak
+    dizilerden kendi eşikleriyle çıkarılır. aircraft: [{"code", "slope_max_deg", "min_diameter_m",
+    opsiyonel "score_weights"}, ...]. Uçaklar en gevşekten en sıkıya işlenir; sıkı bir uçak, kendisini
+    kapsayan (eğim eşiği ≥, min çap ≤) bir önceki uçağın geçen bölgeleriyle sınırlanır (_nested_regions).
+    Dönüş: {"results": [uçak sırasıyla {"aircraft": code, FeatureCollection}], "meta": ortak}.
+    Her uçağın sonucu tek başına main() ile aynıdır: ortak pencerede kendi eşiğinde düz piksel olmayan uçak,
+    main() gibi pencereyi büyütür (ayrı arazi geçişi, iç içe sınırlama olmadan).
+    """
+    specs = [
+        (a.get("code"),
+         float(a["slope_max_deg"]) if a.get("slope_max_deg") is not None else SLOPE_MAX_DEG,
+         float(a["min_diameter_m"]) if a.get("min_diameter_m") is not None else MIN_DIAMETER_M,
+         {**SCORE_WEIGHTS, **(a.get("score_weights") or {})})
+        for a in aircraft
+    ]
+    order = sorted(range(len(specs)), key=lambda i: (-specs[i][1], specs[i][2]))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(specs)
+    with (nullcontext(dataset) if dataset is not None else rasterio.open(dem_path)) as src:
+        t = _terrain(src, dem_path, center_lat, center_lon, window_m,
+                     max((s[1] for s in specs), default=SLOPE_MAX_DEG), slope_store)
+        done: List[Tuple[Any, Dict[str, Any]]] = []
+        for i in order:
+            code, SLOPE, MIN_DIA, weights = specs[i]
+            if "reason" in t["meta"]:
+                results[i] = {"aircraft": code, **_empty(t["meta"])}
+                continue
+            parent = None
+            if t["window_m"] < 2000.0 and not ((t["slope"] < SLOPE) & t["valid"]).any():
+                # main() bu eşikte pencereyi büyütürdü
+                ti = _terrain(src, dem_path, center_lat, center_lon, window_m, SLOPE, slope_store)
+            else:
+                ti = t
+                # kapsayan uçaklardan geçen alanı en küçük olanı (iş miktarı bu alanla orantılı)
+                parents = [d for d in done if d[1]["slope_max_deg"] >= SLOPE and d[1]["min_diameter_m"] <= MIN_DIA]
+                parent = min(parents, key=lambda d: d[1]["passing_px"], default=None)
+            if "reason" in ti["meta"]:
+                results[i] = {"aircraft": code, **_empty(ti["meta"])}
+                continue
+            with span("lz.aircraft", code=code, nested=parent is not None):
+                fc, state = _evaluate(ti, SLOPE, MIN_DIA, morph, top_k, weights,
+                                      nest=parent[1] if parent else None)
+            if "reason" not in fc["meta"]:
+                fc["meta"]["slope_source"] = "tiles" if slope_store is not None else "dem"
+            fc["meta"]["nested_in"] = parent[0] if parent else None
+            if state is not None and ti is t:
+                done.append((code, state))
+            results[i] = {"aircraft": code, **fc}
+    return {
+        "results": results,
+        "meta": {
+            **t["meta"],
+            "aircraft": [s[0] for s in specs],
+            "morph": morph,
+            "top_k": int(top_k),
+            "slope_source": "tiles" if slope_store is not None else "dem",
+        },
+    }
+
+
+# ---- Toplu (batch) çalıştırma: çok merkez, süreç havuzu
+
+_WORKER_STORES: Dict[str, Any] = {}
+
+
+def _batch_worker(job: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Süreç havuzunda tek iş (örtüşen pencereli merkez grubu): ortak DEM bloğu bir kez okunur, her merkez
+    main() ile bu bloktan hesaplanır. Eğim karo deposu süreç başına bir kez yüklenir; depo varsa blok okunmaz.
+    Dönüş job["centers"] sırasıyla sonuçlar; hatalı merkez {"error": "..."} alır.
+    """
+    store = None
+    tiles_dir = job.get("slope_tiles_dir")
+    if tiles_dir:
+        if tiles_dir not in _WORKER_STORES:
+            try:
+                from scripts.slope_tiles import load_store
+            except ImportError:
+                from slope_tiles import load_store  # type: ignore
+            _WORKER_STORES[tiles_dir] = load_store(tiles_dir, job["dem_path"])
+        store = _WORKER_STORES[tiles_dir]
+    out: List[Dict[str, Any]] = []
+    with rasterio.open(job["dem_path"]) as src:
+        block = None
+        if store is None and len(job["centers"]) > 1:
+            r0, r1, c0, c1 = job["block"]
+            with span("lz.batch_read", pixels=(r1 - r0) * (c1 - c0)):
+                block = _read_block(src, r0, r1, c0, c1)
+        for c in job["centers"]:
+            try:
+                out.append(main(
+                    job["dem_path"], c["lat"], c["lon"],
+                    window_m=job["window_m"],
+                    slope_max_deg=c["slope_max_deg"],
+                    min_diameter_m=c["min_diameter_m"],
+                    morph=job["morph"],
+                    dataset=src,
+                    slope_store=store,
+                    top_k=job.get("top_k", TOP_K),
+                    score_weights=c.get("score_weights"),
+                    dem_block=block,
+                ))
+            except Exception as e:
+                out.append({"error": str(e)})
+    return out
+
+
+def plan_batch(
+    dem_path: str,
+    centers: List[Dict[str, Any]],
+    window_m: float = 1200.0,
+    morph: str = "closing",
+    top_k: int = TOP_K,
+) -> List[Tuple[List[int], Dict[str, Any]]]:
+    """
+    Merkezleri işlere çevirir. Pencereleri örtüşen merkezler tek işte toplanır: DEM bloğu (pencerelerin
+    halo dahil birleşimi) bir kez okunur, sonuçlar merkez başına ayrı hesaplanır (tek main() çağrısıyla aynı).
+    Birleşik blok en büyük pencerenin BATCH_BLOCK_FACTOR katını aşacaksa yeni iş açılır (bellek + paralellik).
+    Aynı DEM pikseline düşen ve eşikleri aynı olan merkezler tek sonucu paylaşır.
+    Dönüş: [(işteki merkez indeksleri, iş), ...]; iş["centers"] = [{"idxs", "lat", "lon", eşikler}, ...]
+    centers: {"lat", "lon", opsiyonel "slope_max_deg", "min_diameter_m", "score_weights"}
+    """
     with rasterio.open(dem_path) as src:
-        dem = src.read(1).astype(np.float32)
-        transform = src.transform
         crs = src.crs
-        nodata = src.nodata
-
-        # 1) WGS84 (lon/lat) -> DEM CRS dönüşümü
+        H, W = src.height, src.width
+        xres, yres = src.res
+        lons = [float(c["lon"]) for c in centers]
+        lats = [float(c["lat"]) for c in centers]
         wgs84 = CRS.from_epsg(4326)
-        if crs is not None and crs != wgs84:
-            xs, ys = rio_transform(wgs84, crs, [center_lon], [center_lat])
-            cx, cy = xs[0], ys[0]
+        if crs is not None and crs != wgs84 and centers:
+            xs, ys = rio_transform(wgs84, crs, lons, lats)
         else:
-            cx, cy = center_lon, center_lat
+            xs, ys = lons, lats
+        rows, cols = rasterio.transform.rowcol(src.transform, xs, ys)
 
-        # 2) Grid index
-        row, col = src.index(cx, cy)
+    # 1) Aynı piksel + aynı eşikler → tek sonuç
+    uniq: Dict[tuple, Dict[str, Any]] = {}
+    for i, c in enumerate(centers):
+        slope = c.get("slope_max_deg")
+        dia = c.get("min_diameter_m")
+        weights = c.get("score_weights")
+        key = (int(rows[i]), int(cols[i]), slope, dia, tuple(sorted((weights or {}).items())))
+        if key in uniq:
+            uniq[key]["idxs"].append(i)
+            continue
+        # _terrain ile aynı pencere + 1 px halo
+        px_m = _compute_pixel_meters(crs, xres, yres, lats[i])
+        r0, r1, c0, c1 = _window_bounds(int(rows[i]), int(cols[i]), window_m, px_m, H, W)
+        uniq[key] = {"idxs": [i], "lat": lats[i], "lon": lons[i], "slope_max_deg": slope,
+                     "min_diameter_m": dia, "score_weights": weights,
+                     "_box": (max(0, r0 - 1), min(H, r1 + 1), max(0, c0 - 1), min(W, c1 + 1))}
 
-        # 3) Piksel boyutları (metre)
-        xres, yres = src.res
-        px_m_x, px_m_y = _compute_pixel_meters(crs, xres, yres, center_lat)
+    # 2) Örtüşen pencereleri açgözlü grupla (satır, sütun sırasıyla)
+    groups: List[Tuple[List[int], List[Dict[str, Any]]]] = []  # (blok, merkezler)
+    for u in sorted(uniq.values(), key=lambda u: (u["_box"][0], u["_box"][2])):
+        r0, r1, c0, c1 = u.pop("_box")
+        area = (r1 - r0) * (c1 - c0)
+        for g in groups:
+            b, members = g
+            if r0 < b[1] and b[0] < r1 and c0 < b[3] and b[2] < c1:
+                nb = [min(b[0], r0), max(b[1], r1), min(b[2], c0), max(b[3], c1)]
+                if (nb[1] - nb[0]) * (nb[3] - nb[2]) <= BATCH_BLOCK_FACTOR * max(area, b[4]):
+                    b[:] = nb + [max(area, b[4])]
+                    members.append(u)
+                    break
+        else:
+            groups.append(([r0, r1, c0, c1, area], [u]))
 
-        # 4) Pencereyi piksele çevir (8 px altına düşmesin)
-        half_wx = max(8, int(window_m / px_m_x))
-        half_wy = max(8, int(window_m / px_m_y))
+    return [
+        (sorted(i for m in members for i in m["idxs"]), {
+            "dem_path": dem_path,
+            "window_m": window_m,
+            "morph": morph,
+            "top_k": top_k,
+            "block": tuple(b[:4]),
+            "centers": members,
+        })
+        for b, members in groups
+    ]
 
-        r0, r1 = max(0, row - half_wy), min(dem.shape[0], row + half_wy)
-        c0, c1 = max(0, col - half_wx), min(dem.shape[1], col + half_wx)
-        if (r1 - r0) < 5 or (c1 - c0) < 5:
-            return {
-                "type": "FeatureCollection",
-                "features": [],
-                "meta": {
-                    "dem_path": dem_path,
-                    "dem_crs": str(crs),
-                    "center_wgs84": {"lat": center_lat, "lon": center_lon},
-                    "center_dem_crs": {"x": cx, "y": cy},
-                    "window_m": window_m,
-                    "reason": "window too small in pixels",
-                },
-            }
-
-        # 5) Alt pencere, transform
-        dem_win = dem[r0:r1, c0:c1]
-        sub_transform = rasterio.transform.Affine(
-            transform.a, transform.b, transform.c + c0 * transform.a,
-            transform.d, transform.e, transform.f + r0 * transform.e
-        )
 
-        # 6) Maskeler + eğim
-        valid = (dem_win != nodata) & np.isfinite(dem_win) if nodata is not None else np.isfinite(dem_win)
-        slope = slope_from_dem(dem_win, px_m_x, px_m_y)
-        slope[~valid] = np.nan
-
-        SLOPE = slope_max_deg if slope_max_deg is not None else SLOPE_MAX_DEG
-        flat = (slope < SLOPE) & valid
-
-        valid_px = int(valid.sum())
-        flat_px  = int(np.nansum(flat))
-
-        if flat_px == 0 and window_m < 2000.0:
-            # bir kez daha büyük pencerede dene
-            return main(
-                dem_path, center_lat, center_lon,
-                window_m=2000.0,
-                slope_max_deg=slope_max_deg,
-                min_diameter_m=min_diameter_m,
-                morph=morph,
-            )
-        if flat_px == 0:
-            return {
-                "type": "FeatureCollection",
-                "features": [],
-                "meta": {
-                    "dem_path": dem_path,
-                    "dem_crs": str(crs),
-                    "center_wgs84": {"lat": center_lat, "lon": center_lon},
-                    "center_dem_crs": {"x": cx, "y": cy},
-                    "window_m": window_m,
-                    "valid_pixels": valid_px,
-                    "flat_pixels": flat_px,
-                    "reason": "no flat pixels under slope threshold",
-                },
-            }
-
-        # 7) Morfoloji
-        fm = flat.astype(bool)
-        if morph == "opening":
-            # ince bağlantıları kır, alanları parçalara ayır
-            for _ in range(DILATE_CELLS):
-                fm = binary_erosion(fm)
-            for _ in range(DILATE_CELLS):
-                fm = binary_dilation(fm)
-        else:
-            # varsayılan: closing (pütürleri toparlar, alanları birleştirir)
-            for _ in range(DILATE_CELLS):
-                fm = binary_dilation(fm)
-            for _ in range(DILATE_CELLS):
-                fm = binary_erosion(fm)
-        flat = fm
-
-        # 8) Poligon çıkarımı
-        polys: List[Polygon] = []
-        for geom, val in shapes(flat.astype(np.uint8), mask=flat, transform=sub_transform):
-            if val == 1:
-                polys.append(shape(geom))
-
-        # 9) Metre bazlı diameter filtresi
-        MIN_DIA = min_diameter_m if min_diameter_m is not None else MIN_DIAMETER_M
-        candidates: List[Polygon] = []
-        for p in polys:
-            dia_m = _bbox_min_diameter_meters(p, crs, center_lat)
-            if dia_m >= MIN_DIA:
-                candidates.append(p)
-
-        # 10) En büyük 3 adayı sırala
-        candidates = sorted(candidates, key=lambda p: p.area, reverse=True)[:3]
-
-        # 11) EDT ile iç teğet daire merkezleri (her aday için)
-        #     Not: edt sampling row->px_m_y, col->px_m_x
-        edt = distance_transform_edt(flat, sampling=(px_m_y, px_m_x))
-
-        center_features: List[Dict[str, Any]] = []
-        for i, p in enumerate(candidates, 1):
-            # Poligonu tüm pencere üzerine rasterize et (1=polygon içi)
-            poly_mask = rasterize(
-                [(mapping(p), 1)],
-                out_shape=dem_win.shape,
-                transform=sub_transform,
-                fill=0,
-                dtype=np.uint8
-            )
-            edt_masked = np.where(poly_mask == 1, edt, 0.0)
-            r, c = np.unravel_index(np.argmax(edt_masked), edt_masked.shape)
-            radius_m = float(edt_masked[r, c])  # zaten metre cinsinden
-            # pixel merkezini koordinata çevir
-            x, y = sub_transform * (c + 0.5, r + 0.5)
-
-            center_props = {
-                "id": f"LZ-CENTER-{i}",
-                "clear_radius_m": radius_m,
-                "clear_diameter_m": 2.0 * radius_m,
-                "window_m": window_m,
-            }
-            center_features.append({
-                "type": "Feature",
-                "properties": center_props,
-                "geometry": mapping(Point(x, y)),
-            })
-
-        # 12) Poligon feature'ları
-        area_features: List[Dict[str, Any]] = []
-        for i, p in enumerate(candidates, 1):
-            props = {
-                "id": f"LZ-{i}",
-                "bbox_diameter_m": float(_bbox_min_diameter_meters(p, crs, center_lat)),
-                "min_clear_diameter_m": MIN_DIA,
-                "window_m": window_m,
-            }
-            area_features.append({
-                "type": "Feature",
-                "properties": props,
-                "geometry": mapping(p),
-            })
-
-        # 13) Dönüş
-        return {
-            "type": "FeatureCollection",
-            # önce alanlar, sonra merkezler (UI'da sıraya göre çizmek istersen)
-            "features": area_features + center_features,
-            "meta": {
-                "dem_path": dem_path,
-                "dem_crs": str(crs),
-                "center_wgs84": {"lat": center_lat, "lon": center_lon},
-                "center_dem_crs": {"x": cx, "y": cy},
-                "window_m": window_m,
-                "count": len(area_features),
-                "valid_pixels": valid_px,
-                "flat_pixels": flat_px,
-                "slope_max_deg": SLOPE,
-                "morph": morph,
-            },
-        }
+def iter_candidates_batch(
+    dem_path: str,
+    centers: List[Dict[str, Any]],
+    window_m: float = 1200.0,
+    morph: str = "closing",
+    slope_tiles_dir: Optional[str] = None,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+    top_k: int = TOP_K,
+) -> Iterator[Tuple[List[int], Dict[str, Any]]]:
+    """
+    Çok merkez için main()'i süreç havuzuna dağıtır; her iş bittikçe (merkez indeksleri, sonuç) üretir.
+    executor verilmezse çekirdek sayısı kadar süreçli geçici bir havuz açılır.
+    Hatalı işler {"error": "..."} sonucu ile döner, diğerleri etkilenmez.
+    Üreteç erken kapanırsa (istemci ayrıldı) başlamamış işler iptal edilir; havuz paylaşımlı olsa da.
+    """
+    plan = plan_batch(dem_path, centers, window_m=window_m, morph=morph, top_k=top_k)
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    futures = {}
+    try:
+        for _, job in plan:
+            job["slope_tiles_dir"] = slope_tiles_dir
+            futures[executor.submit(_batch_worker, job)] = job["centers"]
+        for fut in as_completed(futures):
+            members = futures[fut]
+            try:
+                results = fut.result()
+            except Exception as e:
+                results = [{"error": str(e)}] * len(members)
+            for m, result in zip(members, results):
+                yield m["idxs"], result
+    finally:
+        for fut in futures:
+            fut.cancel()  # bitmiş/koşan işte etkisiz
+        if own:
+            executor.shutdown(wait=False, cancel_futures=True)
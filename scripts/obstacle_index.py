@@ -0,0 +1,214 @@
+# scripts/obstacle_index.py
+"""
+Önceden hesaplanmış engel indeksi (SQLite + R-tree).
+
+Üretim (offline, tüm kapsama alanı bloklar halinde):
+    python scripts/obstacle_index.py <DSM_utm.tif> <out.sqlite> [--dtm DTM_utm.tif] [--min_h 2.0]
+        [--smooth_sigma 1.0] [--block_px 1024] [--workers N]
+
+Engeller core.raster.iter_obstacles_chunked ile çıkarılır (dikişler birleştirilmiş); her engel
+bir satırdır: yükseklik kolonları + WKB geometri, sınırlayıcı kutusu R-tree tablosunda.
+meta tablosu DSM/DTM kimliğini (yol + mtime + boyut) ve min_h / smooth_sigma'yı tutar; API
+indeksi yalnızca bunlar istekle eşleşiyorsa kullanır, aksi halde engelleri canlı hesaplar.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+try:
+    from core.raster import iter_obstacles_chunked
+except ImportError:  # python scripts/obstacle_index.py ...
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from core.raster import iter_obstacles_chunked
+
+PROP_COLUMNS = ("height_m", "height_p95_m", "height_mean_m", "area_m2", "pixel_count", "source")
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE obstacles (
+    id INTEGER PRIMARY KEY,
+    height_m REAL, height_p95_m REAL, height_mean_m REAL,
+    area_m2 REAL, pixel_count INTEGER, source TEXT,
+    geom BLOB NOT NULL
+);
+CREATE VIRTUAL TABLE obstacles_rtree USING rtree(id, minx, maxx, miny, maxy);
+"""
+
+
+def _identity(path: Optional[str]):
+    if not path:
+        return None
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_mtime_ns, st.st_size]
+
+
+def _insert(con: sqlite3.Connection, start_id: int, feats: List[dict]) -> int:
+    geoms = np.array([shape(f["geometry"]) for f in feats], dtype=object)
+    wkb = shapely.to_wkb(geoms)
+    bb = shapely.bounds(geoms)
+    ids = range(start_id, start_id + len(feats))
+    con.executemany(
+        "INSERT INTO obstacles VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((i, *(f["properties"].get(c) for c in PROP_COLUMNS), w) for i, f, w in zip(ids, feats, wkb)),
+    )
+    con.executemany(
+        "INSERT INTO obstacles_rtree VALUES (?, ?, ?, ?, ?)",
+        ((i, b[0], b[2], b[1], b[3]) for i, b in zip(ids, bb)),
+    )
+    return start_id + len(feats)
+
+
+def build_obstacle_index(
+    dsm_path: str,
+    out_path: str,
+    dtm_path: Optional[str] = None,
+    min_h: float = 2.0,
+    smooth_sigma: float = 1.0,
+    block_px: int = 1024,
+    workers: Optional[int] = None,
+    features: Optional[Iterable[dict]] = None,
+    batch: int = 2000,
+) -> dict:
+    """
+    DSM (+DTM) kapsamının tamamından indeks üretir; dosya önce .tmp'ye yazılıp yerine taşınır.
+    features verilirse (ör. testlerde) çıkarım atlanır ve bu feature'lar yazılır.
+    """
+    import rasterio
+
+    t0 = time.perf_counter()
+    tmp = out_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    try:
+        con.executescript(_SCHEMA)
+        if features is None:
+            features = iter_obstacles_chunked(
+                dsm_path, dtm_path, min_h=min_h, smooth_sigma=smooth_sigma, block_px=block_px, max_workers=workers,
+            )
+        next_id, buf = 1, []
+        for f in features:
+            buf.append(f)
+            if len(buf) >= batch:
+                next_id = _insert(con, next_id, buf)
+                buf = []
+        if buf:
+            next_id = _insert(con, next_id, buf)
+
+        with rasterio.open(dsm_path) as src:
+            crs = str(src.crs)
+        meta = {
+            "dsm": _identity(dsm_path),
+            "dtm": _identity(dtm_path),
+            "crs": crs,
+            "min_h": float(min_h),
+            "smooth_sigma": float(smooth_sigma),
+            "count": next_id - 1,
+            "build_s": round(time.perf_counter() - t0, 3),
+        }
+        con.executemany("INSERT INTO meta VALUES (?, ?)", ((k, json.dumps(v)) for k, v in meta.items()))
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, out_path)
+    return meta
+
+
+class ObstacleIndex:
+    """Salt okunur indeks; bağlantılar thread başına açılır (sqlite3 nesneleri thread'ler arası paylaşılmaz)."""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        con = self._con()
+        self.meta: Dict = {k: json.loads(v) for k, v in con.execute("SELECT key, value FROM meta")}
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return con
+
+    def matches(self, dsm_path: str, dtm_path: Optional[str], min_h: float, smooth_sigma: float = 1.0) -> bool:
+        """İndeks bu DSM/DTM'in güncel hali ve bu eşiklerle mi üretilmiş?"""
+        try:
+            return (self.meta.get("dsm") == _identity(dsm_path)
+                    and self.meta.get("dtm") == _identity(dtm_path)
+                    and float(self.meta.get("min_h")) == float(min_h)
+                    and float(self.meta.get("smooth_sigma")) == float(smooth_sigma))
+        except (OSError, TypeError, ValueError):
+            return False
+
+    def _rows(self, minx: float, miny: float, maxx: float, maxy: float) -> list:
+        return self._con().execute(
+            "SELECT o.id, o.height_m, o.height_p95_m, o.height_mean_m, o.area_m2, o.pixel_count, o.source, o.geom "
+            "FROM obstacles_rtree r JOIN obstacles o ON o.id = r.id "
+            "WHERE r.maxx >= ? AND r.minx <= ? AND r.maxy >= ? AND r.miny <= ? ORDER BY o.id",
+            (minx, maxx, miny, maxy),
+        ).fetchall()
+
+    def query_bbox_geoms(self, minx: float, miny: float, maxx: float, maxy: float) -> Tuple[np.ndarray, List[dict]]:
+        """Kutuyla kesişen engeller: (shapely geometri dizisi, özellik dict'leri); ör. vektör karolar için."""
+        rows = self._rows(minx, miny, maxx, maxy)
+        if not rows:
+            return np.empty(0, dtype=object), []
+        geoms = shapely.from_wkb([r[-1] for r in rows])
+        keep = shapely.intersects(geoms, shapely.box(minx, miny, maxx, maxy))
+        return geoms[keep], [dict(zip(PROP_COLUMNS, r[1:-1])) for r, k in zip(rows, keep) if k]
+
+    def query_bbox(self, minx: float, miny: float, maxx: float, maxy: float) -> List[dict]:
+        """Kutuyla kesişen engeller, compute_obstacles ile aynı Feature biçiminde."""
+        geoms, props = self.query_bbox_geoms(minx, miny, maxx, maxy)
+        return [
+            {"type": "Feature", "geometry": g.__geo_interface__, "properties": p}
+            for g, p in zip(geoms, props)
+        ]
+
+    def query_corridor(self, route, half_width_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rota koridoruyla kesişen engeller: (shapely geometri dizisi, height_m dizisi).
+        clearance_along_route_arrays(obstacles=...) doğrudan bunu alır (GeoJSON dönüşümü yok).
+        """
+        corridor = shapely.buffer(route, half_width_m)
+        rows = self._rows(*corridor.bounds)
+        if not rows:
+            return np.empty(0, dtype=object), np.empty(0, dtype=np.float64)
+        geoms = shapely.from_wkb([r[-1] for r in rows])
+        keep = shapely.intersects(geoms, corridor)
+        heights = np.array([r[1] for r in rows], dtype=np.float64)
+        return geoms[keep], heights[keep]
+
+    def close(self):
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+
+def load_index(index_path: Optional[str]) -> Optional[ObstacleIndex]:
+    """Dosya varsa indeks; yoksa None (çağıran engelleri canlı hesaplar)."""
+    if not index_path or not os.path.exists(index_path):
+        return None
+    return ObstacleIndex(index_path)
+
+
+if __name__ == "__main__":
+    dsm_path, out_path = sys.argv[1], sys.argv[2]
+    arg = lambda name, default: next((sys.argv[i+1] for i, a in enumerate(sys.argv) if a == name), default)
+    meta = build_obstacle_index(
+        dsm_path, out_path,
+        dtm_path=arg('--dtm', None),
+        min_h=float(arg('--min_h', 2.0)),
+        smooth_sigma=float(arg('--smooth_sigma', 1.0)),
+        block_px=int(arg('--block_px', 1024)),
+        workers=(int(arg('--workers', 0)) or None),
+    )
+    print(f"Obstacle index written: {out_path} ({meta['count']} obstacles, {meta['build_s']}s)")
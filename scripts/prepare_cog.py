@@ -0,0 +1,266 @@
+# scripts/prepare_cog.py
+"""
+Raster hazırlık hattı: yeniden projeksiyon → karo düzenli Cloud-Optimized GeoTIFF (COG).
+
+Kullanım (offline):
+    python scripts/prepare_cog.py <src.tif> <dst_cog.tif> [--crs EPSG:32636] [--res 10]
+        [--block_px 512] [--compress DEFLATE|ZSTD|LZW] [--resampling bilinear] [--workers N]
+
+Adımlar:
+1. Hedef grid (--crs yoksa kaynak merkezinin UTM zonu): calculate_default_transform; --res verilirse pikseller res katlarına oturtulur
+   (gdalwarp -tap gibi) → aynı res ile hazırlanan DSM/DTM aynı grid'de olur, _align_to kopyasız çalışır.
+   Kaynak zaten hedef CRS'teyse ve --res verilmemişse grid aynen korunur (yalnızca yeniden karolama).
+2. Çıktı bloğu başına (block_px × block_px) kaynak penceresi okunup reproject edilir; bloklar
+   thread havuzunda paralel işlenir (warp GIL'i bırakır, her thread kendi handle'ını açar).
+3. COG sürücüsüyle kopya: iç karolar, DEFLATE/ZSTD + PREDICTOR (float → 3, tamsayı → 2),
+   AVERAGE overview'lar (en küçük seviye tek bloğa sığana kadar).
+4. validate_cog: karolu mu, blok boyu, overview'lar, sıkıştırma, COG düzeni ve grid hizası.
+
+Sonuç: _subset_raster / read_subset / slope_tiles pencereli okumaları yalnızca kesişen blokları
+açar; kaba sorgular overview'lardan okunabilir.
+"""
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.crs import CRS
+from rasterio.transform import from_origin
+from rasterio.warp import Resampling, calculate_default_transform, reproject, transform, transform_bounds
+from rasterio.windows import Window
+
+SRC_PAD_PX = 2  # kaynak pencere payı (bilinear/cubic çekirdeği blok kenarında eksik kalmasın)
+COMPRESSIONS = ("DEFLATE", "ZSTD", "LZW")
+
+
+def utm_crs_for(src) -> CRS:
+    """Raster merkezinin UTM zonu (326xx kuzey, 327xx güney)."""
+    cx = (src.bounds.left + src.bounds.right) / 2.0
+    cy = (src.bounds.top + src.bounds.bottom) / 2.0
+    if src.crs and not src.crs.is_geographic:
+        (cx,), (cy,) = transform(src.crs, "EPSG:4326", [cx], [cy])
+    zone = int(math.floor((cx + 180) / 6) + 1)
+    return CRS.from_epsg((32600 if cy >= 0 else 32700) + zone)
+
+
+def target_grid(src, dst_crs, res: Optional[float] = None) -> Tuple[object, int, int]:
+    """(affine, genişlik, yükseklik); res verilirse sınırlar res katlarına dışa doğru oturtulur."""
+    dst_crs = CRS.from_user_input(dst_crs)
+    if res is None:
+        if src.crs == dst_crs:
+            return src.transform, src.width, src.height
+        return calculate_default_transform(src.crs, dst_crs, src.width, src.height, *src.bounds)
+    l, b, r, t = transform_bounds(src.crs, dst_crs, *src.bounds, densify_pts=21)
+    l, b = math.floor(l / res) * res, math.floor(b / res) * res
+    r, t = math.ceil(r / res) * res, math.ceil(t / res) * res
+    return from_origin(l, t, res, res), int(round((r - l) / res)), int(round((t - b) / res))
+
+
+def block_windows(width: int, height: int, block_px: int) -> List[Window]:
+    return [
+        Window(c, r, min(block_px, width - c), min(block_px, height - r))
+        for r in range(0, height, block_px)
+        for c in range(0, width, block_px)
+    ]
+
+
+def _predictor(dtype: str) -> int:
+    return 3 if np.dtype(dtype).kind == "f" else 2
+
+
+def _dst_nodata(src):
+    if src.nodata is not None:
+        return src.nodata
+    return float("nan") if np.dtype(src.dtypes[0]).kind == "f" else None
+
+
+class _BlockWarper:
+    """Bir çıktı bloğunu kaynaktan yeniden projekte eder (thread başına açık kaynak handle'ı)."""
+
+    def __init__(self, src_path: str, dst_crs, dst_transform, nodata, resampling: Resampling):
+        self.src_path = src_path
+        self.dst_crs = dst_crs
+        self.dst_transform = dst_transform
+        self.nodata = nodata
+        self.resampling = resampling
+        self._local = threading.local()
+        self._opened: List[object] = []
+        self._lock = threading.Lock()
+
+    def _src(self):
+        src = getattr(self._local, "src", None)
+        if src is None:
+            src = self._local.src = rasterio.open(self.src_path)
+            with self._lock:
+                self._opened.append(src)
+        return src
+
+    def __call__(self, win: Window) -> np.ndarray:
+        src = self._src()
+        dst_t = rasterio.windows.transform(win, self.dst_transform)
+        fill = 0 if self.nodata is None else self.nodata
+        out = np.full((src.count, int(win.height), int(win.width)), fill, dtype=src.dtypes[0])
+
+        # Bloğun kaynak CRS'indeki kapsamı (+ pay); kaynak dışındaysa nodata bloğu
+        bl, bb, br, bt = rasterio.windows.bounds(win, self.dst_transform)
+        l, b, r, t = transform_bounds(self.dst_crs, src.crs, bl, bb, br, bt, densify_pts=21)
+        fw = rasterio.windows.from_bounds(l, b, r, t, transform=src.transform)
+        c0 = max(0, math.floor(fw.col_off) - SRC_PAD_PX)
+        r0 = max(0, math.floor(fw.row_off) - SRC_PAD_PX)
+        c1 = min(src.width, math.ceil(fw.col_off + fw.width) + SRC_PAD_PX)
+        r1 = min(src.height, math.ceil(fw.row_off + fw.height) + SRC_PAD_PX)
+        if c0 >= c1 or r0 >= r1:
+            return out
+        sw = Window(c0, r0, c1 - c0, r1 - r0)
+
+        data = src.read(window=sw)
+        reproject(
+            source=data, destination=out,
+            src_transform=src.window_transform(sw), src_crs=src.crs, src_nodata=src.nodata,
+            dst_transform=dst_t, dst_crs=self.dst_crs, dst_nodata=self.nodata,
+            resampling=self.resampling, tolerance=0,
+        )
+        return out
+
+    def close(self):
+        with self._lock:
+            for ds in self._opened:
+                ds.close()
+            self._opened.clear()
+
+
+def prepare_cog(
+    src_path: str,
+    dst_path: str,
+    dst_crs=None,
+    res: Optional[float] = None,
+    block_px: int = 512,
+    compress: str = "DEFLATE",
+    resampling: str = "bilinear",
+    workers: Optional[int] = None,
+) -> Dict:
+    """
+    src_path'i dst_crs'e (None → kaynak merkezinin UTM zonu) reproject edip COG olarak yazar.
+    Dönüş: grid/blok/overview bilgisi + validate_cog sonucu.
+    """
+    if block_px % 16:
+        raise ValueError("block_px must be a multiple of 16")
+    compress = compress.upper()
+    if compress not in COMPRESSIONS:
+        raise ValueError(f"compress must be one of {', '.join(COMPRESSIONS)}")
+    t0 = time.perf_counter()
+    with rasterio.open(src_path) as src:
+        dst_crs = CRS.from_user_input(dst_crs) if dst_crs else utm_crs_for(src)
+        dst_transform, width, height = target_grid(src, dst_crs, res)
+        nodata = _dst_nodata(src)
+        profile = {
+            "driver": "GTiff", "width": width, "height": height, "count": src.count,
+            "dtype": src.dtypes[0], "crs": dst_crs, "transform": dst_transform, "nodata": nodata,
+            "tiled": True, "blockxsize": block_px, "blockysize": block_px, "BIGTIFF": "IF_SAFER",
+        }
+
+    # 1) Bloklar paralel reproject edilip sıkıştırmasız karolu ara dosyaya yazılır; bellekte en fazla
+    #    2 × workers blok bulunur (biten yazıldıkça yenisi gönderilir, sıra önemsiz)
+    tmp_path = dst_path + ".tmp.tif"
+    warper = _BlockWarper(src_path, dst_crs, dst_transform, nodata, Resampling[resampling])
+    windows = block_windows(width, height, block_px)
+    n_workers = workers or os.cpu_count() or 1
+    try:
+        with rasterio.open(tmp_path, "w", **profile) as tmp:
+            with ThreadPoolExecutor(max_workers=n_workers) as pool:
+                inflight = {}
+                for win in windows:
+                    inflight[pool.submit(warper, win)] = win
+                    if len(inflight) >= 2 * n_workers:
+                        finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                        for fut in finished:
+                            tmp.write(fut.result(), window=inflight.pop(fut))
+                for fut in as_completed(inflight):
+                    tmp.write(fut.result(), window=inflight[fut])
+        warp_s = time.perf_counter() - t0
+
+        # 2) COG: iç karolar + sıkıştırma/predictor + overview'lar (tek geçişte, GDAL COG sürücüsü)
+        rasterio.shutil.copy(
+            tmp_path, dst_path, driver="COG",
+            BLOCKSIZE=block_px, COMPRESS=compress, PREDICTOR=_predictor(profile["dtype"]),
+            OVERVIEW_RESAMPLING="AVERAGE", OVERVIEWS="AUTO", BIGTIFF="IF_SAFER",
+            NUM_THREADS=workers or "ALL_CPUS",
+        )
+    finally:
+        warper.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    report = validate_cog(dst_path, block_px=block_px, res=res)
+    return {
+        "path": dst_path,
+        "crs": dst_crs.to_string(),
+        "width": width,
+        "height": height,
+        "res": [dst_transform.a, -dst_transform.e],
+        "blocks": len(windows),
+        "compress": compress,
+        "predictor": _predictor(profile["dtype"]),
+        "warp_s": round(warp_s, 3),
+        "build_s": round(time.perf_counter() - t0, 3),
+        **report,
+    }
+
+
+def validate_cog(path: str, block_px: Optional[int] = None, res: Optional[float] = None) -> Dict:
+    """COG kontrolleri; errors boşsa ok=True. res verilirse grid'in res katlarına oturduğu da denetlenir."""
+    errors: List[str] = []
+    with rasterio.open(path) as ds:
+        bh, bw = ds.block_shapes[0]
+        overviews = ds.overviews(1)
+        structure = ds.tags(ns="IMAGE_STRUCTURE")
+        tiled = bh != 1 and bw == bh and not (bw == ds.width and bh < ds.height)
+        if not tiled:
+            errors.append(f"not internally tiled (block {bw}x{bh})")
+        if bw % 16 or bh % 16:
+            errors.append(f"block size {bw}x{bh} is not a multiple of 16")
+        if block_px and (bw, bh) != (block_px, block_px):
+            errors.append(f"block size {bw}x{bh} != {block_px}")
+        if max(ds.width, ds.height) > bw and not overviews:
+            errors.append("no overviews")
+        if overviews and max(ds.width, ds.height) / overviews[-1] > bw:
+            errors.append(f"smallest overview (1/{overviews[-1]}) does not fit in one block")
+        if structure.get("LAYOUT") != "COG":
+            errors.append("not a COG layout (IFDs/overviews not ordered for range reads)")
+        if not ds.compression:
+            errors.append("uncompressed")
+        if res is not None:
+            t = ds.transform
+            if not all(abs(v / res - round(v / res)) < 1e-6 for v in (t.c, t.f)) or abs(t.a - res) > 1e-9:
+                errors.append(f"grid not aligned to {res} multiples")
+        return {
+            "ok": not errors,
+            "errors": errors,
+            "block": [bw, bh],
+            "overviews": overviews,
+            "compression": ds.compression.value if ds.compression else None,
+        }
+
+
+if __name__ == "__main__":
+    src_path, dst_path = sys.argv[1], sys.argv[2]
+    arg = lambda name, default: next((sys.argv[i+1] for i, a in enumerate(sys.argv) if a == name), default)
+    res = arg('--res', None)
+    out = prepare_cog(
+        src_path, dst_path,
+        dst_crs=arg('--crs', None),
+        res=(float(res) if res else None),
+        block_px=int(arg('--block_px', 512)),
+        compress=arg('--compress', 'DEFLATE'),
+        resampling=arg('--resampling', 'bilinear'),
+        workers=(int(arg('--workers', 0)) or None),
+    )
+    status = "ok" if out["ok"] else "INVALID: " + "; ".join(out["errors"])
+    print(f"COG written: {dst_path} ({out['crs']}, {out['width']}x{out['height']}, "
+          f"{out['blocks']} blocks, overviews {out['overviews']}, {out['build_s']}s) {status}")
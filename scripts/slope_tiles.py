@@ -0,0 +1,172 @@
+# scripts/slope_tiles.py
+"""
+DEM'den önceden hesaplanmış, karolara bölünmüş eğim (slope) deposu.
+
+Üretim (offline):
+    python scripts/slope_tiles.py <dem.tif> <out_dir> [--tile_px 512] [--dtype float16|uint8]
+
+Her karo 1 px halo ile okunur (np.gradient kenarları için), eğim hesaplanır ve halo kırpılarak
+<out_dir>/r{ti}_c{tj}.npy olarak yazılır. <out_dir>/index.json grid bilgisini ve DEM'in mtime'ını tutar.
+- float16: derece, geçersiz piksel = NaN
+- uint8  : 0.25° adımlı (0..63.5°), 255 = geçersiz
+
+API tarafında SlopeTileStore pencereyi LRU önbellekteki karolardan birleştirir; herhangi bir
+slope_max_deg için eşikleme sadece bir karşılaştırmadır.
+
+EPSG:4326 DEM'lerde derece → metre çevrimi karo merkezinin enlemiyle yapılır; canlı yol
+(lz_candidates._terrain) ise isteğin merkez enlemini kullanır. Aynı pencerede, karo olsun olmasın
+ve karo dikişlerinin iki yanında doğu-batı ölçeği göreli olarak ~tan(enlem)·Δenlem(radyan) kadar
+farklıdır (Δenlem: karo merkezi ile istek merkezi arası). 1″ DEM, 512 px karo, 2000 m pencere ve
+40° enlemde bu ≲ %0.15 (10° eğimde ~0.015°): float16 çözünürlüğü mertebesinde, uint8 adımının
+(0.25°) çok altında. Projeksiyonlu (metrik) DEM'lerde fark yoktur.
+"""
+import json
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+try:
+    from scripts.lz_candidates import slope_from_dem, _compute_pixel_meters
+except ImportError:  # python scripts/slope_tiles.py ...
+    from lz_candidates import slope_from_dem, _compute_pixel_meters  # type: ignore
+
+INDEX_NAME = "index.json"
+UINT8_STEP_DEG = 0.25
+UINT8_NODATA = 255
+
+
+def _encode(slope: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype == "uint8":
+        q = np.clip(np.round(slope / UINT8_STEP_DEG), 0, UINT8_NODATA - 1)
+        q[~np.isfinite(slope)] = UINT8_NODATA
+        return q.astype(np.uint8)
+    return slope.astype(np.float16)
+
+
+def _decode(tile: np.ndarray) -> np.ndarray:
+    if tile.dtype == np.uint8:
+        out = tile.astype(np.float32) * UINT8_STEP_DEG
+        out[tile == UINT8_NODATA] = np.nan
+        return out
+    return tile.astype(np.float32)
+
+
+def build_slope_tiles(dem_path: str, out_dir: str, tile_px: int = 512, dtype: str = "float16") -> dict:
+    """DEM'i tile_px×tile_px karolarda tarar, eğim karolarını ve index.json'u yazar."""
+    if dtype not in ("float16", "uint8"):
+        raise ValueError("dtype must be 'float16' or 'uint8'")
+    os.makedirs(out_dir, exist_ok=True)
+    with rasterio.open(dem_path) as src:
+        H, W = src.height, src.width
+        nodata = src.nodata
+        xres, yres = src.res
+        n_rows, n_cols = math.ceil(H / tile_px), math.ceil(W / tile_px)
+        for ti in range(n_rows):
+            for tj in range(n_cols):
+                r0, c0 = ti * tile_px, tj * tile_px
+                r1, c1 = min(H, r0 + tile_px), min(W, c0 + tile_px)
+                hr0, hr1 = max(0, r0 - 1), min(H, r1 + 1)
+                hc0, hc1 = max(0, c0 - 1), min(W, c1 + 1)
+                dem = src.read(1, window=Window.from_slices((hr0, hr1), (hc0, hc1))).astype(np.float32)
+                valid = np.isfinite(dem) if nodata is None else (dem != nodata) & np.isfinite(dem)
+                # 4326 ise karo merkezinin enlemi ile derece → metre (canlı yoldan farkı: modül açıklaması)
+                _, lat_ref = src.xy((r0 + r1) // 2, (c0 + c1) // 2)
+                px_m_x, px_m_y = _compute_pixel_meters(src.crs, xres, yres, lat_ref)
+                slope = slope_from_dem(dem, px_m_x, px_m_y)
+                slope[~valid] = np.nan
+                slope = slope[r0 - hr0:r1 - hr0, c0 - hc0:c1 - hc0]
+                np.save(os.path.join(out_dir, f"r{ti}_c{tj}.npy"), _encode(slope, dtype))
+
+        index = {
+            "dem_path": os.path.abspath(dem_path),
+            "dem_mtime_ns": os.stat(dem_path).st_mtime_ns,
+            "crs": str(src.crs),
+            "transform": list(src.transform)[:6],
+            "height": H,
+            "width": W,
+            "tile_px": tile_px,
+            "dtype": dtype,
+        }
+    with open(os.path.join(out_dir, INDEX_NAME), "w") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+class SlopeTileStore:
+    """Eğim karolarını okuyup pencere birleştiren, thread-safe LRU önbellekli depo."""
+
+    def __init__(self, tiles_dir: str, cache_tiles: int = 256):
+        self.tiles_dir = tiles_dir
+        with open(os.path.join(tiles_dir, INDEX_NAME)) as f:
+            self.index = json.load(f)
+        self.tile_px = int(self.index["tile_px"])
+        self.height = int(self.index["height"])
+        self.width = int(self.index["width"])
+        self.cache_tiles = cache_tiles
+        self._cache: "OrderedDict[Tuple[int, int], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def matches(self, dem_path: str) -> bool:
+        """Depo bu DEM'in güncel hali için mi üretilmiş?"""
+        try:
+            return (os.path.abspath(dem_path) == self.index["dem_path"]
+                    and os.stat(dem_path).st_mtime_ns == self.index["dem_mtime_ns"])
+        except OSError:
+            return False
+
+    def _tile(self, ti: int, tj: int) -> np.ndarray:
+        key = (ti, tj)
+        with self._lock:
+            t = self._cache.get(key)
+            if t is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return t
+        t = _decode(np.load(os.path.join(self.tiles_dir, f"r{ti}_c{tj}.npy")))
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = t
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_tiles:
+                self._cache.popitem(last=False)
+        return t
+
+    def window(self, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        """[r0:r1, c0:c1] eğim penceresi (float32 derece, geçersiz = NaN)."""
+        out = np.full((r1 - r0, c1 - c0), np.nan, dtype=np.float32)
+        tp = self.tile_px
+        for ti in range(max(0, r0) // tp, (min(r1, self.height) - 1) // tp + 1):
+            for tj in range(max(0, c0) // tp, (min(c1, self.width) - 1) // tp + 1):
+                t = self._tile(ti, tj)
+                tr0, tc0 = ti * tp, tj * tp
+                ir0, ir1 = max(r0, tr0), min(r1, tr0 + t.shape[0])
+                ic0, ic1 = max(c0, tc0), min(c1, tc0 + t.shape[1])
+                if ir1 > ir0 and ic1 > ic0:
+                    out[ir0 - r0:ir1 - r0, ic0 - c0:ic1 - c0] = t[ir0 - tr0:ir1 - tr0, ic0 - tc0:ic1 - tc0]
+        return out
+
+
+def load_store(tiles_dir: Optional[str], dem_path: str, cache_tiles: int = 256) -> Optional[SlopeTileStore]:
+    """tiles_dir varsa ve DEM ile eşleşiyorsa depoyu döndürür; aksi halde None (canlı hesaplamaya düşülür)."""
+    if not tiles_dir or not os.path.exists(os.path.join(tiles_dir, INDEX_NAME)):
+        return None
+    store = SlopeTileStore(tiles_dir, cache_tiles=cache_tiles)
+    return store if store.matches(dem_path) else None
+
+
+if __name__ == "__main__":
+    dem_path, out_dir = sys.argv[1], sys.argv[2]
+    tile_px = int(next((sys.argv[i+1] for i, a in enumerate(sys.argv) if a == '--tile_px'), 512))
+    dtype = str(next((sys.argv[i+1] for i, a in enumerate(sys.argv) if a == '--dtype'), 'float16')).lower()
+    idx = build_slope_tiles(dem_path, out_dir, tile_px=tile_px, dtype=dtype)
+    n = math.ceil(idx["height"] / tile_px) * math.ceil(idx["width"] / tile_px)
+    print(f"Slope tiles written: {out_dir} ({n} tiles, {dtype})")
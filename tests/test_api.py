@@ -0,0 +1,551 @@
+import os
+import tempfile
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from api.datasets import DatasetRegistry
+
+
+
+
+def _write_tif(path, arr, x0=0, y0=1000, pix=30.0):
+	transform = from_origin(x0, y0, pix, pix)
+	with rasterio.open(
+		path, 'w', driver='GTiff',
+		height=arr.shape[0], width=arr.shape[1], count=1,
+		dtype=arr.dtype, crs='EPSG:32636', transform=transform
+	) as dst:
+		dst.write(arr, 1)
+
+
+
+
+def test_registry_reuses_handles_and_reopens_on_mtime_change():
+	reg = DatasetRegistry()
+	with tempfile.TemporaryDirectory() as td:
+		path = os.path.join(td, 'DSM.tif')
+		_write_tif(path, np.zeros((10, 10), dtype=np.float32))
+		ds1 = reg.open(path)
+		assert reg.open(path) is ds1
+
+		_write_tif(path, np.ones((10, 10), dtype=np.float32))
+		st = os.stat(path)
+		os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+		ds2 = reg.open(path)
+		assert ds2 is not ds1 and ds1.closed
+		assert float(ds2.read(1)[0, 0]) == 1.0
+
+		assert reg.transformer("EPSG:4326", "EPSG:32636") is reg.transformer("EPSG:4326", "EPSG:32636")
+		reg.close_all()
+		assert ds2.closed
+
+
+
+
+def test_executor_rejects_when_queue_full():
+	import asyncio
+	import threading
+	from fastapi import HTTPException
+	from api.executor import ComputeExecutor
+
+	ex = ComputeExecutor(max_workers=1, max_queue=1, limits={"obstacles": 1})
+	gate = threading.Event()
+
+	async def scenario():
+		first = asyncio.ensure_future(ex.run("obstacles", lambda: (gate.wait(5), threading.current_thread().name)[1]))
+		await asyncio.sleep(0.05)
+		try:
+			await ex.run("obstacles", lambda: None)
+			rejected = None
+		except HTTPException as e:
+			rejected = e
+		gate.set()
+		return await first, rejected
+
+	name, rejected = asyncio.run(scenario())
+	ex.shutdown()
+	assert name.startswith("tengrilz-compute")
+	assert rejected is not None and rejected.status_code == 503 and "Retry-After" in rejected.headers
+	st = ex.stats()["endpoints"]["obstacles"]
+	assert st["completed"] == 1 and st["rejected"] == 1 and st["queued"] == 0 and st["running"] == 0
+
+
+def test_executor_keeps_slot_until_started_job_finishes_after_disconnect():
+	import asyncio
+	import threading
+	from fastapi import HTTPException
+	from api.executor import ComputeExecutor
+
+	ex = ComputeExecutor(max_workers=1, max_queue=2, limits={"obstacles": 1})
+	gate, done = threading.Event(), threading.Event()
+
+	async def scenario():
+		running = asyncio.ensure_future(ex.run("obstacles", lambda: (gate.wait(5), done.set())))
+		queued = asyncio.ensure_future(ex.run("obstacles", lambda: None))  # semaforda bekler
+		await asyncio.sleep(0.05)
+		running.cancel(); queued.cancel()  # istemciler ayrıldı
+		await asyncio.gather(running, queued, return_exceptions=True)
+		during = ex.stats()
+		# iş hâlâ koşuyor: max_queue=2'de yalnızca bir yer kaldı
+		waiting = asyncio.ensure_future(ex.run("obstacles", lambda: None))
+		await asyncio.sleep(0.01)
+		try:
+			await ex.run("obstacles", lambda: None)
+			rejected = None
+		except HTTPException as e:
+			rejected = e
+		gate.set()
+		await waiting
+		await asyncio.get_running_loop().run_in_executor(None, done.wait, 5)
+		return during, rejected
+
+	during, rejected = asyncio.run(scenario())
+	after = ex.stats()
+	ex.shutdown()
+	# Başlamış iş koşarken yeri ve koşan sayısı tutulur; başlamamış iş hemen bırakılır
+	assert during["admitted"] == 1
+	assert during["endpoints"]["obstacles"]["running"] == 1 and during["endpoints"]["obstacles"]["queued"] == 0
+	assert rejected is not None and rejected.status_code == 503
+	st = after["endpoints"]["obstacles"]
+	assert after["admitted"] == 0 and st["running"] == 0 and st["queued"] == 0
+	assert st["completed"] == 2 and st["failed"] == 1 and st["rejected"] == 1
+
+
+
+
+def test_result_cache_lru_and_disk_persistence():
+	from api.cache import ResultCache, make_key
+	with tempfile.TemporaryDirectory() as td:
+		c = ResultCache(max_entries=2, persist_dir=td)
+		k1, k2, k3 = (make_key("candidates", i) for i in range(3))
+		c.put(k1, {"a": 1}); c.put(k2, {"a": 2}); c.put(k3, {"a": 3})
+		assert c.stats()["entries"] == 2
+		# bellekten düşen kayıt diskten geri gelir
+		assert c.get(k1) == {"a": 1}
+		assert ResultCache(persist_dir=td).get(k3) == {"a": 3}
+		assert c.get(make_key("candidates", 99)) is None
+		assert make_key("x", {"b": 1, "a": 2}) == make_key("x", {"a": 2, "b": 1})
+
+
+def test_cached_computes_key_off_event_loop():
+	import asyncio
+	import threading
+	from api.cache import CACHE, cached, make_key
+	threads = []
+
+	def key_fn(x, **_):
+		threads.append(threading.get_ident())
+		return make_key("test-cached-key", x)
+
+	@cached(key_fn, respond=lambda body, **_: body)
+	async def handler(x):
+		return {"x": x}
+
+	async def run():
+		return threading.get_ident(), await handler(x=1), await handler(x=1)
+
+	loop_thread, first, again = asyncio.run(run())
+	if CACHE.enabled:
+		assert threads and loop_thread not in threads
+		assert first["meta"]["cache"] == "miss" and again["meta"]["cache"] == "hit"
+
+
+
+
+def test_debug_timings_and_metrics_endpoint():
+	from fastapi.testclient import TestClient
+	from pyproj import Transformer
+	from api.main import app
+	from api.cache import CACHE
+
+	dtm = np.full((200, 200), 100.0, dtype=np.float32)
+	dsm = dtm.copy()
+	dsm[80:100, 80:110] += 15.0
+	with tempfile.TemporaryDirectory() as td:
+		dsm_p, dtm_p = os.path.join(td, 'DSM.tif'), os.path.join(td, 'DTM.tif')
+		_write_tif(dsm_p, dsm, x0=500000, y0=4200000, pix=10.0)
+		_write_tif(dtm_p, dtm, x0=500000, y0=4200000, pix=10.0)
+		lon, lat = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(501000, 4199000)
+		params = dict(lat=lat, lon=lon, window_m=1000, pad_m=0, dsm_path=dsm_p, dtm_path=dtm_p)
+
+		enabled, CACHE.enabled = CACHE.enabled, False
+		try:
+			with TestClient(app) as c:
+				plain = c.get('/m2/obstacles/aoi', params=params)
+				timed = c.get('/m2/obstacles/aoi', params={**params, "debug_timings": 1})
+				metrics = c.get('/metrics')
+		finally:
+			CACHE.enabled = enabled
+
+	assert plain.status_code == 200 and "timings" not in plain.json().get("meta", {})
+	t = timed.json()["meta"]["timings"]
+	stages = {s["stage"]: s for s in t["stages"]}
+	assert {"executor.wait", "raster.read", "obstacles.smooth", "obstacles.vectorize"} <= set(stages)
+	assert stages["obstacles.smooth"]["pixels"] > 0 and stages["obstacles.vectorize"]["features"] >= 1
+	assert t["total_ms"] >= max(s["ms"] for s in t["stages"])
+	assert timed.json()["features"] == plain.json()["features"]
+
+	body = metrics.text
+	assert metrics.status_code == 200 and metrics.headers["content-type"].startswith("text/plain")
+	assert 'tengrilz_stage_seconds_bucket{stage="obstacles.smooth",le="+Inf"}' in body
+	assert 'tengrilz_request_seconds_count{route="/m2/obstacles/aoi",method="GET",status="200"}' in body
+	assert "tengrilz_executor_queue_depth" in body and "tengrilz_cache_hits_total" in body
+
+
+
+
+def test_full_obstacles_endpoint_streams_chunked_featurecollection():
+	import json
+	from fastapi.testclient import TestClient
+	from api.main import app
+	from api.executor import EXECUTOR
+
+	dtm = np.full((120, 120), 100.0, dtype=np.float32)
+	dsm = dtm.copy(); dsm[10:20, 10:20] += 6.0; dsm[50:70, 55:80] += 15.0
+	with tempfile.TemporaryDirectory() as td:
+		dsm_p, dtm_p = os.path.join(td, 'DSM.tif'), os.path.join(td, 'DTM.tif')
+		_write_tif(dsm_p, dsm); _write_tif(dtm_p, dtm)
+		q = dict(dsm_path=dsm_p, dtm_path=dtm_p, allow_full=1, block_px=32)
+		with TestClient(app) as c:
+			assert c.get('/m2/obstacles', params=dict(dsm_path=dsm_p, dtm_path=dtm_p)).status_code == 400
+			assert c.get('/m2/obstacles', params=dict(q, workers=(os.cpu_count() or 1) + 1)).status_code == 422
+			release = EXECUTOR.admit("obstacles_full")  # tek tarama yeri dolu
+			try:
+				busy = c.get('/m2/obstacles', params=dict(q, workers=1))
+			finally:
+				release()
+			r = c.get('/m2/obstacles', params=dict(q, workers=1))
+	assert busy.status_code == 503 and "Retry-After" in busy.headers
+	assert r.status_code == 200 and r.headers['content-type'].startswith('application/geo+json')
+	fc = json.loads(r.text)
+	assert fc['type'] == 'FeatureCollection' and len(fc['features']) == 2
+	assert EXECUTOR.stats()["endpoints"]["obstacles_full"]["running"] == 0
+
+
+
+
+def test_obstacle_index_build_query_and_clearance():
+	from fastapi.testclient import TestClient
+	from shapely.geometry import LineString
+	from api.main import app
+	from core.raster import compute_obstacles
+	from scripts.obstacle_index import ObstacleIndex, build_obstacle_index
+
+	dtm = np.full((200, 200), 100.0, dtype=np.float32)
+	dsm = dtm.copy(); dsm[60:80, 60:90] += 25.0; dsm[120:130, 150:160] += 8.0; dsm[10:14, 10:14] += 40.0
+	with tempfile.TemporaryDirectory() as td:
+		dsm_p, dtm_p, idx_p = (os.path.join(td, n) for n in ('DSM.tif', 'DTM.tif', 'obstacles.sqlite'))
+		_write_tif(dsm_p, dsm, x0=500000, y0=4200000, pix=10.0)
+		_write_tif(dtm_p, dtm, x0=500000, y0=4200000, pix=10.0)
+		meta = build_obstacle_index(dsm_p, idx_p, dtm_path=dtm_p, block_px=64, workers=1)
+		assert meta['count'] == len(compute_obstacles(dsm_p, dtm_p)) == 3
+
+		idx = ObstacleIndex(idx_p)
+		assert idx.matches(dsm_p, dtm_p, 2.0) and not idx.matches(dsm_p, dtm_p, 3.0)
+		near = idx.query_bbox(500550, 4199250, 500950, 4199450)
+		assert len(near) == 1 and near[0]['properties']['height_m'] >= 20.0
+		geoms, heights = idx.query_corridor(LineString([(500000, 4199300), (502000, 4199300)]), 20.0)
+		assert len(geoms) == 1 and heights[0] == near[0]['properties']['height_m']
+
+		body = {"route": {"type": "LineString", "coordinates": [[500100, 4199300], [501900, 4198700]]},
+			"altitude": {"mode": "AGL", "value_m": 40}, "min_clearance_m": 30}
+		q = dict(dsm_path=dsm_p, dtm_path=dtm_p)
+		with TestClient(app) as c:
+			live = c.post('/m2/clearance/check', params={**q, "obstacle_index": ""}, json=body).json()['summary']
+			fast = c.post('/m2/clearance/check', params={**q, "obstacle_index": idx_p}, json=body).json()['summary']
+			st = os.stat(dsm_p)
+			os.utime(dsm_p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # DSM değişti → indeks bayat
+			stale = c.post('/m2/clearance/check', params={**q, "obstacle_index": idx_p}, json=body).json()['summary']
+		idx.close()
+
+	assert live['obstacle_source'] == 'dsm' and fast['obstacle_source'] == 'index' and stale['obstacle_source'] == 'dsm'
+	assert fast['fails'] == live['fails'] > 0 and fast['min_clearance_m'] == live['min_clearance_m']
+
+
+
+
+def test_clearance_batch_matches_single_checks():
+	from fastapi.testclient import TestClient
+	from api.main import app
+
+	dtm = np.full((200, 200), 100.0, dtype=np.float32)
+	dsm = dtm.copy(); dsm[60:80, 60:90] += 25.0; dsm[120:130, 150:160] += 8.0
+	routes = [[[500100, 4199300], [501900, 4198700]], [[500100, 4199900], [501900, 4199900]]]
+	with tempfile.TemporaryDirectory() as td:
+		dsm_p, dtm_p = os.path.join(td, 'DSM.tif'), os.path.join(td, 'DTM.tif')
+		_write_tif(dsm_p, dsm, x0=500000, y0=4200000, pix=10.0)
+		_write_tif(dtm_p, dtm, x0=500000, y0=4200000, pix=10.0)
+		q = dict(dsm_path=dsm_p, dtm_path=dtm_p, obstacle_index="")
+		with TestClient(app) as c:
+			r = c.post('/m2/clearance/batch', params=q, json={
+				"routes": [{"type": "LineString", "coordinates": rc} for rc in routes],
+				"altitude": {"mode": "AGL", "values_m": [40, 60]}, "min_clearance_m": 30})
+			single = [[c.post('/m2/clearance/check', params=q, json={
+				"route": {"type": "LineString", "coordinates": rc},
+				"altitude": {"mode": "AGL", "value_m": a}, "min_clearance_m": 30}).json()['summary'] for a in (40, 60)]
+				for rc in routes]
+	assert r.status_code == 200
+	out = r.json()
+	for route, per_alt in zip(out['routes'], single):
+		for s, one in zip(route['scenarios'], per_alt):
+			assert (s['fails'], s['min_clearance_m']) == (one['fails'], one['min_clearance_m'])
+	best = out['ranking'][0]
+	assert best['fails'] == 0 and len(out['ranking']) == 4
+	assert out['ranking'][-1] == {"route": 0, **out['routes'][0]['scenarios'][0]}
+
+
+
+
+def test_obstacles_aoi_quantized_content_negotiation():
+	from fastapi.testclient import TestClient
+	from pyproj import Transformer
+	from api.main import app
+	from api.encoding import QGEOJSON_MEDIA_TYPE, decode_quantized
+
+	dtm = np.full((200, 200), 100.0, dtype=np.float32)
+	dsm = dtm.copy(); dsm[80:100, 80:110] += 15.0; dsm[20:30, 150:170] += 6.0
+	with tempfile.TemporaryDirectory() as td:
+		dsm_p, dtm_p = os.path.join(td, 'DSM.tif'), os.path.join(td, 'DTM.tif')
+		_write_tif(dsm_p, dsm, x0=500000.123456, y0=4200000.654321, pix=10.0)
+		_write_tif(dtm_p, dtm, x0=500000.123456, y0=4200000.654321, pix=10.0)
+		lon, lat = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(501000, 4199000)
+		params = dict(lat=lat, lon=lon, window_m=2000, pad_m=0, dsm_path=dsm_p, dtm_path=dtm_p)
+		with TestClient(app) as c:
+			plain = c.get('/m2/obstacles/aoi', params=params)
+			q = c.get('/m2/obstacles/aoi', params=params, headers={"Accept": QGEOJSON_MEDIA_TYPE})
+			q2 = c.get('/m2/obstacles/aoi', params={**params, "format": "qgeojson"})
+			wgs = c.get('/m2/obstacles/aoi', params={**params, "out_crs": "EPSG:4326"}).json()
+
+	assert q.headers['content-type'].startswith(QGEOJSON_MEDIA_TYPE) and q.content == q2.content
+	fc = plain.json()
+	assert len(fc['features']) == 2 and len(q.content) < len(plain.content)
+	# 10 m piksel → 0.01 m; kuantize çıktı aynı koordinatlara açılır
+	assert all(round(v, 2) == v for f in fc['features'] for ring in f['geometry']['coordinates'] for p in ring for v in p)
+	assert decode_quantized(q.json())['features'] == fc['features']
+	x, y = wgs['features'][0]['geometry']['coordinates'][0][0]
+	assert round(x, 8) == x and round(y, 8) == y
+
+
+
+
+def test_vector_tiles_obstacles_candidates_cache_and_etag():
+	import math
+	from fastapi.testclient import TestClient
+	from pyproj import Transformer
+	from api.main import app
+	from api.tiles import TILES
+	from core.mvt import decode_tile
+
+	dtm = np.full((300, 300), 100.0, dtype=np.float32)
+	dsm = dtm.copy(); dsm[140:160, 140:170] += 20.0
+	lon, lat = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(501550, 4198500)
+	z = 14
+	tx = int((lon + 180.0) / 360.0 * (1 << z))
+	ty = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * (1 << z))
+	TILES.clear()
+	with tempfile.TemporaryDirectory() as td:
+		dsm_p, dtm_p = os.path.join(td, 'DSM.tif'), os.path.join(td, 'DTM.tif')
+		_write_tif(dsm_p, dsm, x0=500000, y0=4200000, pix=10.0)
+		_write_tif(dtm_p, dtm, x0=500000, y0=4200000, pix=10.0)
+		q = dict(dsm_path=dsm_p, dtm_path=dtm_p, obstacle_index="")
+		with TestClient(app) as c:
+			first = c.get(f'/tiles/obstacles/{z}/{tx}/{ty}.mvt', params=q)
+			again = c.get(f'/tiles/obstacles/{z}/{tx}/{ty}.mvt', params=q)
+			not_modified = c.get(f'/tiles/obstacles/{z}/{tx}/{ty}.mvt', params=q, headers={"If-None-Match": first.headers['etag']})
+			low = c.get(f'/tiles/obstacles/10/{tx >> 4}/{ty >> 4}.mvt', params=q)
+			cand = c.get(f'/tiles/candidates/{z}/{tx}/{ty}.mvt', params=dict(dem_path=dtm_p))
+			assert c.get(f'/tiles/nope/{z}/{tx}/{ty}.mvt').status_code == 404
+
+	assert first.status_code == 200 and first.headers['content-type'] == 'application/vnd.mapbox-vector-tile'
+	assert first.headers['x-tile-cache'] == 'miss' and again.headers['x-tile-cache'] == 'hit' and again.content == first.content
+	assert not_modified.status_code == 304 and not_modified.content == b''
+	assert low.status_code == 200 and low.content == b''
+	obs = decode_tile(first.content)['obstacles']
+	assert len(obs['features']) == 1
+	f = obs['features'][0]
+	assert f['type'] == 'Polygon' and f['properties']['height_m'] >= 15.0 and f['properties']['pixel_count'] >= 600
+	xs = [p[0] for p in f['parts'][0]]
+	assert 0 <= min(xs) < max(xs) <= obs['extent']
+	lz = decode_tile(cand.content)['candidates']['features']
+	assert {'Polygon', 'Point'} <= {ft['type'] for ft in lz}
+
+
+def test_candidates_multi_aircraft_matches_single_calls():
+	from fastapi.testclient import TestClient
+	from pyproj import Transformer
+	from benchmarks.synthetic import fractal_dem
+	import api.main as api_main
+
+	lon, lat = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(501500, 4198500)
+	with tempfile.TemporaryDirectory() as td:
+		dem_p = os.path.join(td, 'dem.tif')
+		_write_tif(dem_p, fractal_dem(300, seed=1, relief_m=300.0), x0=500000, y0=4200000, pix=10.0)
+		dem_path, api_main.DEM_PATH = api_main.DEM_PATH, api_main.pathlib.Path(dem_p)
+		try:
+			with TestClient(api_main.app) as c:
+				q = dict(lat=lat, lon=lon, window_m=1400, slope_max_deg=5.0, min_diameter_m=20.0, top_k=4)
+				multi = c.get('/candidates', params={**q, "aircraft_code": "EC135,Foo,S70"})
+				single = [c.get('/candidates', params={**q, "aircraft_code": code}) for code in ("EC135", "Foo", "S70")]
+				del q["slope_max_deg"]
+				multi_default = c.get('/candidates', params={**q, "aircraft_code": "EC135,Foo,S70"}).json()
+		finally:
+			api_main.DEM_PATH = dem_path
+
+	assert multi.status_code == 200 and all(r.status_code == 200 for r in single)
+	results = multi.json()['results']
+	assert [r['aircraft'] for r in results] == ["EC135", "Foo", "S70"]
+	# Açık istek eşiği her koda uygulanır; verilmemişse çoklu uçakta preset'ler kendi limitini alır
+	assert [r['meta']['aircraft']['slope_max_deg'] for r in results] == [5.0, 5.0, 5.0]
+	assert [r['meta']['aircraft']['slope_max_deg'] for r in multi_default['results']] == [8.0, 12.0, 6.0]
+	assert sum(len(r['features']) for r in results) > 0
+	for m, s in zip(results, (r.json() for r in single)):
+		assert m['meta']['aircraft'] == s['meta']['aircraft']
+		assert m['meta']['slope_max_deg'] == s['meta']['slope_max_deg']
+		assert m['features'] == s['features']
+
+
+def test_candidates_batch_rejects_unknown_code_and_uses_candidates_slope_rule():
+	import json
+	from fastapi.testclient import TestClient
+	from pyproj import Transformer
+	from benchmarks.synthetic import fractal_dem
+	import api.main as api_main
+
+	lon, lat = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(501500, 4198500)
+	with tempfile.TemporaryDirectory() as td:
+		dem_p = os.path.join(td, 'dem.tif')
+		_write_tif(dem_p, fractal_dem(300, seed=1, relief_m=300.0), x0=500000, y0=4200000, pix=10.0)
+		dem_path, api_main.DEM_PATH = api_main.DEM_PATH, api_main.pathlib.Path(dem_p)
+		try:
+			with TestClient(api_main.app) as c:
+				body = dict(slope_max_deg=5.0, window_m=600.0)
+				typo = c.post('/candidates/batch', json={**body, "centers": [{"lat": lat, "lon": lon, "aircraft_code": "ec135"}]})
+				ok = c.post('/candidates/batch', json={**body, "centers": [
+					{"lat": lat, "lon": lon, "aircraft_code": "EC135"}, {"lat": lat, "lon": lon}]})
+				single = c.get('/candidates', params=dict(lat=lat, lon=lon, aircraft_code="EC135", **body)).json()
+		finally:
+			api_main.DEM_PATH = dem_path
+
+	assert typo.status_code == 422 and "ec135" in typo.text
+	assert ok.status_code == 200
+	lines = sorted((json.loads(l) for l in ok.text.splitlines()), key=lambda l: l["index"])
+	assert [l["aircraft"]["slope_max_deg"] for l in lines] == [single["meta"]["aircraft"]["slope_max_deg"], 5.0] == [5.0, 5.0]
+	assert lines[0]["result"]["features"] == single["features"]
+
+
+def test_candidates_batch_goes_through_executor_admission():
+	import json
+	from fastapi.testclient import TestClient
+	from pyproj import Transformer
+	import api.main as api_main
+
+	lon, lat = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(501500, 4198500)
+	ex = api_main.EXECUTOR
+	with tempfile.TemporaryDirectory() as td:
+		dem_p = os.path.join(td, 'dem.tif')
+		_write_tif(dem_p, np.full((300, 300), 100.0, dtype=np.float32), x0=500000, y0=4200000, pix=10.0)
+		dem_path, api_main.DEM_PATH = api_main.DEM_PATH, api_main.pathlib.Path(dem_p)
+		body = {"window_m": 300.0, "centers": [{"lat": lat, "lon": lon}]}
+		held = [ex.admit("batch") for _ in range(ex.limits["batch"])]
+		try:
+			with TestClient(api_main.app) as c:
+				busy = c.post('/candidates/batch', json=body)
+				for release in held:
+					release()
+					release()  # tekrar bırakma sayılmaz
+				ok = c.post('/candidates/batch', json=body)
+		finally:
+			api_main.DEM_PATH = dem_path
+			for release in held:
+				release()
+
+	assert busy.status_code == 503 and "Retry-After" in busy.headers
+	assert ok.status_code == 200 and [json.loads(l)["index"] for l in ok.text.splitlines()] == [0]
+	st = ex.stats()
+	assert st["endpoints"]["batch"]["running"] == 0 and st["admitted"] == 0
+
+
+
+
+def test_candidates_cache_key_tracks_slope_tiles_index():
+	from pyproj import Transformer
+	from scripts.slope_tiles import build_slope_tiles
+	import api.main as api_main
+	import api.tiles as api_tiles
+
+	# /candidates ve /tiles aynı (proje köküne bağlı, cwd'den bağımsız) depoyu okur
+	assert api_tiles.SLOPE_TILES_DIR is api_main.SLOPE_TILES_DIR and api_main.SLOPE_TILES_DIR.is_absolute()
+	lon, lat = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(501500, 4198500)
+	with tempfile.TemporaryDirectory() as td:
+		dem_p, tiles = os.path.join(td, 'dem.tif'), os.path.join(td, 'slope_tiles')
+		_write_tif(dem_p, np.full((300, 300), 100.0, dtype=np.float32), x0=500000, y0=4200000, pix=10.0)
+		saved = api_main.DEM_PATH, api_main.SLOPE_TILES_DIR
+		api_main.DEM_PATH, api_main.SLOPE_TILES_DIR = api_main.pathlib.Path(dem_p), api_main.pathlib.Path(tiles)
+		key = lambda: api_main._candidates_key(lat, lon, 800.0, 12.0, 30.0, "closing", None, None, None, None, None, 3)
+		try:
+			build_slope_tiles(dem_p, tiles, tile_px=128, dtype='float16')
+			k16 = key()
+			build_slope_tiles(dem_p, tiles, tile_px=128, dtype='uint8')
+			k8 = key()
+		finally:
+			api_main.DEM_PATH, api_main.SLOPE_TILES_DIR = saved
+
+	# ikisi de DEM ile eşleşen karolar; yalnızca index.json kimliği farklı
+	assert k16 != k8
+
+
+
+
+def test_candidate_tiles_resolve_slope_like_candidates():
+	import math
+	from fastapi.testclient import TestClient
+	from pyproj import Transformer
+	from api.main import app
+
+	lon, lat = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(501550, 4198500)
+	z = 14
+	tx = int((lon + 180.0) / 360.0 * (1 << z))
+	ty = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * (1 << z))
+	with tempfile.TemporaryDirectory() as td:
+		dem_p = os.path.join(td, 'dem.tif')
+		_write_tif(dem_p, np.full((300, 300), 100.0, dtype=np.float32), x0=500000, y0=4200000, pix=10.0)
+		etag = lambda **q: c.get(f'/tiles/candidates/{z}/{tx}/{ty}.mvt', params=dict(dem_path=dem_p, **q)).headers['etag']
+		with TestClient(app) as c:
+			custom = etag(aircraft_code="Foo", slope_max_deg=5.0)
+			plain = etag(slope_max_deg=5.0)
+			custom_default = etag(aircraft_code="Foo")
+			preset = etag(aircraft_code="EC135", slope_max_deg=5.0)
+			preset_default = etag(aircraft_code="EC135")
+			preset_12 = etag(aircraft_code="EC135", slope_max_deg=12.0)
+
+	# Tek kod /candidates gibi: istek eşiği (varsayılan 12°), preset olsun olmasın
+	assert custom == plain != custom_default
+	assert preset != preset_default == preset_12
+
+
+
+
+def test_candidates_single_code_keeps_explicit_slope():
+	from fastapi.testclient import TestClient
+	from pyproj import Transformer
+	from benchmarks.synthetic import fractal_dem
+	import api.main as api_main
+
+	lon, lat = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(501500, 4198500)
+	with tempfile.TemporaryDirectory() as td:
+		dem_p = os.path.join(td, 'dem.tif')
+		_write_tif(dem_p, fractal_dem(300, seed=1, relief_m=300.0), x0=500000, y0=4200000, pix=10.0)
+		dem_path, api_main.DEM_PATH = api_main.DEM_PATH, api_main.pathlib.Path(dem_p)
+		try:
+			with TestClient(api_main.app) as c:
+				q = dict(lat=lat, lon=lon, window_m=600, aircraft_code="EC135")
+				explicit = c.get('/candidates', params={**q, "slope_max_deg": 12.0}).json()
+				default = c.get('/candidates', params=q).json()
+				override = c.get('/candidates', params={**q, "slope_max_deg": 12.0, "slope_override_deg": 8.0}).json()
+		finally:
+			api_main.DEM_PATH = dem_path
+
+	# Tek kod: açık slope_max_deg preset limitine ezdirilmez (eski davranış); override yine önce gelir
+	assert explicit['meta']['slope_max_deg'] == default['meta']['slope_max_deg'] == 12.0
+	assert explicit['features'] == default['features']
+	assert override['meta']['slope_max_deg'] == 8.0
@@ -0,0 +1,21 @@
+import numpy as np
+from benchmarks.synthetic import fractal_dem, dsm_from_dem
+from benchmarks.compare import compare
+
+
+
+
+def test_synthetic_terrain_shapes_and_obstacles():
+	dem = fractal_dem(200, seed=3)
+	dsm = dsm_from_dem(dem, pix_m=10.0, building_density=200.0, tree_density=200.0, seed=3)
+	assert dem.shape == dsm.shape == (200, 200) and dem.dtype == np.float32
+	assert np.all(dsm >= dem) and float((dsm - dem).max()) >= 4.0
+
+
+
+
+def test_compare_flags_regressions():
+	base = {"results": [{"size": 1000, "stage": "slope", "wall_s": 1.0}, {"size": 1000, "stage": "obstacles", "wall_s": 2.0}]}
+	new = {"results": [{"size": 1000, "stage": "slope", "wall_s": 1.05}, {"size": 1000, "stage": "obstacles", "wall_s": 3.0}]}
+	res = compare(base, new, threshold=0.10)
+	assert [r["stage"] for r in res["regressions"]] == ["obstacles"]
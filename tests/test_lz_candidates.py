@@ -0,0 +1,246 @@
+import os
+import tempfile
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from pyproj import Transformer
+from scripts import lz_candidates as lz
+
+
+
+
+def _write_dem(path, arr, x0=500000.0, y0=4200000.0, pix=10.0):
+	transform = from_origin(x0, y0, pix, pix)
+	with rasterio.open(
+		path, 'w', driver='GTiff',
+		height=arr.shape[0], width=arr.shape[1], count=1,
+		dtype=arr.dtype, crs='EPSG:32636', transform=transform, nodata=-9999.0
+	) as dst:
+		dst.write(arr, 1)
+
+
+def _lonlat(x, y):
+	return Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True).transform(x, y)
+
+
+
+
+def test_read_block_extends_previous_buffer():
+	with tempfile.TemporaryDirectory() as td:
+		dem = np.arange(100 * 120, dtype=np.float32).reshape(100, 120)
+		path = os.path.join(td, 'dem.tif')
+		_write_dem(path, dem)
+		with rasterio.open(path) as src:
+			small = lz._read_block(src, 40, 60, 50, 70)
+			big = lz._read_block(src, 10, 90, 20, 110, prev=small)
+		assert big[1:] == (10, 20)
+		assert np.array_equal(big[0], dem[10:90, 20:110])
+
+
+
+
+def test_retry_with_larger_window_when_no_flat_pixels():
+	with tempfile.TemporaryDirectory() as td:
+		# Her yer dik eğim (~45°), yalnızca merkezden ~1.5 km uzakta düz bir platform
+		y, x = np.mgrid[0:400, 0:400].astype(np.float32)
+		dem = (x * 10.0).astype(np.float32)
+		dem[20:60, 20:60] = 500.0
+		path = os.path.join(td, 'dem.tif')
+		_write_dem(path, dem)
+		lon, lat = _lonlat(500000.0 + 2000.0, 4200000.0 - 2000.0)
+		fc = lz.main(path, lat, lon, window_m=300.0, slope_max_deg=12.0, min_diameter_m=30.0)
+		assert fc["meta"]["window_m"] == 2000.0
+		assert fc["meta"]["count"] >= 1
+
+
+
+
+def test_slope_tiles_match_live_slope():
+	from scripts.slope_tiles import build_slope_tiles, load_store
+	with tempfile.TemporaryDirectory() as td:
+		y, x = np.mgrid[0:300, 0:300].astype(np.float32)
+		dem = (40.0 * np.sin(x / 30.0) * np.cos(y / 45.0)).astype(np.float32)
+		path = os.path.join(td, 'dem.tif')
+		_write_dem(path, dem)
+		tiles = os.path.join(td, 'tiles')
+		build_slope_tiles(path, tiles, tile_px=64, dtype='float16')
+		store = load_store(tiles, path)
+		assert store is not None
+
+		# Karolardan birleştirilen pencere == tüm DEM üzerinden hesaplanan eğim
+		full = lz.slope_from_dem(dem, 10.0, 10.0)
+		win = store.window(50, 180, 70, 260)
+		assert np.allclose(win, full[50:180, 70:260], atol=0.05)
+
+		lon, lat = _lonlat(500000.0 + 1500.0, 4200000.0 - 1500.0)
+		live = lz.main(path, lat, lon, window_m=600.0)
+		cached = lz.main(path, lat, lon, window_m=600.0, slope_store=store)
+		assert cached["meta"]["slope_source"] == "tiles"
+		assert abs(cached["meta"]["flat_pixels"] - live["meta"]["flat_pixels"]) <= 5
+
+
+
+
+def test_batch_groups_overlapping_windows_and_matches_main():
+	from concurrent.futures import ThreadPoolExecutor
+	with tempfile.TemporaryDirectory() as td:
+		y, x = np.mgrid[0:300, 0:300].astype(np.float32)
+		dem = (40.0 * np.sin(x / 30.0) * np.cos(y / 45.0)).astype(np.float32)
+		path = os.path.join(td, 'dem.tif')
+		_write_dem(path, dem)
+		a = _lonlat(500000.0 + 1501.0, 4200000.0 - 1501.0)
+		b = _lonlat(500000.0 + 1503.0, 4200000.0 - 1503.0)  # aynı 10 m piksel
+		c = _lonlat(500000.0 + 800.0, 4200000.0 - 900.0)    # pencere a ile örtüşür
+		d = _lonlat(500000.0 + 2800.0, 4200000.0 - 2800.0)  # örtüşmez
+		centers = [{"lon": p[0], "lat": p[1]} for p in (a, b, c, d)]
+		plan = lz.plan_batch(path, centers, window_m=500.0)
+		assert sorted([m["idxs"] for m in job["centers"]] for _, job in plan) == [[[2], [0, 1]], [[3]]]
+
+		with ThreadPoolExecutor(2) as ex:
+			out = list(lz.iter_candidates_batch(path, centers, window_m=500.0, executor=ex))
+		assert sorted(i for idxs, _ in out for i in idxs) == [0, 1, 2, 3]
+		for idxs, r in out:
+			# ortak bloktan hesaplanan sonuç tek başına main() ile aynı
+			assert r == lz.main(path, centers[idxs[0]]["lat"], centers[idxs[0]]["lon"], window_m=500.0)
+
+
+
+
+def test_batch_cancels_pending_jobs_on_shared_executor_when_closed_early():
+	import threading
+	from concurrent.futures import ThreadPoolExecutor
+	gate = threading.Event()
+
+	class Recording(ThreadPoolExecutor):
+		def submit(self, fn, *a, **kw):
+			first = not subs  # ilk iş hemen, diğerleri kapı açılana kadar bekler
+			fut = super().submit(lambda *x: (first or gate.wait(5), fn(*x))[1], *a, **kw)
+			subs.append(fut)
+			return fut
+
+	subs = []
+	with tempfile.TemporaryDirectory() as td:
+		path = os.path.join(td, 'dem.tif')
+		_write_dem(path, np.zeros((300, 300), dtype=np.float32))
+		# birbirinden uzak 4 merkez → 4 ayrı iş; tek işçi
+		centers = [dict(zip(("lon", "lat"), _lonlat(500000.0 + x, 4200000.0 - 300.0))) for x in (300.0, 1100.0, 1900.0, 2700.0)]
+		with Recording(1) as ex:
+			gen = lz.iter_candidates_batch(path, centers, window_m=100.0, executor=ex)
+			next(gen)
+			gen.close()
+			gate.set()
+			# paylaşımlı havuz açık kalır; biten iş etkilenmez, kuyruktaki işler iptal (2. iş işçiye ulaşmış olabilir)
+			assert not ex._shutdown
+			assert not subs[0].cancelled() and subs[2].cancelled() and subs[3].cancelled()
+
+
+
+
+def test_thin_flat_strip_fails_clear_diameter_but_square_passes():
+	# Dik rampa üzerinde iki düz alan: 110 px uzun, 2 px (20 m) genişlikte şerit (bbox testini geçerdi) ve kare plato
+	dem = np.tile(np.arange(150, dtype=np.float32) * 5.0, (150, 1))
+	dem[20:24, 10:120] = 100.0
+	dem[80:92, 60:72] = 400.0
+	with tempfile.TemporaryDirectory() as td:
+		path = os.path.join(td, 'dem.tif')
+		_write_dem(path, dem)
+		lon, lat = _lonlat(500000.0 + 750.0, 4200000.0 - 750.0)
+		fc = lz.main(path, lat, lon, window_m=1000.0, min_diameter_m=30.0)
+
+	assert fc["meta"]["regions"] >= 2 and fc["meta"]["regions_passing"] == 1
+	areas = [f for f in fc["features"] if f["geometry"]["type"] == "Polygon"]
+	centers = [f for f in fc["features"] if f["geometry"]["type"] == "Point"]
+	assert len(areas) == len(centers) == 1
+	assert areas[0]["properties"]["clear_diameter_m"] == centers[0]["properties"]["clear_diameter_m"] >= 30.0
+	x, y = centers[0]["geometry"]["coordinates"]
+	assert 500000.0 + 600.0 < x < 500000.0 + 720.0 and 4200000.0 - 920.0 < y < 4200000.0 - 800.0
+
+
+def test_scoring_top_k_and_aircraft_weights_change_order():
+	# Rampa üzerinde üç plato: merkezde küçük (A), uzakta büyük (B), orta boy (C)
+	dem = np.tile(np.arange(150, dtype=np.float32) * 5.0, (150, 1))
+	dem[70:80, 70:80] = 375.0
+	dem[10:40, 10:40] = 100.0
+	dem[115:130, 110:125] = 600.0
+	with tempfile.TemporaryDirectory() as td:
+		path = os.path.join(td, 'dem.tif')
+		_write_dem(path, dem)
+		lon, lat = _lonlat(500000.0 + 750.0, 4200000.0 - 750.0)
+		run = lambda **kw: lz.main(path, lat, lon, window_m=1000.0, min_diameter_m=30.0, **kw)
+		near = run(score_weights={n: 0.0 for n in lz.SCORE_WEIGHTS} | {"distance": 1.0})
+		big = run(score_weights={n: 0.0 for n in lz.SCORE_WEIGHTS} | {"clear_diameter": 1.0}, top_k=2)
+		full = run(top_k=10)
+
+	areas = lambda fc: [f["properties"] for f in fc["features"] if f["geometry"]["type"] == "Polygon"]
+	assert [p["rank"] for p in areas(near)] == [1, 2, 3]
+	assert areas(near)[0]["distance_m"] < 100.0
+	assert len(areas(big)) == 2 and areas(big)[0]["clear_diameter_m"] > 250.0
+	scores = [p["score"] for p in areas(full)]
+	assert len(scores) == full["meta"]["regions_passing"] == 3 and scores == sorted(scores, reverse=True)
+	assert all(0.0 <= s <= 1.0 for s in scores)
+	assert full["meta"]["score_weights"] == lz.SCORE_WEIGHTS
+
+	# Heap seçimi tam sıralama ile aynı (eşitlikte temiz çap, sonra küçük etiket)
+	rng = np.random.default_rng(0)
+	score = np.round(rng.random(5001), 2)
+	dia = rng.integers(0, 5, 5001).astype(float)
+	cand = np.arange(1, 5001)
+	ref = sorted(cand.tolist(), key=lambda i: (-score[i], -dia[i], i))[:25]
+	assert lz.top_k_regions(score, dia, cand, 25) == ref
+
+
+def test_multi_aircraft_shares_terrain_pass_and_matches_single_runs():
+	from benchmarks.synthetic import fractal_dem
+	from api.aircraft import resolve_aircraft_params
+	acs = [resolve_aircraft_params(c, None, None, None, None, 20.0) for c in ("S70", "EC135", "UH-1H")]
+	specs = [{"code": a["code"], "slope_max_deg": a["slope_max_deg"], "min_diameter_m": a["min_clear_diameter_m"],
+			  "score_weights": a["score_weights"]} for a in acs]
+	with tempfile.TemporaryDirectory() as td:
+		path = os.path.join(td, 'dem.tif')
+		_write_dem(path, fractal_dem(300, seed=1, relief_m=300.0))
+		lon, lat = _lonlat(500000.0 + 1500.0, 4200000.0 - 1500.0)
+		single = [lz.main(path, lat, lon, window_m=1400.0, slope_max_deg=s["slope_max_deg"],
+						  min_diameter_m=s["min_diameter_m"], score_weights=s["score_weights"], top_k=5) for s in specs]
+		multi = lz.main_multi(path, lat, lon, specs, window_m=1400.0, top_k=5)
+		# Kutu başı maliyetle iki yol zorlanır: her zaman kutular / her zaman tek geçiş (maskeli)
+		overhead = lz.NESTED_CROP_OVERHEAD_PX
+		runs = []
+		try:
+			for lz.NESTED_CROP_OVERHEAD_PX in (-10 ** 9, 10 ** 9):
+				runs.append(lz.main_multi(path, lat, lon, specs, window_m=1400.0, top_k=5))
+		finally:
+			lz.NESTED_CROP_OVERHEAD_PX = overhead
+		cropped, masked = runs
+
+	# Sonuçlar istek sırasında; en gevşek (EC135) tam pencere, daha sıkılar kapsayan bir uçağın içinde
+	assert [r["aircraft"] for r in multi["results"]] == ["S70", "EC135", "UH-1H"]
+	assert multi["results"][1]["meta"]["nested_in"] is None
+	assert multi["results"][0]["meta"]["nested_in"] in ("EC135", "UH-1H")
+	assert multi["results"][2]["meta"]["nested_in"] == "EC135"
+	assert sum(len(r["features"]) for r in multi["results"]) > 0
+	for s, m, mc, mm in zip(single, multi["results"], cropped["results"], masked["results"]):
+		assert m["features"] == s["features"] == mc["features"] == mm["features"]
+		assert m["meta"]["regions_passing"] == s["meta"]["regions_passing"]
+		assert m["meta"]["regions"] <= s["meta"]["regions"]
+
+
+def test_multi_aircraft_grows_window_like_single_run():
+	# 7° rampa (gevşek uçak için her yer düz) + pencere dışında, 2000 m içinde düz plato (sıkı uçak)
+	dem = np.tile(np.arange(500, dtype=np.float32) * 10.0 * np.tan(np.radians(7.0)), (500, 1)).astype(np.float32)
+	dem[240:260, 80:100] = dem[250, 90]
+	specs = [{"code": "loose", "slope_max_deg": 8.0, "min_diameter_m": 30.0},
+			 {"code": "strict", "slope_max_deg": 5.0, "min_diameter_m": 30.0}]
+	with tempfile.TemporaryDirectory() as td:
+		path = os.path.join(td, 'dem.tif')
+		_write_dem(path, dem)
+		lon, lat = _lonlat(500000.0 + 2500.0, 4200000.0 - 2500.0)
+		single = [lz.main(path, lat, lon, window_m=400.0, slope_max_deg=s["slope_max_deg"],
+						  min_diameter_m=s["min_diameter_m"]) for s in specs]
+		multi = lz.main_multi(path, lat, lon, specs, window_m=400.0)
+
+	loose, strict = multi["results"]
+	assert loose["meta"]["window_m"] == 400.0 and strict["meta"]["window_m"] == 2000.0
+	assert strict["meta"]["nested_in"] is None and len(strict["features"]) == 2
+	for s, m in zip(single, multi["results"]):
+		assert m["meta"]["window_m"] == s["meta"]["window_m"]
+		assert m["features"] == s["features"]
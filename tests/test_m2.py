@@ -4,7 +4,7 @@ import numpy as np
 import rasterio
 from rasterio.transform import from_origin
 from shapely.geometry import LineString
-from core.raster import compute_obstacles
+from core.raster import compute_obstacles, compute_obstacles_arrays, iter_obstacles_chunked, RasterArray
 from core.clearance import clearance_along_route
 from scipy.ndimage import grey_opening
 
@@ -53,6 +53,7 @@ def test_clearance_pass_and_fail():
 			dtm_path=dtm_path, dsm_path=dsm_path,
 		)
 		assert summary["fails"] >= 1
+		assert summary["obstacle_index"]["obstacles"] == len(obstacles)
 
 		segs, hotspots, summary = clearance_along_route(
 			route=route, obstacles_fc={"type":"FeatureCollection","features":obstacles},
@@ -85,4 +86,220 @@ def test_dtm_from_dsm_morphology():
 		dtm = grey_opening(dsm, size=(5,5))
 		# Engelin merkezindeki fark bastırılmış olmalı (≤ ~2 m tolerans)
 		center_h = float(dsm[cy, cx] - dtm[cy, cx])
-		assert center_h <= 2.0
\ No newline at end of file
+		assert center_h <= 2.0
+
+
+
+def test_raster_array_sample_nodata_and_clamp():
+	with tempfile.TemporaryDirectory() as td:
+		arr = np.arange(20, dtype=np.float32).reshape(4, 5)
+		arr[1, 2] = -9999.0
+		path = os.path.join(td, 'DSM.tif')
+		transform = from_origin(0, 1000, 30.0, 30.0)
+		with rasterio.open(path, 'w', driver='GTiff', height=4, width=5, count=1,
+				dtype='float32', crs='EPSG:32636', transform=transform, nodata=-9999.0) as dst:
+			dst.write(arr, 1)
+		r = RasterArray.from_path(path)
+		# (piksel merkezi), nodata, pencere dışı (kenara kıstırılır)
+		vals = r.sample([15.0, 75.0, 1e6], [985.0, 955.0, 985.0])
+		assert vals[0] == 0.0
+		assert np.isnan(vals[1])
+		assert vals[2] == 4.0
+
+
+
+
+def test_obstacles_per_polygon_heights():
+	with tempfile.TemporaryDirectory() as td:
+		dtm = np.full((60, 60), 100.0, dtype=np.float32)
+		dsm = dtm.copy(); dsm[5:15, 5:15] += 5.0; dsm[35:50, 35:50] += 20.0
+		dtm_path = os.path.join(td, 'DTM_utm.tif'); dsm_path = os.path.join(td, 'DSM.tif')
+		_write_tif(dtm_path, dtm); _write_tif(dsm_path, dsm)
+		feats = compute_obstacles(dsm_path, dtm_path, min_h=2.0)
+		assert len(feats) == 2
+		heights = sorted(f['properties']['height_m'] for f in feats)
+		assert 4.0 <= heights[0] <= 6.0 and 18.0 <= heights[1] <= 21.0
+		for f in feats:
+			p = f['properties']
+			assert p['height_mean_m'] <= p['height_p95_m'] <= p['height_m']
+			assert p['area_m2'] == p['pixel_count'] * 900.0
+
+
+
+
+def test_obstacles_arrays_resamples_dtm_to_dsm_grid():
+	dsm_arr = np.full((60, 60), 100.0, dtype=np.float32); dsm_arr[20:30, 20:30] += 10.0
+	dsm = RasterArray(dsm_arr, from_origin(0, 1000, 10.0, 10.0), crs='EPSG:32636')
+	# DTM: aynı alan, 2× kaba çözünürlük
+	dtm = RasterArray(np.full((30, 30), 100.0, dtype=np.float32), from_origin(0, 1000, 20.0, 20.0), crs='EPSG:32636')
+	feats = compute_obstacles_arrays(dsm, dtm, min_h=2.0)
+	assert len(feats) == 1
+	assert 9.0 <= feats[0]['properties']['height_m'] <= 10.5
+
+
+
+
+def test_chunked_obstacles_match_full_raster_across_seams():
+	rng = np.random.default_rng(3)
+	dtm = np.full((150, 150), 100.0, dtype=np.float32)
+	dsm = dtm.copy()
+	for _ in range(40):
+		r, c = rng.integers(0, 150, 2); h, w = rng.integers(2, 20, 2)
+		dsm[r:r + h, c:c + w] += rng.uniform(3.0, 30.0)
+	dsm[70:73, :] += 8.0  # tüm dikişleri kesen duvar
+	with tempfile.TemporaryDirectory() as td:
+		dtm_path = os.path.join(td, 'DTM_utm.tif'); dsm_path = os.path.join(td, 'DSM.tif')
+		_write_tif(dtm_path, dtm); _write_tif(dsm_path, dsm)
+		full = compute_obstacles(dsm_path, dtm_path, min_h=2.0)
+		chunked = list(iter_obstacles_chunked(dsm_path, dtm_path, min_h=2.0, block_px=32, max_workers=1))
+
+	props = lambda fs: sorted(tuple(sorted(f['properties'].items())) for f in fs)
+	assert len(chunked) == len(full) and props(chunked) == props(full)
+	wall = max(chunked, key=lambda f: f['properties']['pixel_count'])
+	assert wall['geometry']['type'] == 'Polygon' and wall['properties']['pixel_count'] >= 150 * 3
+
+
+
+
+def test_clearance_profile_columnar_and_dsm_tops():
+	from core.clearance import clearance_profile
+	dtm = np.full((60, 60), 100.0, dtype=np.float32)
+	dsm = dtm.copy(); dsm[25:35, 25:35] += 8.0
+	tf = from_origin(0, 1000, 30.0, 30.0)
+	dtm_r, dsm_r = RasterArray(dtm, tf, crs='EPSG:32636'), RasterArray(dsm, tf, crs='EPSG:32636')
+	fc = {"type": "FeatureCollection", "features": compute_obstacles_arrays(dsm_r, dtm_r)}
+	route = LineString([(15, 985), (1785, -785)])
+	kw = dict(altitude_mode="AGL", altitude_value_m=5.0, corridor_width_m=60.0, min_clearance_m=6.0, step_m=25.0, dtm=dtm_r, dsm=dsm_r)
+
+	obs = clearance_profile(route, fc, columnar=True, **kw)
+	swath = clearance_profile(route, None, top_source="dsm", geojson=False, columnar=True, **kw)
+	prof = obs["profile"]
+	assert len(prof["distance_m"]) == len(prof["status"]) == obs["summary"]["segments"] == len(obs["segments"]["features"])
+	assert prof["status"].count("fail") == obs["summary"]["fails"] >= 1
+	assert swath["segments"]["features"] == [] and swath["summary"]["top_source"] == "dsm"
+	# Şerit maksimumu engel tepesine ulaşır; engel dışında zemin → clearance = irtifa
+	assert swath["summary"]["fails"] >= obs["summary"]["fails"]
+	assert max(swath["profile"]["top_m"]) == 108.0 and max(swath["profile"]["clearance_m"]) == 5.0
+
+
+
+
+def test_min_safe_altitude_passes_and_respects_gradient():
+	from core.clearance import route_tops, evaluate_clearance, min_safe_altitude
+	dtm = np.full((60, 60), 100.0, dtype=np.float32)
+	dsm = dtm.copy(); dsm[25:35, 25:35] += 8.0
+	tf = from_origin(0, 1000, 30.0, 30.0)
+	dtm_r, dsm_r = RasterArray(dtm, tf, crs='EPSG:32636'), RasterArray(dsm, tf, crs='EPSG:32636')
+	fc = {"type": "FeatureCollection", "features": compute_obstacles_arrays(dsm_r, dtm_r)}
+	tops = route_tops(LineString([(15, 985), (1785, -785)]), 60.0, 25.0, dtm_r, dsm_r, obstacles_fc=fc)
+
+	out = min_safe_altitude(tops, "AGL", 6.0, max_climb_gradient=0.02)
+	alt = out["summary"]["required_altitude_m"]
+	assert abs(alt - (8.0 + 6.0)) < 0.05 and out["summary"]["unknowns"] == 0
+	assert (evaluate_clearance(tops, "AGL", alt, 6.0)[2] == 1).sum() == 0
+	assert (evaluate_clearance(tops, "AGL", alt - 0.5, 6.0)[2] == 1).sum() > 0
+	# Engelsiz segmentler pay kadar; basamaklar birleştirilmiş
+	assert min(out["steps"]["altitude_m"]) == 6.0 and len(out["steps"]["from_m"]) < out["summary"]["segments"]
+
+	x = np.array(out["smoothed"]["distance_m"]); z = np.array(out["smoothed"]["altitude_msl_m"])
+	assert np.all(np.abs(np.diff(z)) <= 0.02 * np.diff(x) + 0.011)
+	assert z.max() == out["summary"]["max_required_msl_m"] == 114.0
+
+
+def test_dtm_from_dsm_blockwise_matches_full_and_progressive_removes_buildings():
+	from scripts.dtm_from_dsm import build_dtm, dtm_from_array
+
+	rng = np.random.default_rng(3)
+	yy, xx = np.mgrid[0:150, 0:170].astype(np.float32)
+	hill = 10.0 * np.exp(-((xx - 125) ** 2 + (yy - 75) ** 2) / (2 * 25.0 ** 2))
+	ground = (200.0 + hill + rng.normal(0, 0.05, (150, 170))).astype(np.float32)
+	dsm = ground.copy()
+	dsm[40:70, 20:60] += 12.0    # büyük bina (30×40 px)
+	dsm[120:124, 20:24] += 6.0   # küçük yapı
+	with tempfile.TemporaryDirectory() as td:
+		dsm_p = os.path.join(td, 'DSM.tif')
+		_write_tif(dsm_p, dsm, pix=1.0)
+
+		for kw in (dict(win_px=7, sigma=1.0), dict(win_px=41, sigma=0.0, progressive=True)):
+			full = dtm_from_array(dsm, cell_m=1.0, **kw)
+			for workers in (1, 2):
+				out_p = os.path.join(td, f'DTM_{workers}.tif')
+				stats = build_dtm(dsm_p, out_p, block_px=48, max_workers=workers, **kw)
+				assert stats["blocks"] == 16
+				with rasterio.open(out_p) as ds:
+					assert ds.profile["tiled"] and ds.block_shapes[0] == (16, 16)
+					assert np.array_equal(ds.read(1), full)
+
+	# İlerleyen pencere: binalar kalkar, tek büyük opening'in kestiği tepe zemin olarak korunur
+	dtm = dtm_from_array(dsm, win_px=41, sigma=0.0, progressive=True, cell_m=1.0)
+	assert (dtm[40:70, 20:60] - ground[40:70, 20:60]).max() < 0.5
+	assert (dtm[120:124, 20:24] - ground[120:124, 20:24]).max() < 0.5
+	top = (slice(55, 95), slice(105, 145))
+	assert np.array_equal(dtm[top], dsm[top])
+	assert (ground[top] - grey_opening(dsm, size=(41, 41))[top]).max() > 3.0
+
+
+def test_fast_morphology_matches_scipy_and_skimage():
+	import skimage.morphology as skm
+	from scipy import ndimage
+	from core import morphology as M
+
+	rng = np.random.default_rng(0)
+	a = rng.random((57, 63)).astype(np.float32)
+	m = rng.random((57, 63)) > 0.4
+	# Dikdörtgen: scipy grey_* (size=…) ile bire bir, çift boylar ve kenarlar dahil
+	for h, w in [(5, 5), (4, 6), (41, 41), (70, 3)]:
+		for x in (a, m, (a * 1000).astype(np.int16)):
+			for op in ('erosion', 'dilation', 'opening', 'closing'):
+				assert np.array_equal(getattr(M, op)(x, M.rect(h, w)), getattr(ndimage, 'grey_' + op)(x, size=(h, w)))
+	# disk(1), disk(2): skimage ile aynı eleman ve sonuç (obstacle temizliği disk(1) kullanır)
+	for r in (1, 2):
+		assert np.array_equal(M.disk(r).to_array(), skm.disk(r).astype(bool))
+		assert np.array_equal(M.opening(m, M.disk(r)), skm.opening(m, skm.disk(r)))
+		assert np.array_equal(M.closing(m, M.disk(r)), skm.closing(m, skm.disk(r)))
+	# Büyük disk: sekizgen parça ayrışımı, iç bölgede aynı footprint ile scipy'ye eşit
+	for r in (3, 8, 12):
+		fp = M.disk(r)
+		arr = fp.to_array()
+		assert arr.shape == (2 * r + 1, 2 * r + 1) and arr[r, 0] and arr[0, r] and not arr[0, 0]
+		for op in ('erosion', 'dilation'):
+			assert np.array_equal(getattr(M, op)(a, fp)[r:-r, r:-r], getattr(ndimage, 'grey_' + op)(a, footprint=arr)[r:-r, r:-r])
+
+
+
+
+def test_prepare_cog_blockwise_matches_reproject_and_validates():
+	from rasterio.warp import reproject, Resampling
+	from scripts.prepare_cog import prepare_cog, validate_cog
+
+	yy, xx = np.mgrid[0:300, 0:360].astype(np.float32)
+	dem = 800.0 + 0.8 * xx + 0.3 * yy + 5.0 * np.sin(xx / 25.0)
+	dem[:5, :5] = -9999.0
+	with tempfile.TemporaryDirectory() as td:
+		src_p, cog_p = os.path.join(td, 'dem_wgs84.tif'), os.path.join(td, 'dem_cog.tif')
+		with rasterio.open(
+			src_p, 'w', driver='GTiff', height=300, width=360, count=1, dtype='float32',
+			crs='EPSG:4326', transform=from_origin(30.50, 39.80, 0.0001, 0.0001), nodata=-9999.0,
+		) as dst:
+			dst.write(dem, 1)
+
+		out = prepare_cog(src_p, cog_p, res=10.0, block_px=64, workers=3)
+		assert out["ok"], out["errors"]
+		assert out["crs"] == "EPSG:32636" and out["block"] == [64, 64] and out["overviews"] and out["predictor"] == 3
+
+		with rasterio.open(src_p) as src, rasterio.open(cog_p) as cog:
+			t = cog.transform
+			assert t.a == 10.0 and t.c % 10.0 == 0 and t.f % 10.0 == 0
+			assert cog.tags(ns="IMAGE_STRUCTURE")["LAYOUT"] == "COG"
+			got = cog.read(1)
+			ref = np.full(got.shape, -9999.0, dtype=np.float32)
+			reproject(
+				rasterio.band(src, 1), ref, src_transform=src.transform, src_crs=src.crs, src_nodata=-9999.0,
+				dst_transform=cog.transform, dst_crs=cog.crs, dst_nodata=-9999.0, resampling=Resampling.bilinear,
+			)
+		valid = (ref != -9999.0) & (got != -9999.0)
+		assert valid.mean() > 0.8
+		assert np.abs(got[valid] - ref[valid]).max() < 0.1
+
+		# düz şeritli GeoTIFF COG değildir
+		assert not validate_cog(src_p)["ok"]